@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utilities.time import time_str_to_int
+from wgups.distance_table import DistanceTable
+from wgups.instance_generator import InstanceGenerator
+from wgups.package_table import PackageTable
+from wgups.route_factory import RouteFactory
+from wgups.savings_list import SavingsList
+from wgups.solution_factory import DRIVER_COUNT, TRUCK_COUNT, SolutionFactory
+from wgups.truck import Truck
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+STAGES = ["load", "savings", "routes", "solve", "sweep"]
+DEFAULT_SIZES = [40, 200, 1000, 5000, 20000, 50000]
+
+# The largest package count each stage is run for unless --no-limits is given,
+# the savings based stages hold every pair of packages in memory
+STAGE_LIMITS = {
+    "load": 50000,
+    "savings": 5000,
+    "routes": 5000,
+    "solve": 1000,
+    "sweep": 200,
+}
+
+# The distance CSV grows with the square of the address count, so large instances share addresses
+MAX_DEFAULT_ADDRESSES = 2000
+
+PRIORITY_MODIFIER = 1.0
+
+# Unless --drivers is given, an instance gets a driver for every this many packages and one truck more than drivers,
+# the ratio of the WGUPS file, so that larger instances can still meet their deadlines
+PACKAGES_PER_DRIVER = 20
+
+
+def measure(stage, memory: bool) -> dict:
+    """
+    Runs a stage with its output discarded and returns its wall time and, optionally, the peak memory allocated while it ran.
+    """
+    if memory:
+        tracemalloc.start()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+
+    measurement = {"seconds": seconds}
+    if memory:
+        measurement["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if result is not None:
+        measurement.update(result)
+    return measurement
+
+
+def measure_solve(stage, memory: bool) -> dict:
+    """
+    Runs a solving stage like measure, but marks it unsolved instead of recording its time and memory if it found no solution.
+    """
+    measurement = measure(stage, memory)
+    if measurement["total_distance"] is None:
+        del measurement["seconds"]
+        measurement.pop("peak_bytes", None)
+        measurement["unsolved"] = True
+    return measurement
+
+
+def fleet_size(package_count: int, args: argparse.Namespace) -> tuple[int, int]:
+    """
+    Returns the number of trucks and drivers an instance is solved with.
+    """
+    drivers = args.drivers or max(
+        DRIVER_COUNT, math.ceil(package_count / PACKAGES_PER_DRIVER)
+    )
+    trucks = args.trucks or max(TRUCK_COUNT, drivers + 1)
+    return trucks, drivers
+
+
+def benchmark_instance(
+    package_file_path: str, distance_file_path: str, args: argparse.Namespace
+) -> dict:
+    """
+    Times each requested stage of the solver pipeline on one instance.
+    """
+    with open(package_file_path) as package_file:
+        package_count = sum(1 for _ in package_file)
+    results = {}
+
+    def should_run(stage: str) -> bool:
+        if stage not in args.stages:
+            return False
+        if not args.no_limits and package_count > STAGE_LIMITS[stage]:
+            results[stage] = {"skipped": True}
+            return False
+        return True
+
+    tables = {}
+
+    def load():
+        tables["pt"] = PackageTable(package_file_path)
+        tables["dt"] = DistanceTable(distance_file_path, tables["pt"])
+
+    # the later stages need the tables, so they are loaded even when load is not being measured
+    if should_run("load"):
+        results["load"] = measure(load, args.memory)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            load()
+    pt, dt = tables["pt"], tables["dt"]
+
+    savings = {}
+
+    def build_savings():
+        savings["list"] = SavingsList(pt, dt, PRIORITY_MODIFIER)
+        return {"pairs": len(savings["list"])}
+
+    if should_run("savings"):
+        results["savings"] = measure(build_savings, args.memory)
+
+    if should_run("routes"):
+        if "list" not in savings:
+            build_savings()
+
+        def compute_routes():
+            routes = RouteFactory(pt, dt).compute_routes(savings["list"], Truck(1))
+            return {"routes": len(routes)}
+
+        results["routes"] = measure(compute_routes, args.memory)
+
+    run_solve = should_run("solve")
+    run_sweep = should_run("sweep")
+    if run_solve or run_sweep:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            trucks, drivers = fleet_size(package_count, args)
+            factory = SolutionFactory(
+                package_file_path,
+                distance_file_path,
+                truck_count=trucks,
+                driver_count=drivers,
+            )
+
+        def solve():
+            solution = factory.generate_solution(PRIORITY_MODIFIER)
+            return {
+                "total_distance": None if solution is None else solution.total_distance
+            }
+
+        def sweep():
+            modifiers = factory.priority_modifiers()
+            if args.sweep_points:
+                step = max(1, len(modifiers) // args.sweep_points)
+                modifiers = modifiers[::step][: args.sweep_points]
+            solution = factory.generate_best_solution(args.workers, modifiers)
+            return {
+                "modifiers": len(modifiers),
+                "total_distance": None if solution is None else solution.total_distance,
+            }
+
+        if run_solve:
+            results["solve"] = measure_solve(solve, args.memory)
+        if run_sweep:
+            results["sweep"] = measure_solve(sweep, args.memory)
+
+    # stages that are skipped are entered when they are checked, so the results are put back in pipeline order
+    return {stage: results[stage] for stage in STAGES if stage in results}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the WGUPS solver pipeline on generated instances"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--addresses", type=int, default=MAX_DEFAULT_ADDRESSES,
+                        help="maximum number of addresses in a generated instance")
+    parser.add_argument("--deadline-share", type=float, default=0.3)
+    parser.add_argument("--delayed-share", type=float, default=0.1)
+    parser.add_argument("--readdressed-share", type=float, default=0.025)
+    parser.add_argument("--restricted-share", type=float, default=0.1)
+    parser.add_argument("--deadlines", type=time_str_to_int, nargs="+",
+                        help='deadlines a package can get, such as "9:00 AM" (default: those of the WGUPS file)')
+    parser.add_argument("--delay-times", type=time_str_to_int, nargs="+",
+                        help="times a delayed package can arrive at the hub (default: 9:05 AM and 10:05 AM)")
+    parser.add_argument("--restricted-trucks", type=int, nargs="+",
+                        help="trucks a restricted package can require (default: 1 and 2)")
+    parser.add_argument("--group-count", type=int, default=1)
+    parser.add_argument("--group-size", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--trucks", type=int, default=0,
+                        help="number of trucks (default: one more than the drivers)")
+    parser.add_argument("--drivers", type=int, default=0,
+                        help=f"number of drivers (default: one per {PACKAGES_PER_DRIVER} packages, at least {DRIVER_COUNT})")
+    parser.add_argument("--sweep-points", type=int, default=0,
+                        help="number of evenly spaced priority modifiers to sweep (default: all)")
+    parser.add_argument("--no-limits", action="store_true",
+                        help="run every stage at every size")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip peak memory tracking, which slows the stages down")
+    parser.add_argument("--output", default="-",
+                        help="path of the JSON report (default: stdout)")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": None if np is None else np.__version__,
+        "seed": args.seed,
+        "results": [],
+    }
+
+    for size in args.sizes:
+        generator = InstanceGenerator(
+            package_count=size,
+            address_count=min(args.addresses, max(2, -(-size * 2 // 3))),
+            deadline_share=args.deadline_share,
+            delayed_share=args.delayed_share,
+            readdressed_share=args.readdressed_share,
+            restricted_share=args.restricted_share,
+            group_count=args.group_count,
+            group_size=args.group_size,
+            seed=args.seed,
+            deadlines=args.deadlines,
+            delay_times=args.delay_times,
+            restricted_trucks=args.restricted_trucks,
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            package_file_path, distance_file_path = generator.write(directory)
+            stages = benchmark_instance(package_file_path, distance_file_path, args)
+
+        trucks, drivers = fleet_size(size, args)
+        result = {
+            "packages": size,
+            "addresses": generator.address_count,
+            "trucks": trucks,
+            "drivers": drivers,
+            "stages": stages,
+        }
+        report["results"].append(result)
+        print(json.dumps(result), file=sys.stderr)
+
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    # the report is still written, so the unsolved instances can be looked at
+    unsolved = [
+        f"{result['packages']} packages ({stage})"
+        for result in report["results"]
+        for stage, measurement in result["stages"].items()
+        if measurement.get("unsolved")
+    ]
+    if unsolved:
+        sys.exit("No solution found for " + ", ".join(unsolved))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,260 @@
 # Alexander Durham - Student ID 011565339
 
+import argparse
+import sys
+from time import perf_counter
+
 from utilities.time import time_float_to_str
-from wgups.solution_factory import SolutionFactory
-
-
-# Uses the solution factory to heuristically generate multiple solutions and return the best one.
-solution_factory = SolutionFactory()
-best_solution = solution_factory.generate_best_solution()
-
-if best_solution is None:
-    print("No solution found. Exiting...")
-    exit()
-
-print("\n\n\n==== Best Solution ====\n")
-print(best_solution)
-print("\n")
-
-# REPL start
-state = ""
-while state != "q":
-    # Package tracking view state
-    if state == "p":
-        print(
-            "To track a package, enter the package ID (or 'all') followed (optionally) by the time (00:00-24:00) separated by a space. Enter 'b' to go back."
-        )
-        user_input = input()
-        if user_input == "b":
-            state = ""
-            continue
+from wgups.batch import BATCH_FORMATS, run_batch
+from wgups.solution_cache import CACHE_DIRECTORY, SolutionCache
+from wgups.solution_factory import DRIVER_COUNT, TRUCK_COUNT, SolutionFactory
+from wgups.trace import TRACE_SINKS, create_sink
 
-        # if no space exists in the string, only a package ID was provided
-        if " " not in user_input:
-            time_str = "24:00"
-            package_id = user_input
-        else:
-            package_id, time_str = user_input.split(" ")
 
-        if ":" not in time_str:
-            print("Invalid time string. Examples: 9:25, 11:15, 14:48\n")
+def main():
+    parser = argparse.ArgumentParser(description="WGUPS package routing")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes used to sweep the priority modifiers (default: 1)",
+    )
+    parser.add_argument(
+        "--trace",
+        choices=TRACE_SINKS,
+        default="human",
+        help="where loading and dispatch events are reported: not at all, as text on stdout, or as JSON lines in --trace-file (default: human)",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default="trace.jsonl",
+        help="file the jsonl trace is appended to (default: trace.jsonl)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="count the work of every solve, time its phases and print the breakdown for the whole sweep",
+    )
+    parser.add_argument(
+        "--resolve",
+        action="store_true",
+        help="run the sweep even if its best solution is cached, and replace the cached solution",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=CACHE_DIRECTORY,
+        help=f"directory solved sweeps are cached in (default: {CACHE_DIRECTORY})",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="PATH",
+        help="answer the queries in the file, or stdin for -, instead of starting the REPL. Each line is 'p <package ID or all> [time]' or 't <truck id>'",
+    )
+    parser.add_argument(
+        "--format",
+        choices=BATCH_FORMATS,
+        default="jsonl",
+        help="how batch answers are written to stdout, one per line (default: jsonl)",
+    )
+    parser.add_argument(
+        "--trucks",
+        type=int,
+        default=TRUCK_COUNT,
+        help=f"number of trucks at the hub (default: {TRUCK_COUNT})",
+    )
+    parser.add_argument(
+        "--drivers",
+        type=int,
+        default=DRIVER_COUNT,
+        help=f"number of drivers, each driving one truck at a time (default: {DRIVER_COUNT})",
+    )
+    parser.add_argument(
+        "--zones",
+        type=int,
+        default=1,
+        help="partition the packages at the hub into this many zones of nearby addresses at each dispatch and build the routes of each zone separately, for large instances (default: 1, no zones)",
+    )
+    parser.add_argument(
+        "--zone-workers",
+        type=int,
+        default=1,
+        help="number of processes the routes of the zones are built in (default: 1)",
+    )
+    parser.add_argument(
+        "--neighbors",
+        type=int,
+        default=0,
+        help="pair each package with only its this many nearest neighbors in the savings lists, which keeps their memory linear in the number of packages for large instances (default: 0, every pair)",
+    )
+    parser.add_argument(
+        "--no-improve",
+        dest="improve",
+        action="store_false",
+        help="keep each finished solution as it was built instead of improving it by moving packages between its routes. Sweep runs are only pruned once they can not beat the best solution so far without improvement, since improving a solution can make it shorter than the routes it committed, so this also makes the sweep faster",
+    )
+    args = parser.parse_args()
+
+    # in batch mode stdout only carries the answers, everything else goes to stderr
+    log = sys.stderr if args.batch != None else sys.stdout
+
+    # Uses the solution factory to heuristically generate multiple solutions and return the best one.
+    solution_factory = SolutionFactory(
+        trace=create_sink(args.trace, args.trace_file, log),
+        profile=args.profile,
+        truck_count=args.trucks,
+        driver_count=args.drivers,
+        zones=args.zones,
+        zone_workers=args.zone_workers,
+        neighbors=args.neighbors,
+        improve_solutions=args.improve,
+    )
+
+    # the sweep is only run when its result is not cached yet, or when it is profiled
+    solution_cache = SolutionCache(args.cache_dir)
+    best_solution = None
+    if not args.resolve and not args.profile:
+        best_solution = solution_cache.load(solution_factory)
+        if best_solution != None:
+            print("Loaded the best solution from the cache", file=log)
+
+    if best_solution == None:
+        solving = perf_counter()
+        best_solution = solution_factory.generate_best_solution(args.workers)
+        if best_solution != None:
+            solution_cache.store(
+                solution_factory,
+                best_solution,
+                solve_seconds=perf_counter() - solving,
+            )
 
-        hour_str, minute_str = time_str.split(":")
-        if not hour_str.isnumeric or not minute_str.isnumeric:
-            print("Invalid time string. Examples: 9:25, 11:15, 14:48\n")
+    if best_solution is None:
+        print("No solution found. Exiting...", file=log)
+        exit(1 if args.batch != None else 0)
 
-        h, m = int(hour_str), int(minute_str)
-        time = h * 60 + m
+    print("\n\n\n==== Best Solution ====\n", file=log)
+    print(best_solution, file=log)
+    print("\n", file=log)
 
-        # Prints a list of the most recent statuses for all packages
-        if package_id == "all":
-            packages = best_solution.get_package_list()
+    if solution_factory.sweep_metrics != None:
+        print("==== Sweep Profile ====\n", file=log)
+        print(solution_factory.sweep_metrics, file=log)
+        print("\n", file=log)
 
-            # Displays a header based on the time entered or EOD
-            if time == 1440:
-                print("==== Package Statuses - EOD ====\n")
+    if args.batch != None:
+        if args.batch == "-":
+            run_batch(best_solution, sys.stdin, sys.stdout, args.format)
+        else:
+            with open(args.batch) as batch_file:
+                run_batch(best_solution, batch_file, sys.stdout, args.format)
+        return
+
+    # REPL start
+    state = ""
+    while state != "q":
+        # Package tracking view state
+        if state == "p":
+            print(
+                "To track a package, enter the package ID (or 'all') followed (optionally) by the time (00:00-24:00) separated by a space. Enter 'b' to go back."
+            )
+            user_input = input()
+            if user_input == "b":
+                state = ""
+                continue
+
+            # if no space exists in the string, only a package ID was provided
+            if " " not in user_input:
+                time_str = "24:00"
+                package_id = user_input
             else:
-                print(f"==== Package Statuses - {time_float_to_str(time)} ====\n")
+                package_id, time_str = user_input.split(" ")
 
-            for package in packages:
-                info = package.get_tracking_info(time)
+            if ":" not in time_str:
+                print("Invalid time string. Examples: 9:25, 11:15, 14:48\n")
 
-                deadline_str = time_float_to_str(package.constraints.deadline)
+            hour_str, minute_str = time_str.split(":")
+            if not hour_str.isnumeric or not minute_str.isnumeric:
+                print("Invalid time string. Examples: 9:25, 11:15, 14:48\n")
 
-                time_str, message = info[-1].split(" - ")
-                if (
-                    message.split(" ")[0] == "Delivered"
-                    or message.split(" ")[0] == "Departed"
-                ):
-                    latest_update = (
-                        f"{message} at {time_str} | Deadline: {deadline_str}"
-                    )
+            h, m = int(hour_str), int(minute_str)
+            time = h * 60 + m
+
+            # Prints a list of the most recent statuses for all packages
+            if package_id == "all":
+                tracking_index = best_solution.get_tracking_index()
+
+                # Displays a header based on the time entered or EOD
+                if time == 1440:
+                    print("==== Package Statuses - EOD ====\n")
                 else:
-                    latest_update = f"{message} | Deadline: {deadline_str}"
-
-                print(f"Package {package.package_id}: {latest_update}")
-
-            print("\n===========================\n")
-            continue
-
-        if not package_id.isnumeric():
-            print("Invalid package ID\n")
-        package_id = int(package_id)
-
-        # Prints the tracking information for a single package
-        if not best_solution.print_package_info(package_id, time):
-            print("Package ID not found.\n")
-
-    # Route information view state
-    elif state == "r":
-        print("==== Route Information ====\n")
-        best_solution.print_routes()
-        print("===========================\n")
-        state = ""
-
-    # Truck information view state
-    elif state == "t":
-        print(
-            "Enter the truck id to view distance and route info. Enter 'b' to go back."
-        )
-        user_input = input()
-        if user_input == "b":
+                    print(f"==== Package Statuses - {time_float_to_str(time)} ====\n")
+
+                # the statuses are formatted and printed a page at a time
+                for page in tracking_index.pages(tracking_index.snapshot(time)):
+                    lines = []
+                    for row in page:
+                        deadline_str = time_float_to_str(row.deadline)
+
+                        time_str, message = row.info.split(" - ")
+                        if (
+                            message.split(" ")[0] == "Delivered"
+                            or message.split(" ")[0] == "Departed"
+                        ):
+                            latest_update = (
+                                f"{message} at {time_str} | Deadline: {deadline_str}"
+                            )
+                        else:
+                            latest_update = f"{message} | Deadline: {deadline_str}"
+
+                        lines.append(f"Package {row.package_id}: {latest_update}")
+                    print("\n".join(lines))
+
+                print("\n===========================\n")
+                continue
+
+            if not package_id.isnumeric():
+                print("Invalid package ID\n")
+            package_id = int(package_id)
+
+            # Prints the tracking information for a single package
+            if not best_solution.print_package_info(package_id, time):
+                print("Package ID not found.\n")
+
+        # Route information view state
+        elif state == "r":
+            print("==== Route Information ====\n")
+            best_solution.print_routes()
+            print("===========================\n")
             state = ""
-            continue
-        if not user_input.isnumeric():
-            print("Invalid truck id.\n")
-            continue
-        truck_id = int(user_input)
-
-        # Prints the truck information
-        if not best_solution.print_truck_info(truck_id):
-            print("Invalid truck id.\n")
-
-    # Main view state
-    else:
-        print(
-            "Enter 'p' to track a package, 'r' to view routes, or 't' to view truck information. Enter 'q' to quit."
-        )
-        user_input = input()
-        if user_input in ["p", "r", "t", "q"]:
-            state = user_input
+
+        # Truck information view state
+        elif state == "t":
+            print(
+                "Enter the truck id to view distance and route info. Enter 'b' to go back."
+            )
+            user_input = input()
+            if user_input == "b":
+                state = ""
+                continue
+            if not user_input.isnumeric():
+                print("Invalid truck id.\n")
+                continue
+            truck_id = int(user_input)
+
+            # Prints the truck information
+            if not best_solution.print_truck_info(truck_id):
+                print("Invalid truck id.\n")
+
+        # Main view state
         else:
-            "Invalid option."
+            print(
+                "Enter 'p' to track a package, 'r' to view routes, or 't' to view truck information. Enter 'q' to quit."
+            )
+            user_input = input()
+            if user_input in ["p", "r", "t", "q"]:
+                state = user_input
+            else:
+                "Invalid option."
+
+
+if __name__ == "__main__":
+    main()
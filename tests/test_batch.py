@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+import pytest
+
+from wgups.batch import FIELDS, BatchQuery, parse_time, run_batch
+from wgups.solution_factory import SolutionFactory
+
+
+def solved():
+    solution = SolutionFactory().generate_solution(0.5)
+    assert solution != None
+    return solution
+
+
+def test_parse_query():
+    query = BatchQuery.parse(1, "p 5 9:30")
+    assert (query.kind, query.target, query.time) == ("package", 5, 570.0)
+
+    query = BatchQuery.parse(2, "p,all")
+    assert (query.kind, query.target, query.time) == ("package", None, 1440.0)
+
+    query = BatchQuery.parse(3, "t 2")
+    assert (query.kind, query.target) == ("truck", 2)
+
+    for text in ["q", "p", "p x", "t", "t 1 2", "p 5 9", "p 5 25:00", "p 5 9:75"]:
+        with pytest.raises(ValueError):
+            BatchQuery.parse(4, text)
+
+    assert parse_time("24:00") == 1440.0
+
+
+def test_run_batch_jsonl():
+    solution = solved()
+    output = io.StringIO()
+
+    count = run_batch(
+        solution, ["p 5 9:00", "", "# comment", "t 1", "p 1000", "x", "p all 8:00"], output
+    )
+    assert count == 5
+
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    package = records[0]
+    location = solution.find_package(5)
+    assert location != None
+    assert package["line"] == 1 and package["package_id"] == 5
+    assert package["info"] == location.package.get_tracking_info(540.0)[-1]
+    assert package["truck_id"] == location.truck.id
+    assert package["delivery_time"] == location.delivery_time
+
+    truck = records[1]
+    assert truck["line"] == 4 and truck["truck_id"] == 1
+    assert truck["package_ids"] == [p.package_id for p in solution.trucks[0].packages]
+
+    assert "error" in records[2] and records[2]["line"] == 5
+    assert "error" in records[3] and records[3]["line"] == 6
+
+    snapshot = records[4:]
+    assert [r["package_id"] for r in snapshot] == [
+        p.package_id for p in solution.get_package_list()
+    ]
+    assert all(r["line"] == 7 for r in snapshot)
+
+
+def test_run_batch_csv():
+    solution = solved()
+    output = io.StringIO()
+
+    run_batch(solution, ["p 5 9:00", "t 2"], output, "csv")
+
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert list(rows[0].keys()) == FIELDS
+    assert rows[0]["package_id"] == "5" and rows[0]["truck_id"] != ""
+    assert rows[1]["query"] == "truck"
+    assert rows[1]["package_ids"].split(" ") == [
+        str(p.package_id) for p in solution.trucks[1].packages
+    ]
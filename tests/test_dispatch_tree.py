@@ -0,0 +1,26 @@
+from wgups.dispatch_tree import DispatchTree
+from wgups.solution_factory import SolutionFactory
+
+
+def test_breakpoints_agree_with_weighted_savings():
+    factory = SolutionFactory(improve_solutions=False, prune_runs=False)
+    tree = DispatchTree(factory.package_table)
+    modifiers = factory.priority_modifiers()
+    for priority_modifier in modifiers[::4]:
+        factory.generate_solution(priority_modifier, tree=tree)
+
+    orders = []
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        for branch in node.branches:
+            orders.extend(branch.orders)
+            nodes.append(branch.child)
+    assert len(orders) > 0
+
+    # the breakpoint interval only ever decides what checking every ordered pair would decide
+    for order in orders:
+        for priority_modifier in modifiers + [0.005, 0.333, 1.999, 2.5]:
+            assert order.holds(priority_modifier) == order._holds_exactly(
+                priority_modifier
+            )
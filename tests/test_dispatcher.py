@@ -0,0 +1,91 @@
+from wgups.dispatcher import Dispatcher
+from wgups.package_table import PackageTable
+from wgups.solution_factory import SolutionFactory
+from wgups.truck import Truck
+
+
+def test_default_fleet_leaves_truck_3_at_the_hub():
+    solution = SolutionFactory().generate_solution(0.5)
+    assert solution != None
+
+    assert [t.id for t in solution.trucks] == [1, 2, 3]
+    assert solution.get_truck(3).routes == []
+    assert solution.get_truck(1).routes[0].departure_time == 480
+
+
+def test_large_fleet_only_uses_trucks_with_drivers():
+    solution = SolutionFactory(truck_count=40, driver_count=10).generate_solution(0.5)
+    assert solution != None
+
+    assert len(solution.trucks) == 40
+    for t in solution.trucks:
+        if t.id > 10:
+            assert t.routes == []
+
+    delivered = [p.package_id for t in solution.trucks for p in t.packages]
+    assert sorted(delivered) == list(range(1, 41))
+
+
+def test_more_drivers_than_trucks():
+    solution = SolutionFactory(truck_count=2, driver_count=5).generate_solution(0.5)
+    assert solution != None
+    assert len(solution.trucks) == 2
+
+
+def test_no_drivers_gives_no_solution():
+    assert SolutionFactory(driver_count=0).generate_solution(0.5) == None
+
+
+def test_event_order():
+    pt = PackageTable()
+    trucks = [Truck(1), Truck(2), Truck(3)]
+    dispatcher = Dispatcher(trucks, 2, [])
+
+    # trucks ready at the same time go in order at the start of the day
+    first = dispatcher.next_truck(pt)
+    second = dispatcher.next_truck(pt)
+    assert (first.id, second.id) == (1, 2)
+
+    # the truck that was scheduled last goes first on a tie
+    dispatcher.wait(first, 500)
+    dispatcher.wait(second, 500)
+    assert dispatcher.next_truck(pt) is second
+    assert dispatcher.next_truck(pt) is first
+    assert first.next_available_time == 500
+
+    # a returning driver boards the lowest numbered truck without a driver
+    first.next_available_time = 600
+    dispatcher.dispatched(first)
+    assert dispatcher.next_truck(pt) is first
+    assert dispatcher.next_truck(pt) == None
+
+
+def test_package_arrivals_before_trucks():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    truck = Truck(1)
+    dispatcher = Dispatcher([truck], 1, [545])
+
+    dispatcher.wait(dispatcher.next_truck(pt), 545)
+    assert pt.next_package_arrival() == 545
+    assert dispatcher.next_truck(pt) is truck
+    assert pt.next_package_arrival() > 545
+
+
+def test_next_ready_time():
+    pt = PackageTable()
+    trucks = [Truck(1), Truck(2), Truck(3)]
+    dispatcher = Dispatcher(trucks, 2, [545])
+
+    first = dispatcher.next_truck(pt)
+    assert dispatcher.next_ready_time() == 480
+    second = dispatcher.next_truck(pt)
+
+    # package arrivals do not make a truck ready
+    first.next_available_time = 600
+    dispatcher.dispatched(first)
+    dispatcher.wait(second, 560)
+    assert dispatcher.next_ready_time() == 560
+    assert dispatcher.next_truck(pt) is second
+    assert dispatcher.next_ready_time() == 600
+    assert dispatcher.next_truck(pt) is first
+    assert dispatcher.next_ready_time() == 1440
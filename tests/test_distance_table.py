@@ -25,3 +25,55 @@ def test_all_addresses_correct():
         d_table.get_distance("HUB", package_addr)
 
     assert True
+
+
+def test_package_distance():
+    p_table = PackageTable("resources/WGUPS Package File.csv")
+    d_table = DistanceTable("resources/WGUPS Distance Table.csv", p_table)
+
+    package1 = p_table.get_package(1)
+    package2 = p_table.get_package(2)
+    assert package1 != None and package2 != None
+
+    assert d_table.get_package_distance(0, 1) == 3.5
+    assert d_table.get_package_distance(1, 0) == 3.5
+    assert d_table.get_package_distance(1, 2) == d_table.get_distance(
+        package1.formatted_address(), package2.formatted_address()
+    )
+    assert d_table.get_package_distance(2, 1) == d_table.get_package_distance(1, 2)
+    assert d_table.get_package_distance(1, 1) == 0.0
+
+
+def test_package_distance_follows_updated_address():
+    p_table = PackageTable("resources/WGUPS Package File.csv")
+    d_table = DistanceTable("resources/WGUPS Distance Table.csv", p_table)
+
+    assert d_table.get_package_distance(0, 9) == d_table.get_distance(
+        "HUB", "300 State St 84103"
+    )
+
+    p_table.update_statuses(1440.0)
+    assert d_table.get_package_distance(0, 9) == d_table.get_distance(
+        "HUB", "410 S State St 84111"
+    )
+
+    p_table.reset()
+    assert d_table.get_package_distance(0, 9) == d_table.get_distance(
+        "HUB", "300 State St 84103"
+    )
+
+
+def test_nearest_distances():
+    p_table = PackageTable("resources/WGUPS Package File.csv")
+    d_table = DistanceTable("resources/WGUPS Distance Table.csv", p_table)
+
+    hub = d_table.get_address_index("HUB")
+    a = d_table.get_address_index("1060 Dalton Ave S 84104")
+    b = d_table.get_address_index("6351 South 900 East 84121")
+
+    nearest = d_table.get_nearest_distances([hub, a, b, b])
+    assert nearest[hub] == min(7.2, d_table.get_distance("HUB", "6351 South 900 East 84121"))
+    assert nearest[a] == min(
+        7.2, d_table.get_distance("1060 Dalton Ave S 84104", "6351 South 900 East 84121")
+    )
+    assert nearest[b] == 0.0
@@ -1,4 +1,4 @@
-from utilities.hash_table import HashTable
+from utilities.hash_table import MAX_LOAD_FACTOR, MIN_LOAD_FACTOR, HashTable
 
 
 def test_basic_usage():
@@ -37,3 +37,149 @@ def test_get_items():
     hash_table.insert(1, "bar")
     hash_table.insert("foo", "bar")
     assert hash_table.items() == [(1, "bar"), ("foo", "bar")]
+
+
+def test_remove():
+    hash_table = HashTable()
+    hash_table.insert(1, "foo")
+    hash_table.insert(2, "bar")
+    hash_table.remove(1)
+    hash_table.remove(3)
+    assert hash_table.get(1) == None
+    assert hash_table.get(2) == "bar"
+    assert len(hash_table) == 1
+    assert 1 not in hash_table and 2 in hash_table
+    assert hash_table.items() == [(2, "bar")]
+
+    hash_table.insert(1, "baz")
+    assert hash_table.items() == [(2, "bar"), (1, "baz")]
+
+
+def test_from_items():
+    hash_table = HashTable.from_items((i, str(i)) for i in range(1000))
+    size = hash_table.size
+
+    assert len(hash_table) == 1000
+    assert hash_table.get(999) == "999"
+
+    # the bulk build is sized up front, so it never resizes
+    assert HashTable(1000).size == size
+
+
+def test_from_columns():
+    keys = [i * 13 for i in range(1000)]
+    hash_table = HashTable.from_columns(keys, range(1000), "i", "i")
+
+    assert len(hash_table) == 1000
+    assert hash_table.size == HashTable(1000).size
+    assert hash_table.keys.typecode == "i" and hash_table.values.typecode == "i"
+    assert hash_table.items() == list(zip(keys, range(1000)))
+    assert hash_table.get(13 * 999) == 999 and hash_table.get(14) == None
+
+    # the table grows and removes entries like one built by inserting
+    hash_table.insert(14, 1000)
+    hash_table.remove(0)
+    assert hash_table.get(14) == 1000 and 0 not in hash_table
+    assert len(hash_table) == 1000
+
+    objects = HashTable.from_columns(["a", "b"], [1, 2])
+    assert objects.items() == [("a", 1), ("b", 2)]
+
+
+def test_iteration():
+    hash_table = HashTable()
+    for key in ["a", "b", "c"]:
+        hash_table[key] = key.upper()
+
+    assert list(hash_table) == ["a", "b", "c"]
+    assert list(hash_table.iter_items()) == [("a", "A"), ("b", "B"), ("c", "C")]
+
+
+def test_grows_with_load_factor():
+    hash_table = HashTable()
+    sizes = set()
+    for i in range(10000):
+        hash_table.insert(f"key {i}", i)
+        sizes.add(hash_table.size)
+        assert hash_table.length <= hash_table.size * MAX_LOAD_FACTOR
+
+    # the index doubles as it grows, so there are only a handful of resizes
+    assert len(sizes) == 12
+    assert all(hash_table.get(f"key {i}") == i for i in range(10000))
+
+
+def test_shrinks_with_load_factor():
+    hash_table = HashTable.from_items((i, i) for i in range(10000))
+    large_size = hash_table.size
+
+    for i in range(9990):
+        hash_table.remove(i)
+
+    assert hash_table.size < large_size / 64
+    assert hash_table.length >= hash_table.size * MIN_LOAD_FACTOR
+    assert [key for key in hash_table] == list(range(9990, 10000))
+
+
+def test_probe_lengths_stay_short():
+    # sequential integers and strings both spread across the index, so lookups stay O(1) at any size
+    for keys in [range(20000), [f"{i} Main St 84101" for i in range(20000)]]:
+        hash_table = HashTable.from_items((key, None) for key in keys)
+        probes = 0
+        for key in keys:
+            probes += probe_length(hash_table, key)
+        assert probes / len(keys) < 3
+
+
+def probe_length(hash_table: HashTable, key) -> int:
+    mask = hash_table.size - 1
+    key_hash = hash(key)
+    perturb = key_hash & 0xFFFFFFFFFFFFFFFF
+    slot = key_hash & mask
+    length = 1
+    while hash_table.keys[hash_table.indices[slot]] != key:
+        perturb >>= 5
+        slot = (slot * 5 + perturb + 1) & mask
+        length += 1
+    return length
+
+
+def test_churn_stays_bounded():
+    hash_table = HashTable()
+    for i in range(100):
+        hash_table.insert(i, i)
+
+    # a reinserted key reuses its DELETED slot, so only the removed entries can make the table grow
+    for i in range(20000):
+        hash_table.remove(i % 100)
+        hash_table.insert(i % 100, i)
+    assert len(hash_table.keys) <= 2 * 100 + 8
+
+    # adding and removing new keys as well keeps the table near its live size
+    for i in range(20000):
+        hash_table.remove(i % 100)
+        hash_table.insert(i % 100, i)
+        hash_table.insert(i + 100, i)
+        hash_table.remove(i + 100)
+
+    assert len(hash_table) == 100
+    assert hash_table.size <= 256
+    assert len(hash_table.keys) <= 2 * 100 + 8
+    assert hash_table.used_slots == len(hash_table) + hash_table.deleted_slots
+    assert sorted(hash_table) == list(range(100))
+
+
+def test_typed_entries():
+    hash_table: HashTable[int, int] = HashTable(key_type="i", value_type="i")
+    for i in range(1000):
+        hash_table.insert(i * 7, i)
+    for i in range(0, 1000, 2):
+        hash_table.remove(i * 7)
+
+    # the entries are int arrays rather than lists of objects
+    assert hash_table.keys.typecode == "i" and hash_table.values.typecode == "i"
+    assert len(hash_table) == 500
+    assert hash_table.get(7) == 1 and hash_table.get(14) == None
+    assert hash_table.items() == [(i * 7, i) for i in range(1, 1000, 2)]
+
+    hash_table.insert(14, 2)
+    assert hash_table.get(14) == 2
@@ -0,0 +1,121 @@
+import pytest
+
+from wgups.distance_table import DistanceTable
+from wgups.instance_generator import DEADLINE_MARGIN, InstanceGenerator
+from wgups.package import UPDATED_STREET
+from wgups.package_table import PackageTable
+from wgups.solution_factory import SolutionFactory
+
+
+def test_generated_instance_loads(tmp_path):
+    generator = InstanceGenerator(
+        package_count=120,
+        address_count=50,
+        delayed_share=0.1,
+        readdressed_share=0.025,
+        restricted_share=0.05,
+        group_count=2,
+        group_size=4,
+        seed=3,
+    )
+    package_file_path, distance_file_path = generator.write(str(tmp_path))
+
+    pt = PackageTable(package_file_path)
+    dt = DistanceTable(distance_file_path, pt)
+
+    packages = pt.get_package_list()
+    assert len(packages) == 120
+    assert dt.address_count == 51
+
+    readdressed = [p for p in packages if p.constraints.updated_address]
+    assert len(readdressed) == 3
+    for package in readdressed:
+        assert package.address != UPDATED_STREET
+        assert package.constraints.updated_address == UPDATED_STREET
+    # a readdressed package is delayed until its address is updated
+    assert len([p for p in packages if p.status == "delayed"]) == 15
+    assert len([p for p in packages if p.constraints.required_truck]) == 6
+    assert sorted(pt.group_sizes.values(), reverse=True) == [4, 4]
+
+    for package in packages:
+        assert dt.get_package_distance(0, package.package_id) > 0
+        assert dt.get_package_distance(package.package_id, 0) == dt.get_package_distance(
+            0, package.package_id
+        )
+
+
+def test_generator_is_seeded(tmp_path):
+    first = InstanceGenerator(package_count=60, seed=7).write(str(tmp_path / "a"))
+    second = InstanceGenerator(package_count=60, seed=7).write(str(tmp_path / "b"))
+    third = InstanceGenerator(package_count=60, seed=8).write(str(tmp_path / "c"))
+
+    for a, b, c in zip(first, second, third):
+        assert open(a).read() == open(b).read()
+        assert open(a).read() != open(c).read()
+
+
+def test_generated_deadlines_can_be_met(tmp_path):
+    generator = InstanceGenerator(
+        package_count=200,
+        deadline_share=0.5,
+        delayed_share=0.3,
+        readdressed_share=0.05,
+        restricted_share=0.1,
+        seed=5,
+    )
+    package_file_path, _ = generator.write(str(tmp_path))
+    packages = PackageTable(package_file_path).get_package_list()
+
+    # packages with the wrong address are delayed until it is updated
+    delayed = [p for p in packages if p.status == "delayed"]
+    assert len(delayed) == 70
+    for package in delayed:
+        assert package.constraints.delayed_until + DEADLINE_MARGIN <= package.constraints.deadline
+
+    restricted = {}
+    for package in packages:
+        if package.constraints.required_truck:
+            assert package.constraints.deadline == 1440
+            truck_id = package.constraints.required_truck
+            restricted[truck_id] = restricted.get(truck_id, 0) + 1
+    # restricted packages come in pairs, so none is left alone for its truck
+    assert sum(restricted.values()) == 20
+    assert all(count % 2 == 0 for count in restricted.values())
+
+
+def test_generator_deadline_and_delay_choices(tmp_path):
+    generator = InstanceGenerator(
+        package_count=100,
+        deadline_share=0.5,
+        delayed_share=0.3,
+        seed=2,
+        deadlines=[600, 690],
+        delay_times=[550],
+        restricted_trucks=[3],
+    )
+    package_file_path, _ = generator.write(str(tmp_path))
+    packages = PackageTable(package_file_path).get_package_list()
+
+    assert {p.constraints.deadline for p in packages} == {600, 690, 1440}
+    for package in packages:
+        if package.note.startswith("Delayed"):
+            assert package.constraints.delayed_until == 550
+            # 9:10 AM leaves less than DEADLINE_MARGIN minutes before 10:00 AM
+            assert package.constraints.deadline in (690, 1440)
+        if package.constraints.required_truck:
+            assert package.constraints.required_truck == 3
+
+    with pytest.raises(ValueError):
+        InstanceGenerator(deadlines=[500])
+
+
+def test_generated_instance_can_be_solved(tmp_path):
+    package_file_path, distance_file_path = InstanceGenerator(
+        package_count=40, seed=0
+    ).write(str(tmp_path))
+
+    factory = SolutionFactory(package_file_path, distance_file_path)
+    solution = factory.generate_best_solution()
+
+    assert solution != None
+    assert len(solution.package_index) == 40
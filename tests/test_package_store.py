@@ -0,0 +1,141 @@
+import copy
+
+from wgups.package_store import AT_THE_HUB, DELAYED, DELIVERED
+from wgups.package_table import PackageTable
+
+
+def test_views_read_and_write_columns():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    store = pt.store
+    package9 = pt.get_package(9)
+    assert package9 != None
+    row = package9.row
+
+    assert store.package_ids[row] == 9
+    assert store.address(row) == "300 State St"
+    assert row not in store.addresses
+    assert package9.status == "delayed"
+
+    pt.update_statuses(1440.0)
+    assert package9.status == "at the hub"
+    assert store.address(row) == "410 S State St"
+    assert store.zip_code(row) == "84111"
+    assert package9.address_index == package9.constraints.updated_address_index
+    assert [info for _, info in package9.tracking_info] == [
+        "8:00 - On hold: Invalid address",
+        "10:20 - Updated package address",
+    ]
+
+    package1 = pt.get_package(1)
+    assert package1 != None
+    assert package1.row not in store.tracking
+    assert package1.get_tracking_info(1440.0) == ["8:00 - Ready for delivery at the hub"]
+
+
+def test_clone_shares_parsed_columns():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    pt.update_statuses(1440.0)
+    clone = pt.clone()
+
+    assert clone.store.deadlines is pt.store.deadlines
+    assert clone.store.strings is pt.store.strings
+    assert clone.store.statuses is not pt.store.statuses
+    assert clone.get_package(9).status == "delayed"
+    assert clone.packages_remaining() == 40
+
+    package = clone.get_package(5)
+    assert package != None
+    package.add_tracking_info(500.0, "Delivered to 410 S State St")
+    package.status = "delivered"
+    assert clone.packages_remaining() == 39
+    assert pt.packages_remaining() == 40
+    assert len(pt.get_package(5).tracking_info) == 1
+
+
+def test_deepcopy_keeps_state():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    pt.update_statuses(1440.0)
+    package = pt.get_package(5)
+    assert package != None
+    package.add_tracking_info(500.0, "Delivered to 410 S State St")
+    package.status = "delivered"
+
+    copied = copy.deepcopy(pt)
+    assert copied.store.deadlines is pt.store.deadlines
+    copied_package = copied.get_package(5)
+    assert copied_package != None and copied_package.store is copied.store
+    assert copied_package.constraints.deadline == package.constraints.deadline
+    assert copied_package.status == "delivered"
+    assert copied_package.tracking_info == package.tracking_info
+    assert copied.get_package(9).address == "410 S State St"
+
+    copied_package.add_tracking_info(510.0, "Departed HUB on Truck 1")
+    assert len(package.tracking_info) == 2
+
+
+def test_status_members_and_arrivals():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    delayed = [p for p in pt.get_package_list() if p.status == "delayed"]
+    assert len(delayed) > 0
+
+    times = sorted({p.constraints.delayed_until for p in delayed})
+    for time in [480.0] + times + [1440.0]:
+        pt.update_statuses(time)
+        statuses = [p.status for p in pt.get_package_list()]
+        pending = [
+            p.constraints.delayed_until
+            for p in pt.get_package_list()
+            if p.status == "delayed"
+        ]
+        assert pt.next_package_arrival() == min([1440.0] + pending)
+        assert pt.packages_remaining() == len(
+            [s for s in statuses if s != "delivered"]
+        )
+        assert [p.package_id for p in pt.get_packages_at_hub()] == [
+            p.package_id for p in pt.get_package_list() if p.status == "at the hub"
+        ]
+
+    assert pt.next_package_arrival() == 1440.0
+
+    package = pt.get_package(1)
+    assert package != None
+    package.status = "delivered"
+    assert pt.packages_remaining() == 39
+    assert 1 not in [p.package_id for p in pt.get_undelivered_packages()]
+
+    # a package that is delayed again is pending again
+    package.status = "delayed"
+    assert pt.next_package_arrival() == package.constraints.delayed_until
+    pt.update_statuses(1440.0)
+    assert package.status == "at the hub"
+
+    pt.reset()
+    assert pt.next_package_arrival() == times[0]
+    assert pt.packages_remaining() == 40
+
+
+def test_rows_with_and_changes():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    store = pt.store
+    statuses = list(store.statuses)
+    for codes in [(AT_THE_HUB,), (DELAYED,), (AT_THE_HUB, DELAYED), (DELIVERED,)]:
+        assert store.rows_with(*codes) == [
+            row for row, status in enumerate(statuses) if status in codes
+        ]
+    assert store.counts == [statuses.count(code) for code in range(3)]
+
+    # the rows are logged once per change of status, in the order they changed
+    seen = len(store.changes)
+    package5 = pt.get_package(5)
+    package1 = pt.get_package(1)
+    assert package5 != None and package1 != None
+    package5.status = "delivered"
+    package1.status = "delivered"
+    package1.status = "delivered"
+    assert list(store.changes[seen:]) == [package5.row, package1.row]
+    assert package1.row not in store.rows_with(AT_THE_HUB)
+    assert store.counts[DELIVERED] == 2
+
+    pt.reset()
+    assert len(store.changes) == 0
+    assert store.counts[DELIVERED] == 0
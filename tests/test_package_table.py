@@ -37,3 +37,45 @@ def test_package_constraints():
     assert package20 != None
     assert package20.constraints.paired_packages == [13, 15]
     assert package20.constraints.deadline == 630
+
+
+def test_clone_is_independent():
+    package_table = PackageTable("resources/WGUPS Package File.csv")
+    clone = package_table.clone()
+
+    clone.update_statuses(1440.0)
+
+    package9 = package_table.get_package(9)
+    cloned9 = clone.get_package(9)
+    assert package9 != None and cloned9 != None
+    assert cloned9.status == "at the hub"
+    assert cloned9.address == "410 S State St"
+    assert package9.status == "delayed"
+    assert package9.address == "300 State St"
+
+    # parsed data is shared rather than parsed again
+    assert clone.store.updated_streets is package_table.store.updated_streets
+    assert clone.get_package_group(13) == package_table.get_package_group(13)
+
+
+def test_reset():
+    package_table = PackageTable("resources/WGUPS Package File.csv")
+    package_table.update_statuses(1440.0)
+    package_table.reset()
+
+    package9 = package_table.get_package(9)
+    assert package9 != None
+    assert package9.status == "delayed"
+    assert package9.address == "300 State St"
+    assert package9.zip_code == "84103"
+    assert len(package9.tracking_info) == 1
+
+
+def test_group_size():
+    package_table = PackageTable("resources/WGUPS Package File.csv")
+
+    package13 = package_table.get_package(13)
+    assert package13 != None
+    assert package_table.get_group_size(package13.group_id) == 6
+    assert package_table.get_group_size(1) == 1
+    assert package_table.clone().get_group_size(package13.group_id) == 6
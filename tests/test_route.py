@@ -1,4 +1,5 @@
 from wgups.distance_table import DistanceTable
+from wgups.metrics import SolveMetrics
 from wgups.package_table import PackageTable
 from wgups.route import Route
 
@@ -86,6 +87,57 @@ def test_route_merge():
     assert len(route1.deliveries) == 4
 
 
+def test_route_merge_joins_the_paired_ends():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    # each case pairs an end of the first route with an end of the second, the merged route runs through the pair
+    # in one direction or the other, with the cached timing or with routes leaving at different times
+    for p1, p2, expected in [
+        (4, 5, [2, 4, 5, 7]),
+        (4, 7, [2, 4, 7, 5]),
+        (2, 5, [4, 2, 5, 7]),
+        (2, 7, [5, 7, 2, 4]),
+    ]:
+        for departure_time in [480.0, 490.0]:
+            route1 = Route(480.0, 1, dt, pt)
+            route2 = Route(departure_time, 1, dt, pt)
+            assert route1.add_package(2, 4)
+            assert route2.add_package(5, 7)
+            assert [p.package_id for p in route1.deliveries] == [2, 4]
+            assert [p.package_id for p in route2.deliveries] == [5, 7]
+
+            assert route1.merge(route2, p1, p2)
+            merged = [p.package_id for p in route1.deliveries]
+            assert merged in [expected, expected[::-1]]
+
+
+def test_route_merge_over_capacity():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    pt.metrics = SolveMetrics()
+
+    route1 = Route(480.0, 1, dt, pt)
+    route2 = Route(480.0, 1, dt, pt)
+    for package_id in [1, 2, 4, 5, 7, 8, 10, 11, 12]:
+        assert route1.insert_package(package_id)
+    for package_id in [17, 21, 22, 23, 24, 26, 27, 29]:
+        assert route2.insert_package(package_id)
+
+    # a merge of more packages than the truck holds is rejected once, before the timing of the merge is worked out
+    joins = []
+    join = route1._join
+    route1._join = lambda first, second: joins.append(None) or join(first, second)
+    checks = pt.metrics.counters.get("feasibility_checks", 0)
+    assert not route1.merge(
+        route2, route1.deliveries[-1].package_id, route2.deliveries[0].package_id
+    )
+    assert joins == []
+    assert pt.metrics.counters["feasibility_checks"] == checks + 1
+    assert pt.metrics.counters["feasibility_checks.capacity"] == 1
+    assert len(route1.deliveries) == 9
+
+
 def test_route_reversible():
     pt = PackageTable("resources/WGUPS Package File.csv")
     dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
@@ -186,3 +238,115 @@ def test_calculate_distance():
     assert route.add_package(1, 2)
 
     assert route.calculate_distance(route.deliveries) == 7.8
+
+
+def test_cached_timing_matches_full_walk():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    route1 = Route(480.0, 1, dt, pt)
+    route2 = Route(480.0, 1, dt, pt)
+    assert route1.add_package(2, 4)
+    assert route1.add_package(10, 2)
+    assert route1.add_package(11, 4)
+    assert route2.add_package(5, 7)
+    assert route1.merge(route2, 4, 5)
+
+    for direction, deliveries in [
+        (route1.forward, route1.deliveries),
+        (route1.reverse, route1.deliveries[::-1]),
+    ]:
+        assert direction.first == deliveries[0].package_id
+        assert direction.last == deliveries[-1].package_id
+        assert abs(
+            direction.path_distance
+            + dt.get_package_distance(direction.last, 0)
+            - route1.calculate_distance(deliveries)
+        ) < 1e-9
+        return_time = dt.get_package_distance(direction.last, 0) / 18 * 60
+        assert abs(
+            direction.end_time
+            + return_time
+            - (480.0 + route1.calculate_time(deliveries))
+        ) < 1e-9
+
+
+def test_extension_checks_match_verify_deliveries():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    # extending a route with a deadline package succeeds or fails exactly when the full walk does
+    for departure_time in range(480, 640, 5):
+        for package_id in [1, 13, 14, 15, 16, 20, 29, 30, 31, 34, 37, 40]:
+            route = Route(float(departure_time), 1, dt, pt)
+            if not route.add_package(4, 2) or not route.add_package(17, 4):
+                continue
+
+            package = pt.get_package(package_id)
+            assert package != None
+            expected = route.verify_deliveries(
+                route.deliveries + [package]
+            ) or route.verify_deliveries([package] + route.deliveries[::-1])
+            assert route.add_package(package_id, 17) == expected
+
+
+def test_is_endpoint():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    route = Route(480.0, 1, dt, pt)
+    assert not route.is_endpoint(1)
+
+    assert route.add_package(1, 2)
+    assert route.add_package(4, 1)
+    ends = [route.deliveries[0].package_id, route.deliveries[-1].package_id]
+    interior = route.deliveries[1].package_id
+
+    assert all(route.is_endpoint(package_id) for package_id in ends)
+    assert not route.is_endpoint(interior)
+    assert not route.is_endpoint(0)
+
+
+def test_improve_shortens_route():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    route = Route(480.0, 2, dt, pt)
+    # end of day packages at the hub, visited in ID order rather than by location
+    package_ids = [2, 4, 5, 7, 8, 10, 11, 12, 17, 19]
+    for package_id in package_ids:
+        package = pt.get_package(package_id)
+        assert package != None
+        route.deliveries.append(package)
+        route.packages.add(package_id)
+    route._refresh()
+
+    before = route.route_distance()
+    saved = route.improve()
+
+    assert saved > 0
+    assert abs(route.route_distance() - (before - saved)) < 1e-9
+    assert sorted(p.package_id for p in route.deliveries) == package_ids
+    assert route.verify_deliveries(route.deliveries)
+
+    # no 2-opt or Or-opt move is left that shortens the route
+    assert route.improve() == 0.0
+
+
+def test_improve_keeps_deadlines():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    # Packages 13, 14, 15, 16, 20 have 9:00 and 10:30 AM deadlines
+    route = Route(480.0, 1, dt, pt)
+    assert route.add_package(15, 16) == True
+    for package_id, paired_package_id in [(14, 15), (13, 16), (20, 13), (21, 20)]:
+        route.add_package(package_id, paired_package_id)
+    assert route.verify_deliveries(route.deliveries)
+
+    before = route.route_distance()
+    route.improve()
+
+    assert route.route_distance() <= before
+    assert route.verify_deliveries(route.deliveries)
+    assert route.forward.slack >= 0
@@ -0,0 +1,66 @@
+from wgups.distance_table import DistanceTable
+from wgups.package_table import PackageTable
+from wgups.route import Route
+from wgups.route_factory import RouteFactory
+from wgups.savings_list import SavingsList
+from wgups.truck import Truck
+
+
+def test_compute_routes():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    routes = RouteFactory(pt, dt).compute_routes(SavingsList(pt, dt), Truck(1))
+    assert len(routes) > 0
+
+    for route in routes:
+        package_ids = [p.package_id for p in route.deliveries]
+        assert len(package_ids) == len(set(package_ids))
+        assert set(package_ids) == route.packages
+        assert all(p.status == "at the hub" for p in route.deliveries)
+        assert route.has_incomplete_group() == None
+        assert route.verify_deliveries(route.deliveries)
+
+
+def test_compute_lone_routes():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    route_factory = RouteFactory(pt, dt)
+
+    routes = route_factory.compute_lone_routes(Truck(2))
+    at_hub = [p.package_id for p in pt.get_packages_at_hub()]
+    assert len(routes) > 0
+    for route in routes:
+        assert route.has_incomplete_group() == None
+        assert route.verify_deliveries(route.deliveries)
+        # a route is only as large as a package and its group
+        assert len(route.deliveries) == pt.get_group_size(route.deliveries[0].group_id)
+        assert route.packages <= set(at_hub)
+
+    # before the next arrival, only the packages that can not wait for it are routed, here package 15 due at 9:00 AM
+    # which can only go with its group
+    routes = route_factory.compute_lone_routes(Truck(2), 545)
+    assert len(routes) == 1
+    assert 15 in routes[0].packages
+    assert len(routes[0].deliveries) == pt.get_group_size(routes[0].deliveries[0].group_id)
+
+
+def test_add_urgent_packages():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    route_factory = RouteFactory(pt, dt)
+
+    route = Route(480, 1, dt, pt)
+    assert route.insert_package(2)
+    route_factory.add_urgent_packages(route, 620)
+
+    assert route.verify_deliveries(route.deliveries)
+    urgent = route.packages - {2}
+    assert len(urgent) > 0
+    for package in pt.get_packages_at_hub():
+        if package.package_id in urgent:
+            assert package.constraints.deadline < 1440
+            assert pt.get_group_size(package.group_id) == 1
+        elif package.constraints.deadline < 1440 and pt.get_group_size(package.group_id) == 1:
+            # the packages left out can still be delivered on time by the next truck
+            assert Route(620, 1, dt, pt).insert_package(package.package_id)
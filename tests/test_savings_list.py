@@ -0,0 +1,165 @@
+import pytest
+
+from wgups import savings_list as savings_module
+from wgups.distance_table import DistanceTable
+from wgups.package_table import PackageTable
+from wgups.savings_list import SavingsList
+
+
+def test_savings_sorted_descending():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    savings_list = SavingsList(pt, dt)
+    savings = [s for s, _, _ in savings_list]
+
+    # 35 packages are at the hub at the start of the day
+    assert len(savings_list) == 35 * 34 // 2
+    assert savings == sorted(savings, reverse=True)
+
+    s, p1, p2 = savings_list[0]
+    assert s == savings_list.calculate_savings(p1, p2)
+
+
+def test_delayed_packages_excluded():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    savings_list = SavingsList(pt, dt)
+
+    for _, p1, p2 in savings_list:
+        assert 6 not in (p1, p2) and 9 not in (p1, p2)
+
+
+@pytest.mark.parametrize("priority_modifier", [0.0, 0.37, 1.5])
+def test_vectorized_matches_pure_python(monkeypatch, priority_modifier):
+    pytest.importorskip("numpy")
+
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    pt.update_statuses(620.0)
+
+    vectorized = list(SavingsList(pt, dt, priority_modifier))
+    monkeypatch.setattr(savings_module, "np", None)
+    pure_python = list(SavingsList(pt, dt, priority_modifier))
+
+    assert vectorized == pure_python
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_update_matches_rebuild(monkeypatch, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(savings_module, "np", None)
+
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    savings_list = SavingsList(pt, dt, 0.42)
+
+    # deliver a few packages, then let the delayed packages arrive at the hub
+    for package_id in [1, 2, 13, 40]:
+        package = pt.get_package(package_id)
+        assert package != None
+        package.status = "delivered"
+    savings_list.update()
+    assert list(savings_list) == list(SavingsList(pt, dt, 0.42))
+
+    pt.update_statuses(620.0)
+    savings_list.update()
+    rebuilt = SavingsList(pt, dt, 0.42)
+    assert len(savings_list) == len(rebuilt)
+    assert list(savings_list) == list(rebuilt)
+    assert savings_list[5] == rebuilt[5]
+
+    # only the status changes since the last update are read, and a reset table is read again in full
+    assert savings_list.changes_seen == len(pt.store.changes)
+    pt.reset()
+    savings_list.update()
+    assert list(savings_list) == list(SavingsList(pt, dt, 0.42))
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_sparse_list_pairs_nearest_neighbors(monkeypatch, vectorized):
+    if vectorized:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(savings_module, "np", None)
+
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+
+    # with every other package as a neighbor the sparse list is the dense list
+    assert list(SavingsList(pt, dt, 0.42, neighbors=34)) == list(
+        SavingsList(pt, dt, 0.42)
+    )
+
+    savings_list = SavingsList(pt, dt, 0.42, neighbors=3)
+    pairs = list(savings_list)
+    assert len(savings_list) == len(pairs) < 35 * 3
+    assert [s for s, _, _ in pairs] == sorted((s for s, _, _ in pairs), reverse=True)
+
+    at_hub = pt.get_packages_at_hub()
+    for package in at_hub:
+        distances = sorted(
+            dt.get_package_distance(package.package_id, other.package_id)
+            for other in at_hub
+            if other is not package
+        )
+        partners = [
+            p2 if p1 == package.package_id else p1
+            for _, p1, p2 in pairs
+            if package.package_id in (p1, p2)
+        ]
+        assert len(partners) >= 3
+        nearest = [
+            dt.get_package_distance(package.package_id, p) for p in partners
+        ]
+        assert sorted(nearest)[:3] == distances[:3]
+
+
+def test_sparse_vectorized_matches_pure_python(monkeypatch):
+    pytest.importorskip("numpy")
+
+    def build_and_update():
+        pt = PackageTable("resources/WGUPS Package File.csv")
+        dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+        savings_list = SavingsList(pt, dt, 0.42, neighbors=2)
+        results = [list(savings_list)]
+
+        for package_id in [1, 2, 13, 40, 4, 5, 7]:
+            package = pt.get_package(package_id)
+            assert package != None
+            package.status = "delivered"
+        pt.update_statuses(620.0)
+        savings_list.update()
+        results.append(list(savings_list))
+        return results
+
+    vectorized = build_and_update()
+    monkeypatch.setattr(savings_module, "np", None)
+    assert vectorized == build_and_update()
+
+
+def test_sparse_update_pairs_isolated_packages():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    savings_list = SavingsList(pt, dt, 0.0, neighbors=1)
+
+    # deliver every partner of a package, which leaves it without pairs until the list is updated
+    lonely = savings_list[0][1]
+    for _, p1, p2 in list(savings_list):
+        if lonely in (p1, p2):
+            partner = p2 if p1 == lonely else p1
+            package = pt.get_package(partner)
+            assert package != None
+            package.status = "delivered"
+    savings_list.update()
+
+    at_hub = {p.package_id for p in pt.get_packages_at_hub()}
+    pairs = list(savings_list)
+    assert any(lonely in (p1, p2) for _, p1, p2 in pairs)
+    for _, p1, p2 in pairs:
+        assert p1 in at_hub and p2 in at_hub
+    assert len(savings_list) == len(pairs)
@@ -0,0 +1,108 @@
+import pickle
+
+from wgups.distance_table import DistanceTable
+from wgups.package_table import PackageTable
+from wgups.snapshot import compile_snapshot, is_snapshot
+from wgups.solution_factory import SolutionFactory
+
+PACKAGE_FILE_PATH = "resources/WGUPS Package File.csv"
+DISTANCE_FILE_PATH = "resources/WGUPS Distance Table.csv"
+
+CONSTRAINT_FIELDS = [
+    "deadline",
+    "delayed_until",
+    "updated_address",
+    "updated_zip_code",
+    "updated_address_index",
+    "required_truck",
+    "paired_packages",
+]
+
+
+def test_snapshot_matches_csv(tmp_path):
+    snapshot_path = compile_snapshot(
+        PACKAGE_FILE_PATH, DISTANCE_FILE_PATH, str(tmp_path / "wgups.snap")
+    )
+    assert is_snapshot(snapshot_path)
+    assert not is_snapshot(PACKAGE_FILE_PATH)
+
+    csv_pt = PackageTable(PACKAGE_FILE_PATH)
+    csv_dt = DistanceTable(DISTANCE_FILE_PATH, csv_pt)
+    pt = PackageTable(snapshot_path)
+    dt = DistanceTable(snapshot_path, pt)
+
+    assert pt.address_indices == csv_pt.address_indices
+    assert pt.group_sizes == csv_pt.group_sizes
+    assert dt.address_index_table == csv_dt.address_index_table
+
+    for csv_package, package in zip(csv_pt.get_package_list(), pt.get_package_list()):
+        assert package.package_id == csv_package.package_id
+        assert package.formatted_address() == csv_package.formatted_address()
+        assert package.deadline == csv_package.deadline
+        assert package.note == csv_package.note
+        assert package.status == csv_package.status
+        assert package.group_id == csv_package.group_id
+        assert package.tracking_info == csv_package.tracking_info
+        for field in CONSTRAINT_FIELDS:
+            assert getattr(package.constraints, field) == getattr(
+                csv_package.constraints, field
+            )
+
+    # float32 distances are within rounding of the CSV values
+    assert abs(dt.get_distance("1060 Dalton Ave S 84104", "HUB") - 7.2) < 1e-6
+    for i in range(1, 41):
+        assert abs(
+            dt.get_package_distance(0, i) - csv_dt.get_package_distance(0, i)
+        ) < 1e-6
+
+    # updated addresses resolve through the stored index
+    pt.update_statuses(1440.0)
+    assert dt.get_package_distance(0, 9) == dt.get_distance("HUB", "410 S State St 84111")
+
+
+def test_snapshot_with_csv_package_table(tmp_path):
+    snapshot_path = compile_snapshot(
+        PACKAGE_FILE_PATH, DISTANCE_FILE_PATH, str(tmp_path / "wgups.snap")
+    )
+
+    pt = PackageTable(PACKAGE_FILE_PATH)
+    DistanceTable(snapshot_path, pt)
+
+    assert pt.address_indices == PackageTable(snapshot_path).address_indices
+
+
+def test_double_snapshot_solution(tmp_path):
+    snapshot_path = compile_snapshot(
+        PACKAGE_FILE_PATH, DISTANCE_FILE_PATH, str(tmp_path / "wgups.snap"), "d"
+    )
+
+    factory = SolutionFactory(snapshot_path, snapshot_path)
+    csv_factory = SolutionFactory()
+
+    for modifier in [0.0, 0.5, 1.2]:
+        solution = factory.generate_solution(modifier)
+        csv_solution = csv_factory.generate_solution(modifier)
+        if csv_solution == None:
+            assert solution == None
+        else:
+            assert solution != None
+            assert solution.total_distance == csv_solution.total_distance
+
+
+def test_snapshot_tables_pickle(tmp_path):
+    snapshot_path = compile_snapshot(
+        PACKAGE_FILE_PATH, DISTANCE_FILE_PATH, str(tmp_path / "wgups.snap")
+    )
+    pt = PackageTable(snapshot_path)
+    dt = DistanceTable(snapshot_path, pt)
+
+    copy = pickle.loads(pickle.dumps(dt))
+    assert list(copy.distances) == list(dt.distances)
+    assert copy.get_package_distance(1, 2) == dt.get_package_distance(1, 2)
+
+    # the parsed package columns are views of the snapshot, copied only when pickled
+    assert isinstance(pt.store.deadlines, memoryview)
+    copy_pt = copy.package_table
+    assert list(copy_pt.store.deadlines) == list(pt.store.deadlines)
+    copy_pt.update_statuses(1440.0)
+    assert copy_pt.get_package(9).address == "410 S State St"
@@ -0,0 +1,25 @@
+from wgups.solution_factory import SolutionFactory
+
+
+def test_package_index_matches_routes():
+    solution = SolutionFactory().generate_solution(0.5)
+    assert solution != None
+
+    for t in solution.trucks:
+        assert solution.get_truck(t.id) is t
+        for r in t.routes:
+            for stop, p in enumerate(r.deliveries):
+                location = solution.find_package(p.package_id)
+                assert location != None
+                assert location.package is p
+                assert location.truck is t and location.route is r
+                assert location.stop == stop
+                assert location.delivery_time == p.tracking_info[-1][0]
+
+    assert solution.get_truck(9) == None
+    assert solution.find_package(1000) == None
+
+    locations = solution.find_packages([3, 1000, 1])
+    assert locations[0] != None and locations[0].package.package_id == 3
+    assert locations[1] == None
+    assert locations[2] != None and locations[2].package.package_id == 1
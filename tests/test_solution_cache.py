@@ -0,0 +1,49 @@
+from wgups.solution_cache import SolutionCache, cache_key
+from wgups.solution_factory import SolutionFactory
+
+
+def solution_state(solution):
+    return (
+        solution.total_distance,
+        [
+            [(r.departure_time, [p.package_id for p in r.deliveries]) for r in t.routes]
+            for t in solution.trucks
+        ],
+        [(p.address, p.status, p.tracking_info) for p in solution.get_package_list()],
+    )
+
+
+def test_cached_solution_round_trip(tmp_path):
+    factory = SolutionFactory()
+    modifiers = factory.priority_modifiers()[:6]
+    cache = SolutionCache(str(tmp_path))
+
+    assert cache.load(factory, modifiers) == None
+
+    solution = factory.generate_best_solution(1, modifiers)
+    assert solution != None
+    cache.store(factory, solution, modifiers)
+
+    cached = cache.load(factory, modifiers)
+    assert cached != None
+    assert solution_state(cached) == solution_state(solution)
+    assert [t.total_distance_travelled() for t in cached.trucks] == [
+        t.total_distance_travelled() for t in solution.trucks
+    ]
+
+    # other modifiers are a different sweep
+    assert cache.load(factory, modifiers[:5]) == None
+
+
+def test_cache_key_parameters():
+    factory = SolutionFactory()
+    modifiers = factory.priority_modifiers()
+
+    assert cache_key(factory, modifiers) == cache_key(SolutionFactory(), modifiers)
+    assert cache_key(factory, modifiers) != cache_key(factory, modifiers[:-1])
+    assert cache_key(factory, modifiers) != cache_key(
+        SolutionFactory(improve_solutions=False), modifiers
+    )
+    assert cache_key(factory, modifiers) == cache_key(
+        SolutionFactory(prune_runs=False, reuse_dispatches=False), modifiers
+    )
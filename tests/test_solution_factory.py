@@ -0,0 +1,198 @@
+from wgups.dispatch_tree import DispatchTree
+from wgups.instance_generator import InstanceGenerator
+from wgups.metrics import REJECTION_REASONS
+from wgups.route import Route
+from wgups.solution_factory import SolutionFactory
+
+
+def route_plans(solution):
+    if solution == None:
+        return None
+    return [
+        [(r.departure_time, [p.package_id for p in r.deliveries]) for r in t.routes]
+        for t in solution.trucks
+    ]
+
+
+def test_priority_modifiers():
+    modifiers = SolutionFactory().priority_modifiers()
+
+    assert len(modifiers) == 200
+    assert modifiers[0] == 0.0
+    assert modifiers == sorted(modifiers)
+
+
+def test_parallel_sweep_matches_serial():
+    factory = SolutionFactory()
+    modifiers = factory.priority_modifiers()[:12]
+
+    serial = factory.generate_best_solution(1, modifiers)
+    parallel = factory.generate_best_solution(3, modifiers)
+
+    assert serial != None and parallel != None
+    assert parallel.total_distance == serial.total_distance
+    assert [
+        [[p.package_id for p in r.deliveries] for r in t.routes] for t in parallel.trucks
+    ] == [
+        [[p.package_id for p in r.deliveries] for r in t.routes] for t in serial.trucks
+    ]
+
+
+def test_pruned_sweep_matches_full_sweep():
+    modifiers = SolutionFactory().priority_modifiers()[::5]
+
+    pruned = SolutionFactory(improve_solutions=False, prune_runs=True)
+    full = SolutionFactory(improve_solutions=False, prune_runs=False)
+    pruned_solution = pruned.generate_best_solution(1, modifiers)
+    full_solution = full.generate_best_solution(1, modifiers)
+
+    assert pruned_solution != None and full_solution != None
+    assert not pruned_solution.pruned
+    assert pruned_solution.total_distance == full_solution.total_distance
+
+
+def test_generate_solution_bound():
+    factory = SolutionFactory(improve_solutions=False)
+
+    solution = factory.generate_solution(1.0)
+    assert solution != None and not solution.pruned
+
+    # a bound that the run can not meet stops it after its first route
+    pruned = factory.generate_solution(1.0, 10.0)
+    assert pruned != None and pruned.pruned
+    assert len([r for t in pruned.trucks for r in t.routes]) == 1
+    assert factory.select_best_solution([pruned]) == None
+
+    # the lower bound never exceeds the distance left to drive
+    pt = factory.package_table.clone()
+    assert 0 < factory.remaining_lower_bound(pt) <= solution.total_distance
+
+    # brought up to date route by route, the bound matches the full sum, through package 9 getting its new address
+    dt = factory.distance_table.with_package_table(pt)
+    remaining = factory.remaining_lower_bound(pt)
+    readdressed = {
+        row: factory.package_lower_bound(pt, row) for row in factory.readdressed_rows
+    }
+    assert len(readdressed) == 1
+    routes = sorted(
+        (r for t in solution.trucks for r in t.routes), key=lambda r: r.departure_time
+    )
+    for solved_route in routes:
+        pt.update_statuses(solved_route.departure_time)
+        route = Route(solved_route.departure_time, solved_route.truck_id, dt, pt)
+        for solved_package in solved_route.deliveries:
+            package = pt.get_package(solved_package.package_id)
+            assert package != None
+            package.status = "delivered"
+            route.deliveries.append(package)
+        remaining -= factory.delivered_lower_bound(pt, route, readdressed)
+        assert abs(remaining - factory.remaining_lower_bound(pt)) < 1e-9
+    assert abs(remaining) < 1e-9
+
+
+def test_readdressed_lower_bound(tmp_path):
+    package_file_path, distance_file_path = InstanceGenerator(
+        package_count=60, readdressed_share=0.1, seed=4
+    ).write(str(tmp_path))
+    factory = SolutionFactory(
+        package_file_path, distance_file_path, improve_solutions=False
+    )
+    nearest_distances = factory.nearest_distances
+    pt = factory.package_table.clone()
+    store = pt.store
+
+    # until its address is updated, a package is charged the nearer of its two addresses
+    closer = [
+        row
+        for row in factory.readdressed_rows
+        if nearest_distances[store.updated_address_indices[row]]
+        < nearest_distances[store.address_indices[row]]
+    ]
+    assert len(closer) > 0
+    for row in closer:
+        assert factory.package_lower_bound(pt, row) == nearest_distances[
+            store.updated_address_indices[row]
+        ]
+
+    # so the bound never exceeds the distance left to drive, and pruning keeps the best solution
+    modifiers = factory.priority_modifiers()[::10]
+    solution = factory.generate_best_solution(1, modifiers)
+    assert solution != None
+    assert factory.remaining_lower_bound(pt) <= solution.total_distance
+    full = SolutionFactory(
+        package_file_path, distance_file_path, improve_solutions=False, prune_runs=False
+    ).generate_best_solution(1, modifiers)
+    assert full != None
+    assert solution.total_distance == full.total_distance
+
+    pt.update_statuses(1440)
+    for row in factory.readdressed_rows:
+        assert store.address_indices[row] == store.updated_address_indices[row]
+        assert factory.package_lower_bound(pt, row) == nearest_distances[
+            store.address_indices[row]
+        ]
+
+
+def test_reused_sweep_matches_full_sweep():
+    factory = SolutionFactory(improve_solutions=False, prune_runs=False)
+    tree = DispatchTree(factory.package_table)
+
+    # every run that follows the tree makes the same dispatches as a run that builds all of its routes
+    for priority_modifier in factory.priority_modifiers()[::2]:
+        reused = factory.generate_solution(priority_modifier, tree=tree)
+        full = factory.generate_solution(priority_modifier)
+        assert route_plans(reused) == route_plans(full)
+
+    assert len(tree.root.branches) > 1
+
+
+def test_sparse_sweep():
+    factory = SolutionFactory(improve_solutions=False, prune_runs=False, neighbors=5)
+    tree = DispatchTree(factory.package_table)
+
+    # the pairs of a sparse list do not depend on the modifier, so dispatches are reused the same way
+    solutions = []
+    for priority_modifier in factory.priority_modifiers()[::10]:
+        reused = factory.generate_solution(priority_modifier, tree=tree)
+        full = factory.generate_solution(priority_modifier)
+        assert route_plans(reused) == route_plans(full)
+        solutions.append(full)
+
+    solution = factory.select_best_solution(solutions)
+    assert solution != None
+    delivered = [p.package_id for t in solution.trucks for p in t.packages]
+    assert sorted(delivered) == list(range(1, 41))
+
+
+def test_profiled_sweep():
+    modifiers = SolutionFactory().priority_modifiers()[::50]
+    plain = SolutionFactory(improve_solutions=False)
+    profiled = SolutionFactory(improve_solutions=False, profile=True)
+
+    solution = profiled.generate_best_solution(1, modifiers)
+    assert solution != None
+    plain_solution = plain.generate_best_solution(1, modifiers)
+    assert plain_solution != None
+    assert solution.total_distance == plain_solution.total_distance
+    assert plain.sweep_metrics == None
+
+    # the sweep sums the metrics of every solve, including the solve of the best solution
+    metrics = profiled.sweep_metrics
+    assert metrics != None and solution.metrics != None
+    assert metrics.counters["solves"] == len(modifiers)
+    for name, value in solution.metrics.counters.items():
+        assert 0 < value <= metrics.counters[name]
+    assert metrics.counters["distance_lookups"] > 0
+    for counter in ("verify_deliveries", "feasibility_checks"):
+        rejected = [
+            metrics.counters.get(f"{counter}.{reason}", 0)
+            for reason in REJECTION_REASONS
+        ]
+        assert metrics.counters[counter] >= sum(rejected)
+    # routes are mostly checked from their cached timing while being extended and merged, which turns proposals
+    # down for every reason
+    assert metrics.counters["feasibility_checks"] > metrics.counters["verify_deliveries"]
+    for reason in REJECTION_REASONS:
+        assert metrics.counters[f"feasibility_checks.{reason}"] > 0
+    for phase in ("load", "savings", "routes", "groups", "simulation"):
+        assert metrics.timers[phase] > 0
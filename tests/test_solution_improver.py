@@ -0,0 +1,69 @@
+from wgups.solution_factory import SolutionFactory
+from wgups.solution_improver import SolutionImprover
+
+
+def route_plans(solution):
+    return [[[p.package_id for p in r.deliveries] for r in t.routes] for t in solution.trucks]
+
+
+def test_improve_solution():
+    factory = SolutionFactory(improve_routes=False, improve_solutions=False)
+    solution = factory.generate_solution(0.5)
+    assert solution != None
+
+    plans = route_plans(solution)
+    total_distance = solution.total_distance
+    tracking = [list(p.tracking_info) for p in solution.get_package_list()]
+
+    improved = SolutionImprover().improve(solution)
+
+    assert improved.total_distance < total_distance
+    assert abs(
+        improved.total_distance
+        - sum(r.route_distance() for t in improved.trucks for r in t.routes)
+    ) < 1e-9
+
+    # the provided solution is left as it was
+    assert route_plans(solution) == plans
+    assert solution.total_distance == total_distance
+    assert [p.tracking_info for p in solution.get_package_list()] == tracking
+
+    packages = improved.get_package_list()
+    assert [p.package_id for p in packages] == list(range(1, 41))
+
+    pt = improved.trucks[0].routes[0].package_table
+    for truck in improved.trucks:
+        for i, route in enumerate(truck.routes):
+            assert len(route.deliveries) <= 16
+            if i + 1 < len(truck.routes):
+                assert route.route_finish_time() <= truck.routes[i + 1].departure_time
+
+            for package in route.deliveries:
+                constraints = package.constraints
+                assert constraints.required_truck in (None, truck.id)
+                assert constraints.delayed_until <= route.departure_time
+                assert package.status == "delivered"
+
+                # tracking ends with the departure and the delivery, in time for the deadline
+                departed, delivered = package.tracking_info[-2:]
+                assert departed[1].endswith(f"Departed HUB on Truck {truck.id}")
+                assert delivered[0] <= constraints.deadline
+
+                # grouped packages stay in one route
+                group = pt.get_package_group(package.package_id)
+                assert all(route.contains_package(p) for p in group)
+
+
+def test_improve_until_no_moves():
+    factory = SolutionFactory(improve_routes=False, improve_solutions=False)
+    solution = factory.generate_solution(0.5)
+    assert solution != None
+
+    # improving again only returns a new solution when it is shorter, until no move is left
+    for _ in range(10):
+        improved = SolutionImprover().improve(solution)
+        if improved is solution:
+            break
+        assert improved.total_distance < solution.total_distance
+        solution = improved
+    assert SolutionImprover().improve(solution) is solution
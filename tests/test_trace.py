@@ -0,0 +1,76 @@
+import io
+import json
+import pickle
+import sys
+
+import pytest
+
+from wgups.solution_factory import SolutionFactory
+from wgups.trace import HumanSink, JsonLinesSink, NullSink, TraceEvent, TraceSink
+
+
+class RecordingSink(TraceSink):
+    def __init__(self):
+        self.events: list[TraceEvent] = []
+
+    def emit(self, event: TraceEvent):
+        self.events.append(event)
+
+
+def test_sink_must_implement_emit():
+    class SilentSink(TraceSink):
+        pass
+
+    with pytest.raises(TypeError):
+        SilentSink()
+
+
+def test_null_sink_is_silent(capsys):
+    factory = SolutionFactory(improve_solutions=False)
+    assert isinstance(factory.trace, NullSink)
+    factory.generate_solution(1.0)
+    assert capsys.readouterr().out == ""
+
+
+def test_dispatch_events():
+    sink = RecordingSink()
+    factory = SolutionFactory(improve_solutions=False, trace=sink)
+    solution = factory.generate_solution(1.0)
+    assert solution != None
+
+    kinds = [event.kind for event in sink.events]
+    assert kinds[0] == "packages_loaded"
+    assert kinds[1:3] == ["truck_available", "savings_list_updated"]
+
+    # one selected route per route driven, in the order they were dispatched
+    selected = [event for event in sink.events if event.kind == "route_selected"]
+    routes = sorted(
+        (r for t in solution.trucks for r in t.routes),
+        key=lambda r: (r.departure_time, r.truck_id),
+    )
+    assert sorted(
+        [(e.departure_time, e.truck_id, e.package_ids) for e in selected]
+    ) == [(r.departure_time, r.truck_id, [p.package_id for p in r.deliveries]) for r in routes]
+
+
+def test_human_and_jsonl_sinks(tmp_path):
+    stream = io.StringIO()
+    path = tmp_path / "trace.jsonl"
+    jsonl = JsonLinesSink(str(path))
+
+    SolutionFactory(trace=HumanSink(stream))
+    SolutionFactory(trace=jsonl)
+    jsonl.close()
+
+    assert stream.getvalue() == "Loaded 40 packages\n"
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records == [{"event": "packages_loaded", "count": 40}]
+
+
+def test_factory_with_human_sink_pickles():
+    # sweep workers started with spawn receive the factory pickled, trace sink included
+    for stream in [sys.stdout, sys.stderr, None]:
+        factory = SolutionFactory(improve_solutions=False, trace=HumanSink(stream))
+        copied = pickle.loads(pickle.dumps(factory))
+        assert isinstance(copied.trace, HumanSink)
+        assert copied.trace.stream is stream
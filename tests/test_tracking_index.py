@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+from wgups.solution_factory import SolutionFactory
+from wgups.tracking_index import TrackingIndex, event_status
+
+
+def solved():
+    solution = SolutionFactory().generate_solution(0.5)
+    assert solution != None
+    return solution
+
+
+def test_status_matches_package_tracking():
+    solution = solved()
+    index = solution.get_tracking_index()
+
+    for package in solution.get_package_list():
+        for time in [0.0, 480.0, 545.0, 600.0, 1440.0]:
+            info = package.get_tracking_info(time)
+            row = index.status_at(package.package_id, time)
+            assert index.tracking_info(package.package_id, time) == info
+            if len(info) == 0:
+                assert row == None
+            else:
+                assert row != None
+                assert row.info == info[-1]
+                assert row.status == event_status(info[-1].split(" - ", 1)[1])
+
+    assert index.status_at(1000) == None
+
+
+def test_snapshot_filters():
+    solution = solved()
+    index = solution.get_tracking_index()
+
+    rows = list(index.snapshot(600.0))
+    assert [row.package_id for row in rows] == sorted(row.package_id for row in rows)
+    assert len(rows) == len(solution.get_package_list())
+
+    delivered = list(index.snapshot(600.0, status="delivered"))
+    assert len(delivered) > 0
+    assert [row.package_id for row in delivered] == [
+        row.package_id for row in rows if row.status == "delivered"
+    ]
+
+    truck = solution.trucks[0]
+    on_truck = list(index.snapshot(1440.0, truck_id=truck.id))
+    assert sorted(row.package_id for row in on_truck) == sorted(
+        p.package_id for p in truck.packages
+    )
+    assert all(row.status == "delivered" for row in on_truck)
+
+    at_risk = list(index.snapshot(540.0, at_risk=True))
+    for row in at_risk:
+        assert row.status != "delivered"
+        assert row.deadline - 540.0 <= 60.0
+    assert list(index.snapshot(1440.0, at_risk=True)) == []
+
+
+def test_snapshot_without_numpy(monkeypatch):
+    solution = solved()
+    index = solution.get_tracking_index()
+    expected = [
+        (row.package_id, row.info)
+        for row in index.snapshot(560.0, status="en route", at_risk=True, risk_window=200.0)
+    ]
+
+    monkeypatch.setattr("wgups.tracking_index.np", None)
+    fallback = TrackingIndex(solution.get_package_list(), solution.trucks)
+    assert [
+        (row.package_id, row.info)
+        for row in fallback.snapshot(560.0, status="en route", at_risk=True, risk_window=200.0)
+    ] == expected
+
+
+def test_pages():
+    index = solved().get_tracking_index()
+    rows = list(index.snapshot(1440.0))
+
+    pages = list(index.pages(index.snapshot(1440.0), 7))
+    assert all(len(page) == 7 for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= 7
+    assert [row.package_id for page in pages for row in page] == [
+        row.package_id for row in rows
+    ]
+
+
+def test_events_between():
+    solution = solved()
+    index = solution.get_tracking_index()
+
+    events = index.events_between(540.0, 600.0)
+    assert [row.time for row in events] == sorted(row.time for row in events)
+    assert all(540.0 <= row.time <= 600.0 for row in events)
+    assert len(events) == sum(
+        1
+        for p in solution.get_package_list()
+        for time, _ in p.tracking_info
+        if 540.0 <= time <= 600.0
+    )
+
+
+
+def test_latest_events_keep_fractional_times():
+    # with this many packages a float key of position * span + time rounds these two times together
+    times = [480.0, 600.0 - 1e-9, 600.0]
+    packages = [
+        SimpleNamespace(
+            package_id=package_id,
+            constraints=SimpleNamespace(deadline=1440),
+            tracking_info=[(time, f"{time} - At the hub") for time in times],
+        )
+        for package_id in range(100_000)
+    ]
+    index = TrackingIndex(packages, [])
+
+    events = index.latest_events(600.0 - 1e-9)
+    assert events == [index._latest_event(i, 600.0 - 1e-9) for i in range(len(packages))]
+    assert events[-1] == len(index.times) - 2
+    assert index.latest_events(600.0)[-1] == len(index.times) - 1
+    assert index.latest_events(100.0)[-1] == -1
@@ -0,0 +1,79 @@
+import wgups.zones as zones_module
+from wgups.distance_table import DistanceTable
+from wgups.instance_generator import InstanceGenerator
+from wgups.package_table import PackageTable
+from wgups.solution_factory import SolutionFactory
+from wgups.zones import ZoneRouter, partition_packages
+
+
+def load_tables():
+    pt = PackageTable("resources/WGUPS Package File.csv")
+    dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+    return pt, dt
+
+
+def test_partition_keeps_groups_whole():
+    pt, dt = load_tables()
+    packages = pt.get_package_list()
+    zones = partition_packages(pt, dt, packages, 4)
+
+    assert 1 < len(zones) <= 4
+    assert sorted(p.package_id for zone in zones for p in zone) == list(
+        range(1, 41)
+    )
+    for zone in zones:
+        assert [p.row for p in zone] == sorted(p.row for p in zone)
+        for package in zone:
+            assert set(pt.get_package_group(package.package_id)) <= {
+                p.package_id for p in zone
+            }
+
+    assert partition_packages(pt, dt, packages, 1) == [packages]
+    assert partition_packages(pt, dt, [], 4) == []
+
+
+def test_partition_without_numpy(monkeypatch):
+    pt, dt = load_tables()
+    packages = pt.get_package_list()
+    expected = partition_packages(pt, dt, packages, 4)
+
+    monkeypatch.setattr(zones_module, "np", None)
+    assert partition_packages(pt, dt, packages, 4) == expected
+
+
+def test_zone_solution_is_valid():
+    solution = SolutionFactory(zones=3).generate_solution(0.5)
+    assert solution != None
+
+    delivered = [p for t in solution.trucks for p in t.packages]
+    assert sorted(p.package_id for p in delivered) == list(range(1, 41))
+    for t in solution.trucks:
+        for p in t.packages:
+            assert p.constraints.required_truck in [None, t.id]
+            assert p.tracking_info[-1][0] <= p.constraints.deadline
+
+
+def test_zone_workers_match_serial(tmp_path):
+    generator = InstanceGenerator(
+        package_count=200,
+        deadline_share=0.0,
+        delayed_share=0.0,
+        restricted_share=0.0,
+        group_count=0,
+        seed=3,
+    )
+    package_file_path, distance_file_path = generator.write(str(tmp_path))
+    factory = SolutionFactory(
+        package_file_path, distance_file_path, zones=4, truck_count=5, driver_count=5
+    )
+
+    serial = factory.generate_solution(0.5)
+    with ZoneRouter(factory, 2) as zone_router:
+        pooled = factory.generate_solution(0.5, zone_router=zone_router)
+
+    assert serial != None and pooled != None
+    assert pooled.total_distance == serial.total_distance
+    for serial_truck, pooled_truck in zip(serial.trucks, pooled.trucks):
+        assert [p.package_id for p in serial_truck.packages] == [
+            p.package_id for p in pooled_truck.packages
+        ]
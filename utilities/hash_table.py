@@ -1,60 +1,212 @@
-from typing import TypeVar, Generic, List, Tuple, Optional, Hashable
+from array import array
+from typing import (
+    TypeVar,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    Optional,
+    Hashable,
+)
 
 K = TypeVar("K", bound=Hashable)
 V = TypeVar("V")
 
+# Markers for slots in the index that have never been used or whose entry was removed
+EMPTY = -1
+DELETED = -2
+
+MIN_SIZE = 8
+
+# The index grows once two thirds of its slots are used (including removed slots),
+# and shrinks once less than an eighth of them hold live entries
+MAX_LOAD_FACTOR = 2 / 3
+MIN_LOAD_FACTOR = 1 / 8
+
+PERTURB_SHIFT = 5
+
+# Marks the hash of an entry that was removed. hash() never returns -1, so no live entry has it
+REMOVED = -1
+
 
 class HashTable(Generic[K, V]):
     """
-    A basic hash table implementation that uses chaining with arrays to handle collisions.
+    A hash table implementation that uses open addressing to handle collisions.
+    Entries are stored in insertion order in parallel key, value and hash arrays, and a separate index of slots points into them. The index resizes itself based on its load factor so lookups stay O(1) at any size.
+    The index is an int32 array of entry positions and the hashes an int64 array. Given array typecodes, integer keys and values are stored in arrays as well, so a table of ints holds no object per entry.
     """
 
-    def __init__(self):
-        self.size = 40
-        self.table: List[List[Tuple[K, V]]] = [[] for _ in range(self.size)]
+    def __init__(
+        self,
+        capacity: int = 0,
+        key_type: Optional[str] = None,
+        value_type: Optional[str] = None,
+    ):
         self.length = 0
+        self.key_type = key_type
+        self.value_type = value_type
+        self._allocate(capacity)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[K, V]]) -> "HashTable[K, V]":
+        """
+        Builds a hash table from key value pairs, sizing the index once up front rather than growing it while inserting.
+        """
+        items = list(items)
+        table = cls(len(items))
+        for key, value in items:
+            table.insert(key, value)
+        return table
 
-    def hash(self, key: K):
-        hash_value = hash(key) % self.size
+    @classmethod
+    def from_columns(
+        cls,
+        keys: Iterable[K],
+        values: Iterable[V],
+        key_type: Optional[str] = None,
+        value_type: Optional[str] = None,
+    ) -> "HashTable[K, V]":
+        """
+        Builds a hash table from parallel columns of distinct keys and their values. The columns are copied into the entry arrays at once, so only the index is filled key by key.
+        """
+        keys = list(keys) if key_type == None else array(key_type, keys)
+        table = cls(len(keys), key_type, value_type)
+        table.keys = keys
+        table.values = list(values) if value_type == None else array(value_type, values)
+        table.hashes = array("q", map(hash, keys))
+        indices = table.indices
+        for index, (key, key_hash) in enumerate(zip(keys, table.hashes)):
+            indices[table._find(key, key_hash)[0]] = index
+        table.used_slots = table.length = len(keys)
+        return table
+
+    def _allocate(self, capacity: int):
+        # the index size is a power of two large enough to hold capacity entries below the maximum load factor
+        size = MIN_SIZE
+        while capacity >= size * MAX_LOAD_FACTOR:
+            size *= 2
+
+        self.size = size
+        self.indices = array("i", [EMPTY]) * size
+        self.keys = [] if self.key_type == None else array(self.key_type)
+        self.values = [] if self.value_type == None else array(self.value_type)
+        self.hashes = array("q")
+        # slots in the index that are not EMPTY, removed entries keep their slot until the next resize
+        self.used_slots = 0
+        # DELETED slots in the index, which an insert can reuse
+        self.deleted_slots = 0
+        # entries of the key, value and hash arrays that were removed, compacted away by the next resize
+        self.removed_entries = 0
+
+    def hash(self, key: K) -> int:
+        hash_value = hash(key) & (self.size - 1)
         return hash_value
 
+    def _find(self, key: K, key_hash: int) -> Tuple[int, int]:
+        """
+        Returns the slot and entry index of the key, or the slot the key should be inserted into and EMPTY if it is missing.
+        """
+        # Probes every slot of the index, starting from the hash and mixing in the higher bits of the hash as it goes
+        mask = self.size - 1
+        perturb = key_hash & 0xFFFFFFFFFFFFFFFF
+        slot = key_hash & mask
+        insert_slot = EMPTY
+        while True:
+            index = self.indices[slot]
+            if index == EMPTY:
+                return (slot if insert_slot == EMPTY else insert_slot), EMPTY
+            if index == DELETED:
+                if insert_slot == EMPTY:
+                    insert_slot = slot
+            elif self.hashes[index] == key_hash and self.keys[index] == key:
+                return slot, index
+            perturb >>= PERTURB_SHIFT
+            slot = (slot * 5 + perturb + 1) & mask
+
+    def _resize(self, capacity: int):
+        keys, values, hashes = self.keys, self.values, self.hashes
+        self._allocate(capacity)
+        for key, value, key_hash in zip(keys, values, hashes):
+            if key_hash != REMOVED:
+                self._append(key, value, key_hash)
+
+    def _append(self, key: K, value: V, key_hash: int, slot: Optional[int] = None):
+        if slot is None:
+            slot = self._find(key, key_hash)[0]
+        if self.indices[slot] == EMPTY:
+            self.used_slots += 1
+        elif self.indices[slot] == DELETED:
+            self.deleted_slots -= 1
+        self.indices[slot] = len(self.keys)
+        self.keys.append(key)
+        self.values.append(value)
+        self.hashes.append(key_hash)
+
     def insert(self, key: K, value: V):
-        hash_value = self.hash(key)
-        if self.table[hash_value] is None:
-            self.table[hash_value] = [(key, value)]
-        else:
-            for index, item in enumerate(self.table[hash_value]):
-                if item[0] == key:
-                    self.table[hash_value][index] = (key, value)
-                    return
-            self.table[hash_value].append((key, value))
+        key_hash = hash(key)
+        slot, index = self._find(key, key_hash)
+        if index != EMPTY:
+            self.values[index] = value
+            return
+
+        if self.used_slots + 1 > self.size * MAX_LOAD_FACTOR:
+            self._resize(self.length + 1)
+            slot = None
+
+        self._append(key, value, key_hash, slot)
         self.length += 1
 
     def get(self, key: K) -> Optional[V]:
-        hash_value = self.hash(key)
-        if self.table[hash_value] is None:
-            return None
-        else:
-            for item in self.table[hash_value]:
-                if item[0] == key:
-                    return item[1]
+        index = self._find(key, hash(key))[1]
+        if index == EMPTY:
             return None
+        return self.values[index]
 
     def remove(self, key: K):
-        hash_value = self.hash(key)
-        if self.table[hash_value] is not None:
-            for index, item in enumerate(self.table[hash_value]):
-                if item[0] == key:
-                    self.table[hash_value].pop(index)
-                    self.length -= 1
-                    return
+        slot, index = self._find(key, hash(key))
+        if index == EMPTY:
+            return
+
+        self.indices[slot] = DELETED
+        self.deleted_slots += 1
+        self.hashes[index] = REMOVED
+        # objects of removed entries are released, ints in arrays are left until the next resize
+        if self.key_type == None:
+            self.keys[index] = None
+        if self.value_type == None:
+            self.values[index] = None
+        self.removed_entries += 1
+        self.length -= 1
+
+        # reinserted keys reuse their DELETED slot but always append a new entry, so the arrays are also
+        # compacted once removed entries outnumber the live ones
+        if (self.size > MIN_SIZE and self.length < self.size * MIN_LOAD_FACTOR) or (
+            self.removed_entries > max(self.length, MIN_SIZE)
+        ):
+            self._resize(self.length)
 
     def items(self) -> List[Tuple[K, V]]:
-        items = []
-        for bucket in self.table:
-            for item in bucket:
-                items.append(item)
-        return items
+        return list(self.iter_items())
+
+    def iter_items(self) -> Iterator[Tuple[K, V]]:
+        """
+        Yields the key value pairs in insertion order without building a list.
+        """
+        for key, value, key_hash in zip(self.keys, self.values, self.hashes):
+            if key_hash != REMOVED:
+                yield key, value
+
+    def __iter__(self) -> Iterator[K]:
+        for key, key_hash in zip(self.keys, self.hashes):
+            if key_hash != REMOVED:
+                yield key
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __contains__(self, key: K) -> bool:
+        return self._find(key, hash(key))[1] != EMPTY
 
     def __getitem__(self, key: K) -> Optional[V]:
         return self.get(key)
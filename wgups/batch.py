@@ -0,0 +1,220 @@
+import csv
+import json
+import re
+from typing import Iterable, Iterator, Optional, TextIO
+
+from wgups.solution import Solution
+from wgups.tracking_index import PackageStatus
+
+BATCH_FORMATS = ["jsonl", "csv"]
+
+# columns of the csv format, a record leaves the columns that do not apply to its query empty
+FIELDS = [
+    "line",
+    "query",
+    "package_id",
+    "time",
+    "status",
+    "info",
+    "truck_id",
+    "stop",
+    "delivery_time",
+    "deadline",
+    "destination",
+    "distance",
+    "finish_time",
+    "package_ids",
+    "error",
+]
+
+# tokens of a query are separated by spaces, tabs or commas
+SEPARATOR = re.compile(r"[\s,]+")
+
+
+def parse_time(time_str: str) -> float:
+    """
+    Returns the minutes since midnight of a time string from 00:00 to 24:00, as entered in the REPL.
+    """
+    hour_str, _, minute_str = time_str.partition(":")
+    if not hour_str.isdigit() or not minute_str.isdigit():
+        raise ValueError(f"Invalid time string: {time_str}")
+    time = int(hour_str) * 60 + int(minute_str)
+    if int(minute_str) >= 60 or time > 1440:
+        raise ValueError(f"Invalid time string: {time_str}")
+    return float(time)
+
+
+class BatchQuery:
+    """
+    One line of a batch file, using the commands of the REPL: "p <package ID or all> [time]" tracks packages, by default at the end of the day, and "t <truck ID>" shows a truck.
+    """
+
+    def __init__(self, line: int, kind: str, target: Optional[int], time: float):
+        self.line = line
+        # "package" or "truck"
+        self.kind = kind
+        # the package or truck ID, None for every package
+        self.target = target
+        self.time = time
+
+    @classmethod
+    def parse(cls, line: int, text: str) -> "BatchQuery":
+        """
+        Parses the text of a query, raising ValueError if it is not a valid query.
+        """
+        tokens = SEPARATOR.split(text.strip())
+        command = tokens[0].lower()
+        if command == "p" and len(tokens) in [2, 3]:
+            time = parse_time(tokens[2]) if len(tokens) == 3 else 1440.0
+            if tokens[1].lower() == "all":
+                return cls(line, "package", None, time)
+            if tokens[1].isdigit():
+                return cls(line, "package", int(tokens[1]), time)
+            raise ValueError(f"Invalid package ID: {tokens[1]}")
+        if command == "t" and len(tokens) == 2:
+            if tokens[1].isdigit():
+                return cls(line, "truck", int(tokens[1]), 1440.0)
+            raise ValueError(f"Invalid truck id: {tokens[1]}")
+        raise ValueError(f"Invalid query: {text.strip()}")
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """
+    Yields the line number and text of every query, skipping blank lines and comments starting with #.
+    """
+    for number, text in enumerate(lines, start=1):
+        text = text.strip()
+        if text == "" or text.startswith("#"):
+            continue
+        yield number, text
+
+
+def answer_query(solution: Solution, query: BatchQuery) -> list[dict]:
+    """
+    Returns the records answering a query, one per package for a package query and one for a truck query.
+    """
+    if query.kind == "truck":
+        truck = solution.get_truck(query.target)
+        if truck == None:
+            return [error_record(query.line, f"Invalid truck id: {query.target}", "truck")]
+        return [
+            {
+                "line": query.line,
+                "query": "truck",
+                "truck_id": truck.id,
+                "distance": truck.total_distance_travelled(),
+                "finish_time": truck.last_route_finish_time(),
+                "package_ids": [p.package_id for p in truck.packages],
+            }
+        ]
+
+    index = solution.get_tracking_index()
+    if query.target == None:
+        return [package_record(solution, query, row) for row in index.snapshot(query.time)]
+
+    if solution.find_package(query.target) == None:
+        return [
+            error_record(query.line, f"Package ID not found: {query.target}", "package")
+        ]
+    return [package_record(solution, query, index.status_at(query.target, query.time))]
+
+
+def package_record(
+    solution: Solution, query: BatchQuery, row: Optional[PackageStatus]
+) -> dict:
+    """
+    Returns the record of a package's status at the time of the query, and where it is delivered.
+    """
+    record: dict = {"line": query.line, "query": "package", "time": query.time}
+    if row != None:
+        record.update(
+            {
+                "package_id": row.package_id,
+                "status": row.status,
+                "info": row.info,
+            }
+        )
+        location = solution.find_package(row.package_id)
+    else:
+        record["package_id"] = query.target
+        location = solution.find_package(query.target)
+
+    if location != None:
+        record.update(
+            {
+                "truck_id": location.truck.id,
+                "stop": location.stop,
+                "delivery_time": location.delivery_time,
+                "deadline": float(location.package.constraints.deadline),
+                "destination": location.package.formatted_address(),
+            }
+        )
+    return record
+
+
+def error_record(line: int, error: str, query: Optional[str] = None) -> dict:
+    """
+    Returns the record of a query that could not be answered.
+    """
+    return {"line": line, "query": query, "error": error}
+
+
+class JsonLinesWriter:
+    """
+    Writes each record as one JSON object per line.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, record: dict):
+        self.stream.write(json.dumps(record) + "\n")
+
+
+class CsvWriter:
+    """
+    Writes each record as a row of the FIELDS columns, after a header row. Lists are written space separated.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.writer = csv.DictWriter(stream, FIELDS, lineterminator="\n")
+        self.writer.writeheader()
+
+    def write(self, record: dict):
+        row = {
+            name: " ".join(str(v) for v in value) if isinstance(value, list) else value
+            for name, value in record.items()
+        }
+        self.writer.writerow(row)
+
+
+def create_writer(name: str, stream: TextIO):
+    """
+    Returns the writer for one of the BATCH_FORMATS names.
+    """
+    if name == "jsonl":
+        return JsonLinesWriter(stream)
+    if name == "csv":
+        return CsvWriter(stream)
+    raise ValueError(f"Unknown batch format: {name}")
+
+
+def run_batch(
+    solution: Solution, lines: Iterable[str], output: TextIO, format: str = "jsonl"
+) -> int:
+    """
+    Answers every query in the lines from the solution, streaming the records to the output as each query is answered. An invalid query gets an error record instead of stopping the batch. Returns the number of queries read.
+    """
+    writer = create_writer(format, output)
+    count = 0
+    for number, text in read_queries(lines):
+        count += 1
+        try:
+            records = answer_query(solution, BatchQuery.parse(number, text))
+        except ValueError as error:
+            records = [error_record(number, str(error))]
+        for record in records:
+            writer.write(record)
+        # queries can be piped in one at a time, so each answer is sent as soon as it is ready
+        output.flush()
+    return count
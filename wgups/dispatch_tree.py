@@ -0,0 +1,381 @@
+from typing import Iterable, Iterator, Optional
+
+from wgups.distance_table import DistanceTable
+from wgups.package_table import PackageTable
+from wgups.route import Route
+from wgups.solution import Solution
+from wgups.truck import Truck
+
+try:
+    import numpy as np
+except ImportError:  # the recorded orders are always checked pair by pair without it
+    np = None
+
+# Once the tree holds this many savings pairs across all of its orders, no more orders are recorded,
+# they take memory in proportion to the savings lists
+MAX_RECORDED_PAIRS = 2_000_000
+
+# Breakpoints are widened by this much relative to the savings involved, so that a modifier close enough to
+# a breakpoint for float rounding to matter is checked against the exact weighted savings instead
+BREAKPOINT_TOLERANCE = 1e-12
+
+
+class SavingsOrder:
+    """
+    The savings pairs one dispatch visited, and the pairs among them that have to stay in order for route construction to make the same decisions.
+    Each ordered pair of savings lines crosses at most once as the priority_modifier grows, so the modifiers that keep every pair in order form an interval between two breakpoints. The interval is worked out once, and only a modifier near one of its ends is checked against the weighted savings.
+    """
+
+    def __init__(
+        self,
+        base: list[float],
+        first_deadlines: list[bool],
+        second_deadlines: list[bool],
+        ahead: list[int],
+        behind: list[int],
+        ties: list[bool],
+    ):
+        self.columns = (base, first_deadlines, second_deadlines, ahead, behind, ties)
+
+        # the modifiers within (lower, upper) keep the order apart from the residual pairs, which are too close
+        # to call without weighting them, and the modifiers outside the outer bounds do not keep the order
+        self.lower = self.outer_lower = float("-inf")
+        self.upper = self.outer_upper = float("inf")
+        self.residual = None
+
+        if np is not None:
+            self.columns = tuple(
+                np.array(column, dtype=dtype)
+                for column, dtype in zip(
+                    self.columns, (np.float64, bool, bool, np.int64, np.int64, bool)
+                )
+            )
+            self._find_breakpoints()
+
+    def _find_breakpoints(self):
+        assert np is not None
+        base, first_deadlines, second_deadlines, ahead, behind, ties = self.columns
+        weights = first_deadlines.astype(np.float64) + second_deadlines
+
+        # the savings of each ordered pair at modifier m are s * (1 + k * m), with k deadlines in the pair,
+        # so the gap between them is a line: difference + slope * m
+        savings_ahead, savings_behind = base[ahead], base[behind]
+        difference = savings_ahead - savings_behind
+        slope = savings_ahead * weights[ahead] - savings_behind * weights[behind]
+        magnitude = np.abs(savings_ahead) + np.abs(savings_behind)
+
+        # pairs with the same number of deadlines are scaled by the same factor, which keeps their order
+        same_weight = weights[ahead] == weights[behind]
+        always = same_weight & (
+            (difference > BREAKPOINT_TOLERANCE * magnitude) | ((difference >= 0) & ties)
+        )
+        crossing = ~same_weight & (slope != 0)
+        self.residual = np.flatnonzero(~always & ~crossing)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            breakpoint = -difference / slope
+            width = BREAKPOINT_TOLERANCE * (
+                magnitude / np.abs(slope) + 1 + np.abs(breakpoint)
+            )
+
+        rising = crossing & (slope > 0)
+        falling = crossing & (slope < 0)
+        if rising.any():
+            self.lower = float(np.max(breakpoint[rising] + width[rising]))
+            self.outer_lower = float(np.max(breakpoint[rising] - width[rising]))
+        if falling.any():
+            self.upper = float(np.min(breakpoint[falling] - width[falling]))
+            self.outer_upper = float(np.min(breakpoint[falling] + width[falling]))
+
+    def holds(self, priority_modifier: float) -> bool:
+        """
+        Returns True if the savings list under the provided priority_modifier keeps every ordered pair in order.
+        """
+        if priority_modifier < self.outer_lower or priority_modifier > self.outer_upper:
+            return False
+        if self.residual is not None and self.lower < priority_modifier < self.upper:
+            return self._holds_exactly(priority_modifier, self.residual)
+        return self._holds_exactly(priority_modifier)
+
+    def _holds_exactly(self, priority_modifier: float, subset=None) -> bool:
+        base, first_deadlines, second_deadlines, ahead, behind, ties = self.columns
+
+        if np is not None:
+            if subset is not None:
+                if len(subset) == 0:
+                    return True
+                ahead, behind, ties = ahead[subset], behind[subset], ties[subset]
+
+            # weighted in the same order of operations as SavingsList
+            savings_ahead, savings_behind = (
+                base[pairs]
+                * (
+                    1
+                    + np.where(first_deadlines[pairs], priority_modifier, 0.0)
+                    + np.where(second_deadlines[pairs], priority_modifier, 0.0)
+                )
+                for pairs in (ahead, behind)
+            )
+            in_order = (savings_ahead > savings_behind) | (
+                (savings_ahead == savings_behind) & ties
+            )
+            return bool(in_order.all())
+
+        savings = [
+            base[k]
+            * (
+                1
+                + (priority_modifier if first_deadlines[k] else 0.0)
+                + (priority_modifier if second_deadlines[k] else 0.0)
+            )
+            for k in range(len(base))
+        ]
+        for a, b, tie in zip(ahead, behind, ties):
+            if not (savings[a] > savings[b] or (savings[a] == savings[b] and tie)):
+                return False
+        return True
+
+
+class DispatchBranch:
+    """
+    One dispatch decision made from a node: the route that was selected, as it was driven, or None if the truck waited. Every savings order seen to lead to the decision is kept, and the branch leads to the node for the state after it.
+    """
+
+    def __init__(
+        self, selected: tuple, deliveries: Optional[list[int]], due_back_time: float
+    ):
+        self.selected = selected
+        self.deliveries = deliveries
+        self.due_back_time = due_back_time
+        self.orders: list[SavingsOrder] = []
+        self.child = DispatchNode()
+
+    def matches(self, priority_modifier: float) -> bool:
+        """
+        Returns True if the provided priority_modifier keeps one of the recorded savings orders.
+        """
+        return any(order.holds(priority_modifier) for order in self.orders)
+
+    def replay(
+        self, truck: Truck, pt: PackageTable, dt: DistanceTable
+    ) -> Optional[Route]:
+        """
+        Returns a new route with the recorded deliveries for the truck, or None if the truck waited.
+        """
+        if self.deliveries == None:
+            return None
+
+        route = Route(truck.next_available_time, truck.id, dt, pt)
+        for package_id in self.deliveries:
+            package = pt.get_package(package_id)
+            assert package is not None
+            route.deliveries.append(package)
+        route.packages = set(self.deliveries)
+        route.due_back_time = self.due_back_time
+        route._refresh()
+        return route
+
+
+def selection_key(route: Optional[Route]) -> tuple:
+    """
+    Returns a key for the decision to drive the provided route as it was selected, or an empty key for a truck that waits.
+    """
+    if route == None:
+        return ()
+    return (tuple(p.package_id for p in route.deliveries), route.due_back_time)
+
+
+class DispatchNode:
+    """
+    The state of a run after a sequence of dispatch decisions, with a branch for each decision made from it and the solution of a run that finished here.
+    """
+
+    def __init__(self):
+        self.branches: list[DispatchBranch] = []
+        self.solution: Optional[Solution] = None
+        # number of runs that built routes from this node
+        self.visits = 0
+
+    def find_branch(self, priority_modifier: float) -> Optional[DispatchBranch]:
+        """
+        Returns the branch that the provided priority_modifier is known to take from this node, or None if none is known.
+        """
+        for branch in self.branches:
+            if branch.matches(priority_modifier):
+                return branch
+        return None
+
+    def branch_for(self, selected: Optional[Route]) -> Optional[DispatchBranch]:
+        """
+        Returns the branch for the decision to drive the provided route as it was selected, before it is improved, or None if no run made that decision yet.
+        """
+        key = selection_key(selected)
+        for branch in self.branches:
+            if branch.selected == key:
+                return branch
+        return None
+
+
+class DispatchTree:
+    """
+    The dispatch decisions made by the runs of a sweep, shared by runs with different priority_modifier values.
+    The priority_modifier only scales the savings of pairs with deadlines, so it only changes a dispatch through the order of its savings list, and most reorderings do not change what route construction does. A pair that is rejected leaves every route as it was, and whether a pair is accepted only depends on the routes its two packages are in. So two pairs only need to keep their order when one of them is accepted and its route holds a package of the other, or when both start new routes, which sets the order of the candidate routes.
+    A run that keeps one of the recorded orders of a branch makes that decision without building routes. A run that builds routes and makes a known decision takes the branch's improved route, and a run that ends on a known node takes its solution, so each distinct route and solution is only improved once.
+    """
+
+    def __init__(self, pt: PackageTable):
+        store = pt.store
+        self.positions = {
+            package_id: row for row, package_id in enumerate(store.package_ids)
+        }
+        self.has_deadline = {
+            package_id: deadline < 1440.0
+            for package_id, deadline in zip(store.package_ids, store.deadlines)
+        }
+        self.root = DispatchNode()
+        self.pair_count = 0
+
+    def is_full(self) -> bool:
+        """
+        Returns True once the tree holds too many savings pairs to record more orders.
+        """
+        return self.pair_count > MAX_RECORDED_PAIRS
+
+    def record(
+        self, pairs: Iterable[tuple[float, int, int]], visited: list
+    ) -> Iterator[tuple[float, int, int]]:
+        """
+        Yields the savings pairs unchanged, appending each to visited, so the pairs visited by route construction can be recorded with add_order.
+        """
+        for pair in pairs:
+            visited.append(pair)
+            yield pair
+
+    def add_branch(
+        self, node: DispatchNode, selected: tuple, route: Optional[Route]
+    ) -> DispatchBranch:
+        """
+        Adds a branch to the node for the decision with the provided selection_key, which drives the route as provided.
+        """
+        if route == None:
+            branch = DispatchBranch(selected, None, 1440.0)
+        else:
+            branch = DispatchBranch(
+                selected,
+                [p.package_id for p in route.deliveries],
+                route.due_back_time,
+            )
+        node.branches.append(branch)
+        return branch
+
+    def add_order(
+        self,
+        branch: DispatchBranch,
+        pairs: list[tuple[float, int, int]],
+        changes: list[Optional[tuple[int, ...]]],
+        dt: DistanceTable,
+    ):
+        """
+        Records a savings order that leads to the branch. The pairs are the savings pairs visited by route construction, with the deliveries of the route each pair changed as reported by RouteFactory.compute_routes. Route construction stops at the first pair without savings, and the pairs with savings are the same for every modifier, so only those are kept.
+        """
+        pairs = pairs[: len(changes)]
+        self.pair_count += len(pairs)
+
+        first = [pair[1] for pair in pairs]
+        second = [pair[2] for pair in pairs]
+
+        # Pairs of indices that must stay in order. For each package, the accepted pairs whose route holds it form
+        # a chain, and every pair with the package must stay between the same two links of the chain.
+        # Checking neighbors in each chain is enough, the rest of the order follows
+        ordered: list[tuple[int, int]] = []
+        last_touched: dict[int, int] = {}
+        waiting: dict[int, list[int]] = {}
+        last_created = -1
+
+        # the accepted pair after which each package is interior to its route, where it stays
+        interior_since: dict[int, int] = {}
+
+        for k in range(len(pairs)):
+            p1, p2 = first[k], second[k]
+            if changes[k] == None:
+                if p1 in last_touched and last_touched[p1] == last_touched.get(p2):
+                    # already in the same route, which is rejected from then on
+                    ordered.append((last_touched[p1], k))
+                    continue
+
+                # a package that is interior to its route can not be added next to, until the other package joins a route
+                if p1 in interior_since and p2 not in last_touched:
+                    ordered.append((interior_since[p1], k))
+                    waiting.setdefault(p2, []).append(k)
+                    continue
+                if p2 in interior_since and p1 not in last_touched:
+                    ordered.append((interior_since[p2], k))
+                    waiting.setdefault(p1, []).append(k)
+                    continue
+
+                for package_id in (p1, p2):
+                    if package_id in last_touched:
+                        ordered.append((last_touched[package_id], k))
+                    waiting.setdefault(package_id, []).append(k)
+                continue
+
+            if p1 not in last_touched and p2 not in last_touched:
+                if last_created != -1:
+                    ordered.append((last_created, k))
+                last_created = k
+
+            changed = changes[k]
+            assert changed is not None
+            for package_id in changed:
+                if package_id in last_touched:
+                    ordered.append((last_touched[package_id], k))
+                for j in waiting.pop(package_id, []):
+                    ordered.append((j, k))
+                last_touched[package_id] = k
+            for package_id in changed[1:-1]:
+                interior_since.setdefault(package_id, k)
+
+        # when the savings of two ordered pairs tie, the order follows the package list positions
+        positions = self.positions
+        ties = [
+            (positions[first[a]], positions[second[a]])
+            < (positions[first[b]], positions[second[b]])
+            for a, b in ordered
+        ]
+        branch.orders.append(
+            SavingsOrder(
+                self._base_savings(first, second, dt),
+                [self.has_deadline[p] for p in first],
+                [self.has_deadline[p] for p in second],
+                [a for a, _ in ordered],
+                [b for _, b in ordered],
+                ties,
+            )
+        )
+
+    def _base_savings(
+        self, first: list[int], second: list[int], dt: DistanceTable
+    ) -> list[float]:
+        # the savings before the priority weight, computed like SavingsList.calculate_savings
+        if np is not None:
+            matrix = np.asarray(dt.distances).reshape(
+                dt.address_count, dt.address_count
+            )
+            address_indices = np.array(dt.package_table.address_indices, dtype=np.int64)
+            first_addresses = address_indices[first]
+            second_addresses = address_indices[second]
+            hub = address_indices[0]
+            return list(
+                np.asarray(matrix[hub, first_addresses], dtype=np.float64)
+                + np.asarray(matrix[hub, second_addresses], dtype=np.float64)
+                - np.asarray(
+                    matrix[first_addresses, second_addresses], dtype=np.float64
+                )
+            )
+
+        return [
+            dt.get_package_distance(0, p1)
+            + dt.get_package_distance(0, p2)
+            - dt.get_package_distance(p1, p2)
+            for p1, p2 in zip(first, second)
+        ]
@@ -0,0 +1,80 @@
+import heapq
+from typing import Iterable, Optional
+
+from wgups.package_table import PackageTable
+from wgups.truck import Truck
+
+# kinds of events, events at the same time are handled in this order so that packages arriving at a time can be
+# loaded by a truck leaving at that time, and a driver is back on a truck before the trucks at the hub are dispatched
+PACKAGE_ARRIVAL = 0
+DRIVER_FREE = 1
+TRUCK_AVAILABLE = 2
+
+
+class Dispatcher:
+    """
+    The discrete event simulation of a solve's day. A priority queue holds package arrivals at the hub, drivers returning with their trucks, and trucks with a driver that are ready to be loaded at the hub. Each event costs O(log n) in the number of queued events, whatever the fleet size.
+    A returning driver boards the lowest numbered truck at the hub without a driver, which is the truck they came back in unless a lower numbered truck has none. Drivers start on the lowest numbered trucks, so with fewer drivers than trucks the highest numbered trucks stay at the hub.
+    Trucks ready at the same time go in the reverse order they were scheduled in, the most recently scheduled first.
+    """
+
+    def __init__(
+        self, trucks: list[Truck], driver_count: int, arrival_times: Iterable[float]
+    ):
+        self.trucks = trucks
+        self.indices = {truck.id: index for index, truck in enumerate(trucks)}
+        # (time, kind, -sequence, truck index), the truck index is -1 for package arrivals
+        self.events: list[tuple[float, int, int, int]] = []
+        self.sequence = 0
+        # indices of the trucks at the hub without a driver
+        self.parked: list[int] = list(range(min(driver_count, len(trucks)), len(trucks)))
+        heapq.heapify(self.parked)
+
+        for time in sorted(set(arrival_times)):
+            self._push(time, PACKAGE_ARRIVAL, -1)
+        # scheduled in reverse, so that truck 1 is the first truck dispatched at the start of the day
+        for index in reversed(range(min(driver_count, len(trucks)))):
+            self._push(trucks[index].next_available_time, TRUCK_AVAILABLE, index)
+
+    def _push(self, time: float, kind: int, index: int, sequence: Optional[int] = None):
+        if sequence == None:
+            self.sequence += 1
+            sequence = self.sequence
+        heapq.heappush(self.events, (time, kind, -sequence, index))
+
+    def next_truck(self, pt: PackageTable) -> Optional[Truck]:
+        """
+        Handles events in time order until a truck with a driver is ready at the hub, and returns it with its next_available_time set to the time it is ready. Packages that have arrived by then are at the hub. Returns None if no truck will be ready again.
+        """
+        while self.events:
+            time, kind, sequence, index = heapq.heappop(self.events)
+            if kind == PACKAGE_ARRIVAL:
+                pt.update_statuses(time)
+            elif kind == DRIVER_FREE:
+                # the truck is ready when the driver who returned it is, at the place of the driver in the queue
+                heapq.heappush(self.parked, index)
+                self._push(time, TRUCK_AVAILABLE, heapq.heappop(self.parked), -sequence)
+            else:
+                truck = self.trucks[index]
+                truck.next_available_time = time
+                return truck
+        return None
+
+    def next_ready_time(self) -> float:
+        """
+        Returns the earliest time another truck could be ready at the hub, when a driver returns or a waiting truck is ready, or the end of the day if none will be.
+        """
+        times = [event[0] for event in self.events if event[1] != PACKAGE_ARRIVAL]
+        return min(times, default=1440)
+
+    def dispatched(self, truck: Truck):
+        """
+        Schedules the return of a truck that has just been given a route. Its driver is free again when it is back at the hub.
+        """
+        self._push(truck.next_available_time, DRIVER_FREE, self.indices[truck.id])
+
+    def wait(self, truck: Truck, until: float):
+        """
+        Schedules a truck that could not be given a route to be ready again at the provided time.
+        """
+        self._push(until, TRUCK_AVAILABLE, self.indices[truck.id])
@@ -1,7 +1,18 @@
 import csv
+from array import array
 
 from utilities.hash_table import HashTable
+from wgups.metrics import SolveMetrics
 from wgups.package_table import PackageTable
+from wgups.snapshot import Snapshot, is_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # nearest distances are found with a pure Python scan without it
+    np = None
+
+# rows of the distance matrix scanned at once when finding nearest distances with numpy
+NEAREST_CHUNK_SIZE = 1024
 
 
 class DistanceTable:
@@ -17,11 +28,7 @@ class DistanceTable:
         if a2_index == None:
             raise Exception(f"Address not found: {addr2}")
 
-        # The first index should be the largest since only the bottom-left of the distance table is populated with values.
-        if a1_index < a2_index:
-            a1_index, a2_index = a2_index, a1_index
-
-        return self.distance_table[a1_index][a2_index]
+        return self.distances[a1_index * self.address_count + a2_index]
 
     def get_address(self, index: int) -> str:
         """
@@ -38,23 +45,124 @@ class DistanceTable:
             raise Exception(f"Address not found: {address}")
         return addr
 
-    def get_package_distance(self, pid1: int, pid2: int):
+    def get_package_distance(self, pid1: int, pid2: int) -> float:
         """
-        Given two package IDs, returns the distance between the package delivery addresses.
+        Given two package IDs, returns the distance between the package delivery addresses. Package ID 0 is the HUB.
         """
-        p1 = self.package_table.get_package(pid1)
-        p2 = self.package_table.get_package(pid2)
+        # address indices are resolved by the package table whenever an address changes, so this is a plain matrix read
+        address_indices = self.package_table.address_indices
+        return self.distances[
+            address_indices[pid1] * self.address_count + address_indices[pid2]
+        ]
 
-        addr1 = p1.formatted_address() if p1 != None else "HUB"
-        addr2 = p2.formatted_address() if p2 != None else "HUB"
+    def get_nearest_distances(self, address_indices: list[int]) -> dict[int, float]:
+        """
+        Given a list of address indices, returns the distance from each address to the nearest other entry of the list. An address that appears more than once is 0 from itself.
+        """
+        counts: dict[int, int] = {}
+        for a in address_indices:
+            counts[a] = counts.get(a, 0) + 1
+        unique = list(counts)
+        nearest: dict[int, float] = {}
+
+        if np is not None and len(unique) > 1:
+            matrix = np.asarray(self.distances).reshape(
+                self.address_count, self.address_count
+            )
+            columns = np.array(unique, dtype=np.int64)
+            for start in range(0, len(unique), NEAREST_CHUNK_SIZE):
+                rows = columns[start : start + NEAREST_CHUNK_SIZE]
+                block = np.array(matrix[np.ix_(rows, columns)], dtype=np.float64)
+                block[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+                for a, distance in zip(rows.tolist(), block.min(axis=1).tolist()):
+                    nearest[a] = distance
+        else:
+            for a in unique:
+                nearest[a] = min(
+                    (
+                        self.distances[a * self.address_count + b]
+                        for b in unique
+                        if b != a
+                    ),
+                    default=float("inf"),
+                )
+
+        for a, count in counts.items():
+            if count > 1:
+                nearest[a] = 0.0
+        return nearest
+
+    def with_package_table(self, package_table: PackageTable) -> "DistanceTable":
+        """
+        Returns a distance table that shares the parsed distances of this one, but resolves package addresses through the provided package table.
+        """
+        # a shallow copy of the attributes, copy.copy would go through __getstate__ and reopen a snapshot
+        table = DistanceTable.__new__(DistanceTable)
+        table.__dict__.update(self.__dict__)
+        table.package_table = package_table
+        # a lookup counter installed on this table is not carried over
+        table.__dict__.pop("get_package_distance", None)
+        return table
+
+    def count_lookups(self, metrics: SolveMetrics):
+        """
+        Counts every get_package_distance call on this table in the distance_lookups counter of the provided metrics. The counting lookup is installed on this table only, so tables that are not profiled keep the plain lookup.
+        """
+        lookup = DistanceTable.get_package_distance.__get__(self)
+
+        def get_package_distance(pid1: int, pid2: int) -> float:
+            metrics.count("distance_lookups")
+            return lookup(pid1, pid2)
 
-        return self.get_distance(addr1, addr2)
+        self.get_package_distance = get_package_distance
+
+    def __getstate__(self):
+        # a snapshot's distances are a memoryview over the mapped file, which cannot be pickled,
+        # so they are restored from the reopened snapshot instead
+        state = self.__dict__.copy()
+        if self.snapshot is not None:
+            del state["distances"]
+        # an installed lookup counter is a closure, which cannot be pickled either
+        state.pop("get_package_distance", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.snapshot is not None:
+            self.distances = self.snapshot.column("distances")
 
     def __init__(self, file_path: str, package_table: PackageTable) -> None:
         self.package_table = package_table
         self.address_table: HashTable[str, int] = HashTable()
         self.address_index_table = []
-        self.distance_table = []
+        self.snapshot = None
+
+        if is_snapshot(file_path):
+            self._load_snapshot(Snapshot(file_path))
+        else:
+            self._load_distance_data(file_path)
+
+        # a package table opened from the same snapshot already has its address indices
+        if (
+            self.snapshot == None
+            or package_table.snapshot_hash != self.snapshot.content_hash
+        ):
+            package_table.resolve_address_indices(self.get_address_index)
+
+    def _load_snapshot(self, snapshot: Snapshot):
+        # The float32 distance matrix is read in place from the mapped file
+        self.snapshot = snapshot
+        self.address_count = snapshot.address_count
+        self.distances = snapshot.column("distances")
+
+        strings = snapshot.strings()
+        self.address_index_table = [strings[i] for i in snapshot.column("addresses")]
+        self.address_table = HashTable.from_items(
+            (address, i) for i, address in enumerate(self.address_index_table)
+        )
+
+    def _load_distance_data(self, file_path: str):
+        rows = []
 
         # Builds the distance table from the CSV file
         with open(file_path) as csvfile:
@@ -76,4 +184,13 @@ class DistanceTable:
                     value = float(row[j]) if row[j] != "" else 0.0
                     values.append(value)
 
-                self.distance_table.append(values)
+                rows.append(values)
+
+        # Only the bottom-left of the CSV is populated, it is mirrored into a dense row-major matrix
+        # so that a lookup is a single read with no index swapping
+        self.address_count = len(rows)
+        self.distances = array("d", [0.0]) * (self.address_count * self.address_count)
+        for i, values in enumerate(rows):
+            for j in range(i + 1):
+                self.distances[i * self.address_count + j] = values[j]
+                self.distances[j * self.address_count + i] = values[j]
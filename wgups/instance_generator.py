@@ -0,0 +1,220 @@
+import csv
+import math
+import os
+import random
+from typing import Optional
+
+from utilities.time import time_int_to_str, time_str_to_int
+from wgups.package import ADDRESS_UPDATE_TIME, UPDATED_STREET, UPDATED_ZIP_CODE
+
+HUB_NAME = "Western Governors University\n4001 South 700 East, \nSalt Lake City, UT 84107"
+
+# Addresses are scattered over a square this many miles wide, centered on the HUB, about the size of the WGUPS map
+AREA_SIZE = 10.0
+# Straight line distances are stretched by this factor to approximate road distances
+ROAD_FACTOR = 1.3
+
+# Packages with a deadline get one of these by default. Like the WGUPS file there is one 9:00 AM deadline for every
+# thirteen at 10:30 AM, since only the first trucks out can meet the earliest deadline and they carry so many packages
+DEADLINES = [540] + [630] * 13
+# Delayed packages arrive at the hub at one of these times by default, the WGUPS flight and a later one
+DELAY_TIMES = [545, 605]
+# A package with a deadline can be at the hub at least this many minutes before it, enough to drive to the farthest
+# address of the area, so that every generated deadline can be met
+DEADLINE_MARGIN = 60
+
+# Packages restricted to a truck go on one of these by default, trucks that the default two drivers drive
+RESTRICTED_TRUCKS = [1, 2]
+
+
+class InstanceGenerator:
+    """
+    Generates reproducible random WGUPS instances and writes them in the same CSV formats as the files in resources, so they can be loaded by PackageTable and DistanceTable.
+    The defaults follow the shape of the WGUPS file. Deadlines, arrival times and restricted trucks are drawn from the lists provided, DEADLINES, DELAY_TIMES and RESTRICTED_TRUCKS by default.
+    Every instance can be solved: each deadline leaves DEADLINE_MARGIN minutes after the package is at the hub, and packages restricted to a truck come in pairs so that a route can be built for them.
+    """
+
+    def __init__(
+        self,
+        package_count: int = 40,
+        address_count: int = 0,
+        deadline_share: float = 0.3,
+        delayed_share: float = 0.1,
+        readdressed_share: float = 0.025,
+        restricted_share: float = 0.1,
+        group_count: int = 1,
+        group_size: int = 6,
+        seed: int = 0,
+        deadlines: Optional[list[int]] = None,
+        delay_times: Optional[list[int]] = None,
+        restricted_trucks: Optional[list[int]] = None,
+    ):
+        self.package_count = package_count
+        # by default about two packages share each address, like the WGUPS files
+        self.address_count = address_count or max(2, math.ceil(package_count * 2 / 3))
+        self.deadline_share = deadline_share
+        self.delayed_share = delayed_share
+        # share of packages listed with the wrong address, updated to UPDATED_STREET at ADDRESS_UPDATE_TIME
+        self.readdressed_share = readdressed_share
+        self.restricted_share = restricted_share
+        self.group_count = group_count
+        self.group_size = group_size
+        self.seed = seed
+        # times in minutes after midnight
+        self.deadlines = DEADLINES if deadlines == None else deadlines
+        self.delay_times = DELAY_TIMES if delay_times == None else delay_times
+        self.restricted_trucks = (
+            RESTRICTED_TRUCKS if restricted_trucks == None else restricted_trucks
+        )
+        if any(deadline < 480 + DEADLINE_MARGIN for deadline in self.deadlines):
+            raise ValueError(
+                f"Deadlines must leave {DEADLINE_MARGIN} minutes after 8:00 AM to drive to the package."
+            )
+
+    def generate_addresses(self, rng: random.Random) -> list[tuple[str, str, float, float]]:
+        """
+        Returns the street, zip code, and coordinates of every address other than the HUB. The first is the address wrong addresses are updated to.
+        """
+        addresses = []
+        for i in range(self.address_count):
+            street = f"{1000 + i} W {100 * (i % 45 + 1)} S"
+            zip_code = str(84100 + i % 30)
+            if i == 0:
+                street, zip_code = UPDATED_STREET, UPDATED_ZIP_CODE
+            x = rng.uniform(-AREA_SIZE / 2, AREA_SIZE / 2)
+            y = rng.uniform(-AREA_SIZE / 2, AREA_SIZE / 2)
+            addresses.append((street, zip_code, x, y))
+        return addresses
+
+    def distance_rows(
+        self, addresses: list[tuple[str, str, float, float]]
+    ) -> list[list[str]]:
+        """
+        Returns the rows of the distance CSV. Only the bottom-left of the table is populated, the HUB is the first row.
+        """
+        points = [(0.0, 0.0)] + [(x, y) for _, _, x, y in addresses]
+        width = len(points) + 2
+        rows = []
+
+        for i, (x1, y1) in enumerate(points):
+            if i == 0:
+                row = [HUB_NAME, " HUB"]
+            else:
+                street, zip_code, _, _ = addresses[i - 1]
+                row = [f"Location {i}\n {street}", f" {street}\n({zip_code})"]
+
+            for j in range(i + 1):
+                x2, y2 = points[j]
+                distance = math.hypot(x1 - x2, y1 - y2) * ROAD_FACTOR
+                row.append("0.0" if i == j else f"{max(0.1, round(distance, 1)):.1f}")
+
+            row.extend([""] * (width - len(row)))
+            rows.append(row)
+
+        return rows
+
+    def package_rows(
+        self, rng: random.Random, addresses: list[tuple[str, str, float, float]]
+    ) -> list[list[str]]:
+        """
+        Returns the rows of the package CSV. A package has at most one note, so grouped packages are chosen first and are never delayed, readdressed or restricted to a truck.
+        A delayed or readdressed package keeps a deadline only if one leaves DEADLINE_MARGIN minutes after it arrives, and is due at the end of the day otherwise. Packages restricted to a truck are due at the end of the day, as in the WGUPS file, and come in pairs for the same truck.
+        """
+        package_ids = list(range(1, self.package_count + 1))
+        shuffled = package_ids[:]
+        rng.shuffle(shuffled)
+
+        notes = {package_id: "" for package_id in package_ids}
+        with_deadline = {
+            package_id: rng.random() < self.deadline_share for package_id in package_ids
+        }
+        # the time each package is at the hub
+        arrivals = {package_id: 480 for package_id in package_ids}
+        street_choices = {package_id: addresses for package_id in package_ids}
+
+        group_size = max(2, self.group_size)
+        for g in range(self.group_count):
+            group = sorted(shuffled[g * group_size : (g + 1) * group_size])
+            if len(group) < 2:
+                break
+            notes[group[0]] = "Must be delivered with " + ", ".join(
+                str(package_id) for package_id in group[1:]
+            )
+            for package_id in group[1:]:
+                notes[package_id] = None
+
+        ungrouped = shuffled[self.group_count * group_size :]
+        delayed_count = round(self.package_count * self.delayed_share)
+        readdressed_count = round(self.package_count * self.readdressed_share)
+        # a lone package restricted to a truck is never routed, since routes are built from pairs of packages
+        restricted_count = round(self.package_count * self.restricted_share / 2) * 2
+
+        delayed = ungrouped[:delayed_count]
+        readdressed = ungrouped[delayed_count : delayed_count + readdressed_count]
+        restricted = ungrouped[
+            delayed_count + readdressed_count : delayed_count
+            + readdressed_count
+            + restricted_count
+        ]
+
+        for package_id in delayed:
+            delay = rng.choice(self.delay_times)
+            arrivals[package_id] = delay
+            notes[package_id] = (
+                "Delayed on flight---will not arrive to depot until "
+                + time_int_to_str(delay).lower()
+            )
+        for package_id in readdressed:
+            arrivals[package_id] = time_str_to_int(ADDRESS_UPDATE_TIME)
+            notes[package_id] = "Wrong address listed"
+            # the listed address is never the one it is updated to
+            street_choices[package_id] = addresses[1:]
+        for i in range(0, len(restricted), 2):
+            truck_id = rng.choice(self.restricted_trucks)
+            for package_id in restricted[i : i + 2]:
+                with_deadline[package_id] = False
+                notes[package_id] = f"Can only be on truck {truck_id}"
+
+        rows = []
+        for package_id in package_ids:
+            street, zip_code, _, _ = rng.choice(street_choices[package_id])
+            deadline = None
+            if with_deadline[package_id]:
+                deadlines = [
+                    d for d in self.deadlines if d >= arrivals[package_id] + DEADLINE_MARGIN
+                ]
+                if deadlines:
+                    deadline = rng.choice(deadlines)
+            weight = rng.randint(1, 88)
+            rows.append(
+                [
+                    str(package_id),
+                    street,
+                    "Salt Lake City",
+                    "UT",
+                    zip_code,
+                    "EOD" if deadline == None else time_int_to_str(deadline),
+                    str(weight),
+                    notes[package_id] or "",
+                ]
+            )
+
+        return rows
+
+    def write(self, directory: str) -> tuple[str, str]:
+        """
+        Writes the package and distance CSV files into the directory and returns their paths.
+        """
+        rng = random.Random(self.seed)
+        addresses = self.generate_addresses(rng)
+
+        os.makedirs(directory, exist_ok=True)
+        package_file_path = os.path.join(directory, "packages.csv")
+        distance_file_path = os.path.join(directory, "distances.csv")
+
+        with open(package_file_path, "w", newline="") as csvfile:
+            csv.writer(csvfile).writerows(self.package_rows(rng, addresses))
+        with open(distance_file_path, "w", newline="") as csvfile:
+            csv.writer(csvfile).writerows(self.distance_rows(addresses))
+
+        return package_file_path, distance_file_path
@@ -0,0 +1,80 @@
+from typing import Optional
+
+# Phases timed by a profiled solve, in the order they are reported
+PHASES = [
+    ("load", "table loading"),
+    ("zones", "zone partitioning"),
+    ("savings", "savings construction"),
+    ("routes", "route construction"),
+    ("groups", "group completion"),
+    ("improve_routes", "route improvement"),
+    ("simulation", "simulation"),
+    ("improve_solution", "solution improvement"),
+]
+
+# the reasons verify_deliveries rejects a proposed route for, in the order it checks them. The cached feasibility
+# checks of a route being extended or merged reject for the same reasons, the truck before the others
+REJECTION_REASONS = ["capacity", "due_back", "truck", "deadline"]
+
+# the counters of routes checked, each followed by its rejections by reason under "<name>.<reason>"
+CHECK_COUNTERS = [
+    ("verify_deliveries", "verify_deliveries"),
+    ("feasibility_checks", "feasibility checks"),
+]
+
+
+class SolveMetrics:
+    """
+    Counters and per-phase timers of a profiled solve, or summed over the solves of a sweep.
+    A solve only collects metrics when its tables carry a SolveMetrics, so an unprofiled solve pays one attribute check at each counted call.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        # seconds spent in each phase
+        self.timers: dict[str, float] = {}
+
+    def count(self, name: str, amount: int = 1):
+        """
+        Adds the amount to the named counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, phase: str, seconds: float):
+        """
+        Adds the seconds to the time spent in the named phase.
+        """
+        self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    def merge(self, other: Optional["SolveMetrics"]):
+        """
+        Adds the counters and timers of another SolveMetrics to these.
+        """
+        if other == None:
+            return
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for phase, seconds in other.timers.items():
+            self.add_time(phase, seconds)
+
+    def __str__(self):
+        lines = ["Phase timings:"]
+        total = sum(self.timers.values())
+        for phase, label in PHASES:
+            seconds = self.timers.get(phase, 0.0)
+            share = seconds / total * 100 if total > 0 else 0.0
+            lines.append(f"  {label:<24}{seconds:>10.3f} s {share:>6.1f}%")
+        lines.append(f"  {'total':<24}{total:>10.3f} s")
+
+        lines.append("Counters:")
+        lines.append(f"  {'solves':<24}{self.counters.get('solves', 0):>10}")
+        lines.append(f"  {'dispatches':<24}{self.counters.get('dispatches', 0):>10}")
+        lines.append(
+            f"  {'distance lookups':<24}{self.counters.get('distance_lookups', 0):>10}"
+        )
+        for name, label in CHECK_COUNTERS:
+            lines.append(f"  {label:<24}{self.counters.get(name, 0):>10}")
+            for reason in REJECTION_REASONS:
+                rejected = self.counters.get(f"{name}.{reason}", 0)
+                lines.append(f"    {'rejected, ' + reason:<22}{rejected:>10}")
+        return "\n".join(lines)
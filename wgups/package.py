@@ -1,40 +1,174 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from utilities.time import time_str_to_int
 
+if TYPE_CHECKING:
+    from wgups.package_store import PackageStore
+
+# status codes of the status column of a PackageStore
+STATUSES = ["at the hub", "delayed", "delivered"]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def format_event(time: float, message: str) -> tuple[float, str]:
+    """
+    Returns a tracking event, the time and the message prefixed with the time as H:MM.
+    """
+    time_str = f"{int(time // 60)}:{int(time % 60):02d}"
+    return (time, f"{time_str} - {message}")
+
+
+# the first tracking event of every package is one of these, given at the start of the day
+INITIAL_EVENTS = {
+    message: format_event(480, message)
+    for message in [
+        "On hold: Invalid address",
+        "Delayed inbound to the hub",
+        "Ready for delivery at the hub",
+    ]
+}
+
+# the address a package noted as having the wrong address is updated to, and the time the update is known
+UPDATED_STREET = "410 S State St"
+UPDATED_ZIP_CODE = "84111"
+ADDRESS_UPDATE_TIME = "10:20 AM"
+
+
+def parse_constraints(deadline: str, note: str) -> dict:
+    """
+    Parses the deadline and special note of a package into its constraints: the deadline in minutes, when it arrives at the hub, the address it is updated to, the truck it requires and the packages it must be delivered with.
+    """
+    constraints = {
+        "deadline": time_str_to_int(deadline),
+        "delayed_until": 480,
+        "updated_street": "",
+        "updated_zip_code": "",
+        "required_truck": None,
+        "paired_packages": [],
+    }
+
+    # This parses the package info and notes into usable logic and restrictions for measuring package constraints
+    if note.startswith("Delayed on flight"):
+        words = note.split(" ")
+        delay_time = " ".join(words[-2:])
+        constraints["delayed_until"] = time_str_to_int(delay_time)
+    elif note.startswith("Wrong address"):
+        constraints["delayed_until"] = time_str_to_int(ADDRESS_UPDATE_TIME)
+
+        # Hardcoding the updated address since it's not included in the input materials
+        # In a production implementation, this information will be able to be added once it becomes available
+        constraints["updated_street"] = UPDATED_STREET
+        constraints["updated_zip_code"] = UPDATED_ZIP_CODE
+    elif note.startswith("Can only be on truck"):
+        constraints["required_truck"] = int(note.split(" ")[-1])
+    elif note.startswith("Must be delivered with"):
+        listed_packages = note.split("Must be delivered with ")
+        package_ids = listed_packages[-1].split(", ")
+        constraints["paired_packages"] = [int(package_id) for package_id in package_ids]
+
+    return constraints
+
 
 class Package:
-    def __init__(
-        self,
-        package_id: int,
-        address: str,
-        deadline: str,
-        city: str,
-        zip_code: str,
-        weight: int,
-        note: str,
-    ):
-        self.package_id = package_id
-        self.address = address
-        self.deadline = deadline
-        self.city = city
-        self.zip_code = zip_code
-        self.weight = weight
-        self.note = note
-        self.constraints = PackageConstraints(deadline, note)
-        self.status = (
-            "delayed" if self.constraints.delayed_until > 480 else "at the hub"
-        )
-        self.tracking_info: list[tuple[float, str]] = []
-        self.group_id = package_id
-
-        # Set initial tracking info
-        if self.constraints.delayed_until > 480 and self.constraints.updated_address:
-            self.add_tracking_info(480, "On hold: Invalid address")
-        elif self.constraints.delayed_until > 480:
-            self.add_tracking_info(480, "Delayed inbound to the hub")
-        else:
-            self.add_tracking_info(480, "Ready for delivery at the hub")
+    """
+    A view of one row of a PackageStore. Reading or writing a field reads or writes the store's column, so a view holds no state of its own and is built when a package is looked up rather than kept per row.
+    """
+
+    __slots__ = ("store", "row", "constraints", "package_id")
+
+    def __init__(self, store: "PackageStore", row: int):
+        self.store = store
+        self.row = row
+        self.constraints = PackageConstraints(store, row)
+        # the ID never changes and is read on every distance lookup, so the view keeps it rather than reading the column
+        self.package_id: int = store.package_ids[row]
+
+    @property
+    def initial_address(self) -> str:
+        return self.store.strings[self.store.streets[self.row]]
+
+    @property
+    def deadline(self) -> str:
+        return self.store.strings[self.store.deadline_texts[self.row]]
+
+    @property
+    def city(self) -> str:
+        return self.store.strings[self.store.cities[self.row]]
+
+    @property
+    def initial_zip_code(self) -> str:
+        return self.store.strings[self.store.zip_codes[self.row]]
+
+    @property
+    def weight(self) -> int:
+        return self.store.weights[self.row]
+
+    @property
+    def note(self) -> str:
+        return self.store.strings[self.store.notes[self.row]]
+
+    @property
+    def group_id(self) -> int:
+        return self.store.group_ids[self.row]
+
+    @group_id.setter
+    def group_id(self, value: int):
+        self.store.group_ids[self.row] = value
+
+    @property
+    def initial_address_index(self) -> int:
+        # distance table index of the listed address, resolved by PackageTable.resolve_address_indices
+        return self.store.initial_address_indices[self.row]
+
+    @initial_address_index.setter
+    def initial_address_index(self, value: int):
+        self.store.initial_address_indices[self.row] = value
+
+    @property
+    def address(self) -> str:
+        return self.store.address(self.row)
+
+    @address.setter
+    def address(self, value: str):
+        self.store.addresses[self.row] = self.store.intern(value)
+
+    @property
+    def zip_code(self) -> str:
+        return self.store.zip_code(self.row)
+
+    @zip_code.setter
+    def zip_code(self, value: str):
+        self.store.current_zip_codes[self.row] = self.store.intern(value)
+
+    @property
+    def address_index(self) -> int:
+        return self.store.address_indices[self.row]
+
+    @address_index.setter
+    def address_index(self, value: int):
+        self.store.address_indices[self.row] = value
+
+    @property
+    def status(self) -> str:
+        return STATUSES[self.store.statuses[self.row]]
+
+    @status.setter
+    def status(self, value: str):
+        self.store.set_status(self.row, STATUS_CODES[value])
+
+    @property
+    def tracking_info(self) -> list[tuple[float, str]]:
+        return self.store.events(self.row)
+
+    @tracking_info.setter
+    def tracking_info(self, value: list[tuple[float, str]]):
+        self.store.tracking[self.row] = value
+
+    def reset(self):
+        """
+        Restores the package's address, status, and tracking info to their state at the start of the day.
+        """
+        self.store.reset_row(self.row)
 
     def formatted_address(self):
         """
@@ -46,8 +180,7 @@ class Package:
         """
         Appends a message to the package's tracking info.
         """
-        time_str = f"{int(time // 60)}:{int(time % 60):02d}"
-        self.tracking_info.append((time, f"{time_str} - {message}"))
+        self.store.add_event(self.row, format_event(time, message))
 
     def get_tracking_info(self, time: float) -> list[str]:
         """
@@ -60,29 +193,43 @@ class Package:
 
 
 class PackageConstraints:
-    def __init__(self, deadline: str, note: str):
-        self.deadline = time_str_to_int(deadline)
-        self.delayed_until = 480
-        self.updated_address = ""
-        self.updated_zip_code = ""
-        self.required_truck = None
-        self.paired_packages = []
-
-        # This parses the package info and notes into usable logic and restrictions for measuring package constraints
-        if note.startswith("Delayed on flight"):
-            words = note.split(" ")
-            delay_time = " ".join(words[-2:])
-            self.delayed_until = time_str_to_int(delay_time)
-        elif note.startswith("Wrong address"):
-            self.delayed_until = time_str_to_int("10:20 AM")
-
-            # Hardcoding the updated address since it's not included in the input materials
-            # In a production implementation, this information will be able to be added once it becomes available
-            self.updated_address = "410 S State St"
-            self.updated_zip_code = "84111"
-        elif note.startswith("Can only be on truck"):
-            self.required_truck = int(note.split(" ")[-1])
-        elif note.startswith("Must be delivered with"):
-            listed_packages = note.split("Must be delivered with ")
-            package_ids = listed_packages[-1].split(", ")
-            self.paired_packages = [int(package_id) for package_id in package_ids]
+    """
+    A view of the parsed constraints in one row of a PackageStore, built with the package view that holds it.
+    The deadline, arrival and truck of a package are checked for every proposed route, so the view keeps them instead of reading their columns.
+    """
+
+    __slots__ = ("store", "row", "deadline", "delayed_until", "required_truck")
+
+    def __init__(self, store: "PackageStore", row: int):
+        self.store = store
+        self.row = row
+        self.deadline: int = store.deadlines[row]
+        self.delayed_until: int = store.delayed_until[row]
+        self.required_truck: Optional[int] = store.required_trucks[row] or None
+
+    def __deepcopy__(self, memo: dict) -> "PackageConstraints":
+        # the constraints never change, so copies of a package share them
+        return self
+
+    @property
+    def updated_address(self) -> str:
+        return self.store.strings[self.store.updated_streets[self.row]]
+
+    @property
+    def updated_zip_code(self) -> str:
+        return self.store.strings[self.store.updated_zip_codes[self.row]]
+
+    @property
+    def updated_address_index(self) -> int:
+        return self.store.updated_address_indices[self.row]
+
+    @updated_address_index.setter
+    def updated_address_index(self, value: int):
+        self.store.updated_address_indices[self.row] = value
+
+    @property
+    def paired_packages(self) -> list[int]:
+        store = self.store
+        return store.paired_ids[
+            store.paired_offsets[self.row] : store.paired_offsets[self.row + 1]
+        ].tolist()
@@ -0,0 +1,315 @@
+import heapq
+from array import array
+from typing import Optional, Sequence
+
+from wgups.package import INITIAL_EVENTS, STATUS_CODES, Package
+
+# the empty string is always the first in the pool
+EMPTY_STRING = 0
+
+AT_THE_HUB = STATUS_CODES["at the hub"]
+DELAYED = STATUS_CODES["delayed"]
+DELIVERED = STATUS_CODES["delivered"]
+
+# columns parsed from the package file, shared by every clone of a store, and their array typecodes. They are only
+# written while loading. Times are minutes of the day and truck IDs are small, so they are int16
+SHARED_COLUMNS = {
+    "package_ids": "i",
+    "weights": "i",
+    "deadlines": "h",
+    "delayed_until": "h",
+    "required_trucks": "h",
+    "group_ids": "i",
+    "initial_address_indices": "i",
+    "updated_address_indices": "i",
+    "streets": "i",
+    "cities": "i",
+    "zip_codes": "i",
+    "deadline_texts": "i",
+    "notes": "i",
+    "updated_streets": "i",
+    "updated_zip_codes": "i",
+}
+
+# pending arrivals are stored as a single int, the arrival time shifted above the row
+ARRIVAL_SHIFT = 32
+ROW_MASK = (1 << ARRIVAL_SHIFT) - 1
+
+
+class PackageStore:
+    """
+    The packages of a table stored by column, one row per package in the order they were added. Numeric fields are int32 arrays, strings are interned in a pool and stored as IDs into it, and statuses are byte codes, so a scan over a field reads contiguous memory.
+    The parsed columns are shared by clones of the store, which only get their own copy of the columns a solve changes: the status and address index of each package. The few packages whose address changes or that have more than their initial tracking event are kept by row in dicts. Package and PackageConstraints are views of a row, built on demand, so a row costs nothing beyond its columns.
+    """
+
+    def __init__(self):
+        for name, typecode in SHARED_COLUMNS.items():
+            setattr(self, name, array(typecode))
+        # the paired package IDs of row i are paired_ids[paired_offsets[i] : paired_offsets[i + 1]]
+        self.paired_offsets = array("i", [0])
+        self.paired_ids = array("i")
+
+        self.strings: list[str] = []
+        self.string_ids: dict[str, int] = {}
+        self.intern("")
+
+        self.statuses = array("b")
+        self.address_indices = array("i")
+        # the street and zip code IDs of the rows whose address was updated, any other row is at its listed address
+        self.addresses: dict[int, int] = {}
+        self.current_zip_codes: dict[int, int] = {}
+        # the tracking events of the rows with more than their initial event
+        self.tracking: dict[int, list[tuple[float, str]]] = {}
+
+        # the number of rows with each status code, kept current by set_status. The rows themselves are found by
+        # searching the status column, which keeps them in row order without a structure per row
+        self.counts: list[int] = [0 for _ in STATUS_CODES]
+        # the rows whose status changed, in the order they changed, so that a reader can catch up on the changes
+        # since it last looked. Cleared by reset
+        self.changes = array("i")
+        # heap of delayed_until << ARRIVAL_SHIFT | row for delayed packages. Entries of rows that are no longer delayed are dropped when they reach the top
+        self.arrivals: list[int] = []
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: dict[str, Sequence[int]],
+        paired_offsets: Sequence[int],
+        paired_ids: Sequence[int],
+        strings: list[str],
+    ) -> "PackageStore":
+        """
+        Returns a store of packages at the start of the day over parsed columns, keyed like SHARED_COLUMNS, such as the typed views of a snapshot. The columns are adopted rather than copied, and only the columns a solve changes are built.
+        The string columns hold IDs into strings, which must start with the empty string.
+        """
+        store = cls.__new__(cls)
+        for name in SHARED_COLUMNS:
+            setattr(store, name, columns[name])
+        store.paired_offsets = paired_offsets
+        store.paired_ids = paired_ids
+        store.strings = list(strings)
+        store.string_ids = {value: string_id for string_id, value in enumerate(strings)}
+        store.reset()
+        return store
+
+    def __getstate__(self) -> dict:
+        # adopted columns can be views of a mapped file, which cannot be pickled, so they are copied into arrays
+        state = self.__dict__.copy()
+        for name, value in state.items():
+            if isinstance(value, memoryview):
+                state[name] = array(value.format, value.tobytes())
+        return state
+
+    def __len__(self) -> int:
+        return len(self.package_ids)
+
+    def intern(self, value: str) -> int:
+        """
+        Returns the ID of the string in the string pool, adding it if it is new.
+        """
+        string_id = self.string_ids.get(value)
+        if string_id == None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self.string_ids[value] = string_id
+        return string_id
+
+    def add(
+        self,
+        package_id: int,
+        street: str,
+        deadline_text: str,
+        city: str,
+        zip_code: str,
+        weight: int,
+        note: str,
+        deadline: int,
+        delayed_until: int,
+        updated_street: str,
+        updated_zip_code: str,
+        required_truck: Optional[int],
+        paired_packages: list[int],
+        group_id: Optional[int] = None,
+        initial_address_index: int = -1,
+        updated_address_index: int = -1,
+    ) -> Package:
+        """
+        Adds a package at the start of the day as a new row and returns its view. The package is its own group unless a group id is provided.
+        """
+        row = len(self.package_ids)
+        self.package_ids.append(package_id)
+        self.weights.append(weight)
+        self.deadlines.append(deadline)
+        self.delayed_until.append(delayed_until)
+        self.required_trucks.append(required_truck or 0)
+        self.group_ids.append(package_id if group_id == None else group_id)
+        self.initial_address_indices.append(initial_address_index)
+        self.updated_address_indices.append(updated_address_index)
+        self.streets.append(self.intern(street))
+        self.cities.append(self.intern(city))
+        self.zip_codes.append(self.intern(zip_code))
+        self.deadline_texts.append(self.intern(deadline_text))
+        self.notes.append(self.intern(note))
+        self.updated_streets.append(self.intern(updated_street))
+        self.updated_zip_codes.append(self.intern(updated_zip_code))
+        self.paired_ids.extend(paired_packages)
+        self.paired_offsets.append(len(self.paired_ids))
+
+        self.statuses.append(AT_THE_HUB)
+        self.counts[AT_THE_HUB] += 1
+        self.address_indices.append(0)
+        self.reset_row(row)
+        return Package(self, row)
+
+    def clone(self) -> "PackageStore":
+        """
+        Returns a store with every package at the start of the day, sharing the parsed columns with this one.
+        """
+        store = PackageStore.__new__(PackageStore)
+        for name in SHARED_COLUMNS:
+            setattr(store, name, getattr(self, name))
+        store.paired_offsets = self.paired_offsets
+        store.paired_ids = self.paired_ids
+        store.strings = self.strings
+        store.string_ids = self.string_ids
+
+        # the columns a solve changes are built by reset
+        store.reset()
+        return store
+
+    def __deepcopy__(self, memo: dict) -> "PackageStore":
+        # a deep copy only copies the columns a solve changes, like clone, but keeps the state of every package
+        store = self.clone()
+        memo[id(self)] = store
+        store.statuses = array("b", self.statuses)
+        store.address_indices = array("i", self.address_indices)
+        store.addresses = dict(self.addresses)
+        store.current_zip_codes = dict(self.current_zip_codes)
+        # tracking events are immutable tuples, so only the lists are copied
+        store.tracking = {row: list(events) for row, events in self.tracking.items()}
+        store.counts = list(self.counts)
+        store.arrivals = list(self.arrivals)
+        return store
+
+    def reset(self):
+        """
+        Restores every package to its state at the start of the day.
+        """
+        self.address_indices = array("i", self.initial_address_indices)
+        self.addresses = {}
+        self.current_zip_codes = {}
+        self.tracking = {}
+
+        delayed_until = self.delayed_until
+        self.statuses = array(
+            "b", [DELAYED if time > 480 else AT_THE_HUB for time in delayed_until]
+        )
+        self.counts = [self.statuses.count(code) for code in STATUS_CODES.values()]
+        self.changes = array("i")
+        self.arrivals = [
+            delayed_until[row] << ARRIVAL_SHIFT | row for row in self.rows_with(DELAYED)
+        ]
+        heapq.heapify(self.arrivals)
+
+    def reset_row(self, row: int):
+        """
+        Restores the package in the row to its state at the start of the day.
+        """
+        self.addresses.pop(row, None)
+        self.current_zip_codes.pop(row, None)
+        self.address_indices[row] = self.initial_address_indices[row]
+        self.set_status(row, DELAYED if self.delayed_until[row] > 480 else AT_THE_HUB)
+        self.tracking.pop(row, None)
+
+    def set_status(self, row: int, status: int):
+        """
+        Sets the status code of the package in the row, keeping the status counts, the changes and the pending arrivals current.
+        """
+        previous = self.statuses[row]
+        if previous == status:
+            return
+        self.statuses[row] = status
+        self.counts[previous] -= 1
+        self.counts[status] += 1
+        self.changes.append(row)
+        if status == DELAYED:
+            heapq.heappush(self.arrivals, self.delayed_until[row] << ARRIVAL_SHIFT | row)
+
+    def rows_with(self, *statuses: int) -> list[int]:
+        """
+        Returns the rows with any of the status codes, in row order. The status column is searched as bytes, so the rows with other codes are skipped in C rather than visited one by one.
+        """
+        # the wanted codes become 1 and every other code 0, so a single byte is searched for
+        marks = self.statuses.tobytes().translate(
+            bytes(code in statuses for code in range(256))
+        )
+        rows = []
+        row = marks.find(1)
+        while row != -1:
+            rows.append(row)
+            row = marks.find(1, row + 1)
+        return rows
+
+    def next_arrival(self) -> Optional[int]:
+        """
+        Returns the earliest time a delayed package arrives at the hub, or None if no package is delayed.
+        """
+        arrivals = self.arrivals
+        while arrivals and self.statuses[arrivals[0] & ROW_MASK] != DELAYED:
+            heapq.heappop(arrivals)
+        return arrivals[0] >> ARRIVAL_SHIFT if arrivals else None
+
+    def pop_arrivals(self, time: float) -> list[int]:
+        """
+        Removes and returns the rows of the delayed packages that arrive by the time, in the order they arrive.
+        """
+        arrived: dict[int, None] = {}
+        arrivals = self.arrivals
+        while arrivals and arrivals[0] >> ARRIVAL_SHIFT <= time:
+            row = heapq.heappop(arrivals) & ROW_MASK
+            # a row that was delayed twice has two entries
+            if self.statuses[row] == DELAYED:
+                arrived[row] = None
+        return list(arrived)
+
+    def initial_event(self, row: int) -> tuple[float, str]:
+        """
+        Returns the tracking event the package in the row starts the day with.
+        """
+        # the first event of every package is one of a few, so the event tuples are shared rather than formatted per package
+        if self.delayed_until[row] > 480 and self.updated_streets[row] != EMPTY_STRING:
+            return INITIAL_EVENTS["On hold: Invalid address"]
+        elif self.delayed_until[row] > 480:
+            return INITIAL_EVENTS["Delayed inbound to the hub"]
+        return INITIAL_EVENTS["Ready for delivery at the hub"]
+
+    def address(self, row: int) -> str:
+        """
+        Returns the street the package in the row is currently addressed to.
+        """
+        return self.strings[self.addresses.get(row, self.streets[row])]
+
+    def zip_code(self, row: int) -> str:
+        """
+        Returns the zip code the package in the row is currently addressed to.
+        """
+        return self.strings[self.current_zip_codes.get(row, self.zip_codes[row])]
+
+    def events(self, row: int) -> list[tuple[float, str]]:
+        """
+        Returns the tracking events of the package in the row. Only the list of a row with more than its initial event is stored, and should be changed through add_event.
+        """
+        events = self.tracking.get(row)
+        if events == None:
+            return [self.initial_event(row)]
+        return events
+
+    def add_event(self, row: int, event: tuple[float, str]):
+        """
+        Appends a tracking event to the package in the row.
+        """
+        events = self.tracking.get(row)
+        if events == None:
+            self.tracking[row] = [self.initial_event(row), event]
+        else:
+            events.append(event)
@@ -1,34 +1,135 @@
+from array import array
+
 from utilities.hash_table import HashTable
-from wgups.package import Package
-from typing import Optional
+from wgups.metrics import SolveMetrics
+from wgups.package import Package, parse_constraints
+from wgups.package_store import AT_THE_HUB, DELAYED, DELIVERED, PackageStore
+from wgups.snapshot import Snapshot, is_snapshot
+from wgups.trace import NullSink, PackagesLoaded, TraceSink
+from typing import Callable, Optional
 import csv
 
+# the store column of each package column of a snapshot
+SNAPSHOT_COLUMNS = {
+    "package_ids": "package_id",
+    "weights": "weight",
+    "deadlines": "deadline",
+    "delayed_until": "delayed_until",
+    "required_trucks": "required_truck",
+    "group_ids": "group_id",
+    "initial_address_indices": "address_index",
+    "updated_address_indices": "updated_address_index",
+    "streets": "street",
+    "cities": "city",
+    "zip_codes": "zip",
+    "deadline_texts": "deadline_text",
+    "notes": "note",
+    "updated_streets": "updated_street",
+    "updated_zip_codes": "updated_zip",
+}
+
 
 class PackageTable:
-    def __init__(self, package_file_path: str):
-        self.package_table: HashTable[int, Package] = HashTable()
-        self.package_list: list[Package] = []
-        self._load_package_data(package_file_path)
+    def __init__(
+        self, package_file_path: Optional[str] = None, trace: Optional[TraceSink] = None
+    ):
+        # the columns of the packages, whose views are built by get_package rather than kept per row
+        self.store = PackageStore()
+        # the row of each package ID, shared by clones since the rows never change. Both are stored as int32 like the columns
+        self.rows: HashTable[int, int] = HashTable(key_type="i", value_type="i")
+        # distance table address index of every package, indexed by package ID where 0 is the HUB
+        self.address_indices = array("i")
+        self.hub_address_index = -1
+        # number of packages in each group of more than one package, keyed by group id. Any other package is its own group
+        self.group_sizes: dict[int, int] = {}
+        # content hash of the snapshot the table was opened from, address indices stored in it are already resolved
+        self.snapshot_hash: Optional[str] = None
+        # metrics of the solve working on this table, when it is profiled
+        self.metrics: Optional[SolveMetrics] = None
+        if package_file_path is not None:
+            if is_snapshot(package_file_path):
+                self._load_snapshot(Snapshot(package_file_path))
+            else:
+                self._load_package_data(package_file_path)
+
+            if trace == None:
+                trace = NullSink()
+            if trace.enabled:
+                trace.emit(PackagesLoaded(len(self.store)))
+
+    def clone(self) -> "PackageTable":
+        """
+        Returns a new package table with every package at the start of the day. The parsed package data is shared, so this is O(n) and does not read the package file again.
+        """
+        table = PackageTable()
+        table.store = self.store.clone()
+        table.rows = self.rows
+        table.hub_address_index = self.hub_address_index
+        table.group_sizes = self.group_sizes
+        table.snapshot_hash = self.snapshot_hash
+        table._index_addresses()
+        return table
+
+    def reset(self):
+        """
+        Restores every package in the table to its state at the start of the day.
+        """
+        self.store.reset()
+        self._index_addresses()
+
+    def resolve_address_indices(self, get_address_index: Callable[[str], int]):
+        """
+        Given a lookup from formatted address to distance table index, resolves the address index of every package up front, including updated addresses that are applied later by update_statuses.
+        """
+        self.hub_address_index = get_address_index("HUB")
+        for package in self.get_package_list():
+            package.initial_address_index = get_address_index(
+                package.initial_address + " " + package.initial_zip_code
+            )
+            package.address_index = get_address_index(package.formatted_address())
+
+            constraints = package.constraints
+            if constraints.updated_address != "":
+                constraints.updated_address_index = get_address_index(
+                    constraints.updated_address + " " + constraints.updated_zip_code
+                )
+        self._index_addresses()
+
+    def add_package(self, package: Package):
+        """
+        Adds a package to the table. The package must be the view of the next row of the table's store.
+        """
+        self.rows.insert(package.package_id, package.row)
 
     def get_package(self, package_id: int) -> Optional[Package]:
         """
         Returns the package object with the given package_id
         """
-        return self.package_table.get(package_id)
+        row = self.rows.get(package_id)
+        if row == None:
+            return None
+        return Package(self.store, row)
 
     def get_package_list(self) -> list[Package]:
         """
         Returns a full list of packages
         """
-        return self.package_list
+        store = self.store
+        return [Package(store, row) for row in range(len(store))]
 
     def get_undelivered_packages(self) -> list[Package]:
         """
         Returns a list of packages that have not yet been delivered
         """
-        return [
-            package for package in self.package_list if package.status != "delivered"
-        ]
+        store = self.store
+        return [Package(store, row) for row in store.rows_with(AT_THE_HUB, DELAYED)]
+
+    def get_packages_at_hub(self) -> list[Package]:
+        """
+        Returns a list of the packages that are at the hub ready for delivery, in package list order
+        """
+        store = self.store
+        return [Package(store, row) for row in store.rows_with(AT_THE_HUB)]
 
     def get_package_group(self, package_id: int) -> list[int]:
         """
@@ -38,47 +139,72 @@ class PackageTable:
         if package is None:
             return []
 
+        group_id = package.group_id
+        package_ids = self.store.package_ids
         return [
-            p.package_id for p in self.package_list if p.group_id == package.group_id
+            package_ids[row]
+            for row, package_group in enumerate(self.store.group_ids)
+            if package_group == group_id
         ]
 
+    def get_group_size(self, group_id: int) -> int:
+        """
+        Returns the number of packages in the group with the given group id.
+        """
+        return self.group_sizes.get(group_id, 1)
+
     def next_package_arrival(self) -> float:
         """
         This returns the time that the next package should be arriving at the hub ready for delivery.
         """
-        delayed_packages = [1440.0] + [
-            p.constraints.delayed_until
-            for p in self.package_list
-            if p.status == "delayed"
-        ]
-        return min(delayed_packages)
+        next_arrival = self.store.next_arrival()
+        if next_arrival == None:
+            return 1440.0
+        return min(1440.0, next_arrival)
 
     def update_statuses(self, time: float):
         """
         This updates the package statuses based on the provided time. Useful for determining when delayed packages have finally arrived to the hub and updating their status so that they may appear in the savings lists.
+        Only the packages that arrive are visited, taken from the pending arrivals in delayed_until order.
         """
-        for package in self.package_list:
-            if (
-                package.status == "delayed"
-                and time >= package.constraints.delayed_until
-            ):
-                package.status = "at the hub"
-                if package.constraints.updated_address != "":
-                    package.address = package.constraints.updated_address
-                    package.zip_code = package.constraints.updated_zip_code
-                    package.add_tracking_info(
-                        package.constraints.delayed_until, "Updated package address"
-                    )
-                else:
-                    package.add_tracking_info(
-                        package.constraints.delayed_until, "Arrived at the hub"
-                    )
+        for row in self.store.pop_arrivals(time):
+            package = Package(self.store, row)
+            package.status = "at the hub"
+            if package.constraints.updated_address != "":
+                package.address = package.constraints.updated_address
+                package.zip_code = package.constraints.updated_zip_code
+                package.address_index = package.constraints.updated_address_index
+                self.address_indices[package.package_id] = package.address_index
+                package.add_tracking_info(
+                    package.constraints.delayed_until, "Updated package address"
+                )
+            else:
+                package.add_tracking_info(
+                    package.constraints.delayed_until, "Arrived at the hub"
+                )
 
     def packages_remaining(self) -> int:
         """
         Returns the number of packages that have not yet been delivered
         """
-        return len(self.get_undelivered_packages())
+        return len(self.store) - self.store.counts[DELIVERED]
+
+    def _index_addresses(self):
+        # Unknown package IDs fall back to the HUB, matching the lookup by formatted address
+        store = self.store
+        size = max(store.package_ids, default=0) + 1
+        self.address_indices = array("i", [self.hub_address_index]) * size
+        for package_id, address_index in zip(store.package_ids, store.address_indices):
+            self.address_indices[package_id] = address_index
+
+    def _count_groups(self):
+        # Counts the packages of each group, keeping only the groups of more than one package
+        sizes: dict[int, int] = {}
+        for group_id in self.store.group_ids:
+            sizes[group_id] = sizes.get(group_id, 0) + 1
+        self.group_sizes = {
+            group_id: size for group_id, size in sizes.items() if size > 1
+        }
 
     def _load_package_data(self, file_path: str):
         # Reads the package information as a CSV file and builds a hashtable of packages
@@ -94,38 +220,75 @@ class PackageTable:
                 weight = int(row[6])
                 note = row[7]
 
-                package = Package(
-                    package_id, address, deadline, city, zip_code, weight, note
+                package = self.store.add(
+                    package_id,
+                    address,
+                    deadline,
+                    city,
+                    zip_code,
+                    weight,
+                    note,
+                    **parse_constraints(deadline, note),
                 )
 
-                self.package_table.insert(package_id, package)
-                self.package_list.append(package)
+                self.add_package(package)
 
         # Some packages have paired packages that must be grouped together by their group id
-        # This is a union find problem
+        # This is a union find problem over the group id column
+        store = self.store
+        group_ids = store.group_ids
+
         def find(package_id: int) -> int:
-            package = self.get_package(package_id)
-            assert package is not None
+            row = self.rows.get(package_id)
+            assert row is not None
 
-            if package.group_id == package_id:
+            if group_ids[row] == package_id:
                 return package_id
-            package.group_id = find(package.group_id)
-            return package.group_id
+            group_ids[row] = find(group_ids[row])
+            return group_ids[row]
 
         def union(p1: int, p2: int):
             group1 = find(p1)
             group2 = find(p2)
             if group1 != group2:
-                package1 = self.get_package(group1)
-                package2 = self.get_package(group2)
-                assert package1 is not None and package2 is not None
-                package1.group_id = group2
+                row = self.rows.get(group1)
+                assert row is not None and self.rows.get(group2) is not None
+                group_ids[row] = group2
+
+        for row, package_id in enumerate(store.package_ids):
+            paired_packages = store.paired_ids[
+                store.paired_offsets[row] : store.paired_offsets[row + 1]
+            ]
+            for paired_package in paired_packages:
+                union(package_id, paired_package)
+
+        for package_id in store.package_ids:
+            find(package_id)
+
+        self._count_groups()
+        self._index_addresses()
 
-        for package in self.package_list:
-            for paired_package in package.constraints.paired_packages:
-                union(package.package_id, paired_package)
+    def _load_snapshot(self, snapshot: Snapshot):
+        # Adopts the columns of a compiled snapshot, whose notes, groups and addresses are already resolved, as views
+        # of the mapped file. Only the address indices are copied, since they are resolved again for another distance file
+        columns = {
+            name: snapshot.column("package." + column)
+            for name, column in SNAPSHOT_COLUMNS.items()
+        }
+        for name in ["initial_address_indices", "updated_address_indices"]:
+            columns[name] = array("i", columns[name].tobytes())
+        self.store = PackageStore.from_columns(
+            columns,
+            snapshot.column("package.paired_offsets"),
+            snapshot.column("package.paired_ids"),
+            snapshot.strings(),
+        )
 
-        for package in self.package_list:
-            find(package.package_id)
+        self.rows = HashTable.from_columns(
+            self.store.package_ids, range(len(self.store)), "i", "i"
+        )
+        self.hub_address_index = snapshot.hub_address_index
 
-        print(f"Loaded {len(self.package_list)} packages")
+        self.snapshot_hash = snapshot.content_hash
+        self._count_groups()
+        self._index_addresses()
@@ -1,5 +1,4 @@
 from typing import Optional
-from utilities.hash_table import HashTable
 from wgups.distance_table import DistanceTable
 from wgups.package_table import Package, PackageTable
 
@@ -8,6 +7,37 @@ MAX_PACKAGES = 16
 DUE_BACK_BUFFER = 15
 DEBUG = False
 
+# the longest run of consecutive deliveries that an Or-opt move relocates
+OR_OPT_MAX_SEGMENT = 3
+# moves must save more than this many miles, so float noise can not cause the local search to cycle
+IMPROVEMENT_EPSILON = 1e-9
+
+
+class RouteDirection:
+    """
+    Cached timing of a route driven in one direction. Extending the route at either end, or joining it to another route, can be checked from these values in O(1) without walking the deliveries.
+    """
+
+    __slots__ = ("first", "last", "path_distance", "end_time", "slack")
+
+    def __init__(
+        self,
+        first: int,
+        last: int,
+        path_distance: float,
+        end_time: float,
+        slack: float,
+    ):
+        # package IDs of the first and last stops, 0 (the HUB) when the route is empty
+        self.first = first
+        self.last = last
+        # miles from the HUB to the last stop
+        self.path_distance = path_distance
+        # arrival time at the last stop
+        self.end_time = end_time
+        # minutes that every arrival could be delayed before a deadline is missed
+        self.slack = slack
+
 
 class Route:
     def __init__(
@@ -22,6 +52,13 @@ class Route:
         self.has_simulated = False
         self.due_back_time = 1440.0
 
+        # timing of the deliveries in order and in reverse, kept up to date as the route changes
+        self.forward = RouteDirection(0, 0, 0.0, departure_time, float("inf"))
+        self.reverse = self.forward
+        # number of packages from each group in the route, and the groups that are only partially in the route
+        self.group_counts: dict[int, int] = {}
+        self.incomplete_groups: dict[int, None] = {}
+
     def set_due_back_time(self, time: float):
         """
         Updates the route's due back time which limits the route from being extended beyond that time, plus an additional buffer.
@@ -32,14 +69,135 @@ class Route:
         """
         Returns the group id if the route has a group of packages that are not all included in the route.
         """
-        counts = HashTable()
-        for p in self.deliveries:
-            counts[p.group_id] = (counts[p.group_id] or 0) + 1
-        for group_id, count in counts.items():
-            if count < len(self.package_table.get_package_group(group_id)):
-                return group_id
+        for group_id in self.incomplete_groups:
+            return group_id
         return None
 
+    def _add_to_groups(self, group_counts: dict[int, int]):
+        # Adds packages to the group counts, given the number of packages being added from each group
+        for group_id, count in group_counts.items():
+            count += self.group_counts.get(group_id, 0)
+            self.group_counts[group_id] = count
+            if count < self.package_table.get_group_size(group_id):
+                self.incomplete_groups[group_id] = None
+            else:
+                self.incomplete_groups.pop(group_id, None)
+
+    def _max_packages(self, added_group_counts: dict[int, int]) -> int:
+        # The maximum route length once packages are added, given the number of packages being added from each group.
+        # If there are packages that are part of a group missing from this route, there should be enough remaining space to add them.
+        max_packages = MAX_PACKAGES
+        incomplete_group = self.has_incomplete_group()
+        if incomplete_group != None:
+            in_route = self.group_counts.get(
+                incomplete_group, 0
+            ) + added_group_counts.get(incomplete_group, 0)
+            max_packages -= (
+                self.package_table.get_group_size(incomplete_group) - in_route
+            )
+        return max_packages
+
+    def _append_to(
+        self, direction: RouteDirection, package_id: int, deadline: int
+    ) -> RouteDirection:
+        # Timing of the route after the package is added as the last stop, accumulated exactly like a full walk of the route
+        distance = self.distance_table.get_package_distance(direction.last, package_id)
+        end_time = direction.end_time + distance / AVERAGE_SPEED * 60
+        return RouteDirection(
+            direction.first or package_id,
+            package_id,
+            direction.path_distance + distance,
+            end_time,
+            min(direction.slack, deadline - end_time),
+        )
+
+    def _prepend_to(
+        self, direction: RouteDirection, package_id: int, deadline: int
+    ) -> RouteDirection:
+        # Timing of the route after the package is added as the first stop, every other stop is shifted by the detour
+        if direction.first == 0:
+            return self._append_to(direction, package_id, deadline)
+
+        to_package = self.distance_table.get_package_distance(0, package_id)
+        detour = (
+            to_package
+            + self.distance_table.get_package_distance(package_id, direction.first)
+            - self.distance_table.get_package_distance(0, direction.first)
+        )
+        shift = detour / AVERAGE_SPEED * 60
+        arrival = self.departure_time + to_package / AVERAGE_SPEED * 60
+        return RouteDirection(
+            package_id,
+            direction.last,
+            direction.path_distance + detour,
+            direction.end_time + shift,
+            min(direction.slack - shift, deadline - arrival),
+        )
+
+    def _join(self, first: RouteDirection, second: RouteDirection) -> RouteDirection:
+        # Timing of a route that drives first and then second, both departing at this route's departure time
+        detour = self.distance_table.get_package_distance(
+            first.last, second.first
+        ) - self.distance_table.get_package_distance(0, second.first)
+        shift = (first.end_time - self.departure_time) + detour / AVERAGE_SPEED * 60
+        return RouteDirection(
+            first.first,
+            second.last,
+            first.path_distance + detour + second.path_distance,
+            second.end_time + shift,
+            min(first.slack, second.slack - shift),
+        )
+
+    def _is_feasible(
+        self, direction: RouteDirection, count: int, max_packages: int
+    ) -> bool:
+        # The checks of verify_deliveries, answered from the cached timing of a proposed route
+        metrics = self.package_table.metrics
+        if metrics != None:
+            metrics.count("feasibility_checks")
+
+        if count > max_packages:
+            if metrics != None:
+                metrics.count("feasibility_checks.capacity")
+            return False
+
+        return_distance = self.distance_table.get_package_distance(direction.last, 0)
+        finish_time = (
+            self.departure_time
+            + (direction.path_distance + return_distance) / AVERAGE_SPEED * 60
+        )
+        if finish_time > self.due_back_time:
+            if metrics != None:
+                metrics.count("feasibility_checks.due_back")
+            return False
+
+        if direction.slack < 0:
+            if metrics != None:
+                metrics.count("feasibility_checks.deadline")
+            return False
+        return True
+
+    def _refresh(self):
+        # Rebuilds the cached timing and group counts by walking the whole route
+        empty = RouteDirection(0, 0, 0.0, self.departure_time, float("inf"))
+        self.forward = empty
+        self.reverse = empty
+        for package in self.deliveries:
+            self.forward = self._append_to(
+                self.forward, package.package_id, package.constraints.deadline
+            )
+        for package in reversed(self.deliveries):
+            self.reverse = self._append_to(
+                self.reverse, package.package_id, package.constraints.deadline
+            )
+
+        self.group_counts = {}
+        self.incomplete_groups = {}
+        added: dict[int, int] = {}
+        for package in self.deliveries:
+            added[package.group_id] = added.get(package.group_id, 0) + 1
+        self._add_to_groups(added)
+
     def simulate(self):
         """
         Simluates the package deliveries on this route. This method will add tracking details to every package that show them departing the HUB and when they are successfully delivered. No more packages can be added after a route is simulated.
@@ -68,12 +226,174 @@ class Route:
 
             current = package.package_id
 
+    def improve(self) -> float:
+        """
+        Shortens the route in place with 2-opt (reversing a run of deliveries) and Or-opt (moving a run of up to three deliveries elsewhere in the route) moves, until neither finds an improvement. Every move keeps the deadlines met and the route back by its due back time. Returns the number of miles saved.
+        """
+        if self.has_simulated:
+            raise Exception("Attempt to improve a route that has been simulated.")
+        if len(self.deliveries) < 3:
+            return 0.0
+
+        route = self.deliveries[::]
+        improved: Optional[list[Package]] = route
+        while improved != None:
+            route = improved
+            arrivals = self._arrival_times(route)
+            improved = self._two_opt(route, arrivals)
+            if improved == None:
+                improved = self._or_opt(route, arrivals)
+
+        if route == self.deliveries:
+            return 0.0
+
+        # a final full check guards against float rounding in the move deltas
+        before = self.route_distance()
+        after = self.calculate_distance(route)
+        if (
+            after >= before
+            or self.departure_time + self.calculate_time(route) > self.due_back_time
+            or not self._is_on_time(route, 0, len(route) - 1, [])
+        ):
+            return 0.0
+
+        self.deliveries = route
+        self._refresh()
+        return before - after
+
+    def _arrival_times(self, route: list[Package]) -> list[float]:
+        # Arrival time at each stop, accumulated exactly like verify_deliveries
+        arrivals = []
+        time = self.departure_time
+        current = 0
+        for package in route:
+            time += (
+                self.distance_table.get_package_distance(current, package.package_id)
+                / AVERAGE_SPEED
+                * 60
+            )
+            arrivals.append(time)
+            current = package.package_id
+        return arrivals
+
+    def _is_on_time(
+        self, route: list[Package], start: int, end: int, arrivals: list[float]
+    ) -> bool:
+        # Checks the deadlines of the stops from start to end, given the arrival times of an unchanged route before start
+        time = self.departure_time if start == 0 else arrivals[start - 1]
+        current = 0 if start == 0 else route[start - 1].package_id
+        for i in range(start, end + 1):
+            package = route[i]
+            time += (
+                self.distance_table.get_package_distance(current, package.package_id)
+                / AVERAGE_SPEED
+                * 60
+            )
+            if time > package.constraints.deadline:
+                return False
+            current = package.package_id
+        return True
+
+    def _two_opt(
+        self, route: list[Package], arrivals: list[float]
+    ) -> Optional[list[Package]]:
+        # Returns the route with the first improving reversal of deliveries i to j applied, or None.
+        # Only the two edges at the ends of the reversed run change, so the saving is O(1) to evaluate. An improving move
+        # brings every later stop forward, so only the deadlines in the reversed run need checking.
+        distance = self.distance_table.get_package_distance
+        n = len(route)
+        for i in range(n - 1):
+            before = route[i - 1].package_id if i > 0 else 0
+            first = route[i].package_id
+            for j in range(i + 1, n):
+                last = route[j].package_id
+                after = route[j + 1].package_id if j + 1 < n else 0
+                delta = (
+                    distance(before, last)
+                    + distance(first, after)
+                    - distance(before, first)
+                    - distance(last, after)
+                )
+                if delta >= -IMPROVEMENT_EPSILON:
+                    continue
+
+                proposed = route[:i] + route[i : j + 1][::-1] + route[j + 1 :]
+                if self._is_on_time(proposed, i, j, arrivals):
+                    return proposed
+        return None
+
+    def _or_opt(
+        self, route: list[Package], arrivals: list[float]
+    ) -> Optional[list[Package]]:
+        # Returns the route with the first improving relocation of a run of deliveries applied, or None.
+        # The run may be reinserted reversed. As with 2-opt, only the deadlines between the old and new position need checking.
+        distance = self.distance_table.get_package_distance
+        n = len(route)
+        for length in range(1, min(OR_OPT_MAX_SEGMENT, n - 1) + 1):
+            for i in range(n - length + 1):
+                segment = route[i : i + length]
+                rest = route[:i] + route[i + length :]
+                before = route[i - 1].package_id if i > 0 else 0
+                after = route[i + length].package_id if i + length < n else 0
+                first = segment[0].package_id
+                last = segment[-1].package_id
+                removed = (
+                    distance(before, first)
+                    + distance(last, after)
+                    - distance(before, after)
+                )
+
+                for k in range(len(rest) + 1):
+                    if k == i:
+                        continue
+                    u = rest[k - 1].package_id if k > 0 else 0
+                    v = rest[k].package_id if k < len(rest) else 0
+                    for reverse in (False, True) if length > 1 else (False,):
+                        head, tail = (last, first) if reverse else (first, last)
+                        delta = (
+                            distance(u, head)
+                            + distance(tail, v)
+                            - distance(u, v)
+                            - removed
+                        )
+                        if delta >= -IMPROVEMENT_EPSILON:
+                            continue
+
+                        moved = segment[::-1] if reverse else segment
+                        proposed = rest[:k] + moved + rest[k:]
+                        start = min(i, k)
+                        end = max(i, k) + length - 1
+                        if self._is_on_time(proposed, start, end, arrivals):
+                            return proposed
+        return None
+
+    def unsimulate(self):
+        """
+        Reverses a simulation of this route, removing the departure and delivery tracking info it added to every package, so the deliveries can be changed and the route simulated again.
+        """
+        if not self.has_simulated:
+            raise Exception("Attempt to unsimulate a route that has not been simulated.")
+        self.has_simulated = False
+
+        # simulate adds the departure and delivery to the end of each package's tracking info
+        for package in self.deliveries:
+            package.tracking_info = package.tracking_info[:-2]
+            package.status = "at the hub"
+
     def contains_package(self, package_id: int) -> bool:
         """
         Given a package ID, returns True if the package exists in this route.
         """
         return package_id in self.packages
 
+    def is_endpoint(self, package_id: int) -> bool:
+        """
+        Given a package ID, returns True if the package is the first or last delivery of this route.
+        """
+        return package_id != 0 and (
+            self.forward.first == package_id or self.forward.last == package_id
+        )
+
     def insert_package(self, package_id: int) -> bool:
         """
         Attempts to insert a package somewhere in the route in the most efficient place that will not violate any constraints.
@@ -112,6 +432,7 @@ class Route:
 
         self.deliveries = best_route
         self.packages.add(package_id)
+        self._refresh()
 
         return True
 
@@ -125,23 +446,59 @@ class Route:
                 print("Route has already been simulated.")
             return False
 
-        package = self.package_table.get_package(package_id)
-        paired_package = self.package_table.get_package(paired_package_id)
-        if package == None or paired_package == None:
+        # the proposed route is checked from the columns of the two rows, views of the packages are only built once
+        # they are added
+        pt = self.package_table
+        row = pt.rows.get(package_id)
+        paired_row = pt.rows.get(paired_package_id)
+        if row == None or paired_row == None:
             raise Exception("An invalid package ID was provided.")
+        store = pt.store
+
+        added = [row]
+        if len(self.deliveries) == 0:
+            added.append(paired_row)
 
-        proposed_deliveries = []
-        include_paired = False
+        # Verify correct truck, packages already in the route were checked when they were added
+        for r in added:
+            required_truck = store.required_trucks[r]
+            if required_truck and required_truck != self.truck_id:
+                if DEBUG:
+                    print(
+                        f"Proposed route violates truck restraint for package {store.package_ids[r]}"
+                    )
+                # counted as a check of the proposed route, which the cached checks never reach
+                metrics = pt.metrics
+                if metrics != None:
+                    metrics.count("feasibility_checks")
+                    metrics.count("feasibility_checks.truck")
+                return False
 
         # if this is a new route, add both packages
         # otherwise add the single package only if the other is not interior to the route
+        # the timing of the proposed route is worked out in both directions from the cached timing of this route
+        deadline = store.deadlines[row]
         if len(self.deliveries) == 0:
-            proposed_deliveries = [package, paired_package]
-            include_paired = True
+            paired_deadline = store.deadlines[paired_row]
+            forward = self._append_to(
+                self._append_to(self.forward, package_id, deadline),
+                paired_package_id,
+                paired_deadline,
+            )
+            reverse = self._append_to(
+                self._append_to(self.reverse, paired_package_id, paired_deadline),
+                package_id,
+                deadline,
+            )
+            at_front = False
         elif self.deliveries[0].package_id == paired_package_id:
-            proposed_deliveries = [package] + self.deliveries[::]
+            forward = self._prepend_to(self.forward, package_id, deadline)
+            reverse = self._append_to(self.reverse, package_id, deadline)
+            at_front = True
         elif self.deliveries[-1].package_id == paired_package_id:
-            proposed_deliveries = self.deliveries[::] + [package]
+            forward = self._append_to(self.forward, package_id, deadline)
+            reverse = self._prepend_to(self.reverse, package_id, deadline)
+            at_front = False
         else:
             if DEBUG:
                 print(
@@ -149,23 +506,37 @@ class Route:
                 )
             return False
 
+        added_group_counts: dict[int, int] = {}
+        for r in added:
+            group_id = store.group_ids[r]
+            added_group_counts[group_id] = added_group_counts.get(group_id, 0) + 1
+        count = len(self.deliveries) + len(added)
+        max_packages = self._max_packages(added_group_counts)
+
         # verify the route is still legal after the change before officially updating
         # will also try reversing the route if it helps
-        if self.verify_deliveries(proposed_deliveries):
-            self.deliveries = proposed_deliveries
-            self.packages.add(package_id)
-            if include_paired:
-                self.packages.add(paired_package_id)
-            return True
-        elif self.verify_deliveries(proposed_deliveries[::-1]):
-            self.deliveries = proposed_deliveries[::-1]
-            self.packages.add(package_id)
-            if include_paired:
-                self.packages.add(paired_package_id)
-            return True
+        if self._is_feasible(forward, count, max_packages):
+            reverse_route = False
+        elif self._is_feasible(reverse, count, max_packages):
+            reverse_route = True
         else:
             return False
 
+        packages = [Package(store, r) for r in added]
+        if at_front:
+            self.deliveries.insert(0, packages[0])
+        else:
+            self.deliveries.extend(packages)
+        self.forward, self.reverse = forward, reverse
+        if reverse_route:
+            self.deliveries.reverse()
+            self.forward, self.reverse = reverse, forward
+
+        for p in packages:
+            self.packages.add(p.package_id)
+        self._add_to_groups(added_group_counts)
+        return True
+
     def merge(self, other: "Route", p1_id: int, p2_id: int) -> bool:
         """
         Given this route and another route, as well as a package that exists in this route and a paired package that exists in the other, attempt to merge the two routes together. The merged route is added to this route. Returns True if the routes were successfully merged, and False otherwise.
@@ -174,31 +545,96 @@ class Route:
         if self.has_simulated or other.has_simulated:
             return False
 
-        merged_deliveries = []
+        # the cached timing assumes both routes leave together on the same truck
+        if (
+            other.departure_time != self.departure_time
+            or other.truck_id != self.truck_id
+        ):
+            return self._merge_deliveries(other, p1_id, p2_id)
+
+        # the package count of the merged route is the same in either direction, so a merge that is too large is rejected
+        # before the timing of either direction is joined
+        count = len(self.deliveries) + len(other.deliveries)
+        max_packages = self._max_packages(other.group_counts)
+        if count > max_packages:
+            metrics = self.package_table.metrics
+            if metrics != None:
+                metrics.count("feasibility_checks")
+                metrics.count("feasibility_checks.capacity")
+            return False
 
         # attempts to merge front to front, front to back, or back to back
-        if self.deliveries[-1] == p1_id or self.deliveries[-1] == p2_id:
-            if other.deliveries[0] == p1_id or other.deliveries[0] == p2_id:
+        # each case is the route driven first and the route driven second, and whether each is driven in reverse
+        if self.forward.last in (p1_id, p2_id):
+            if other.forward.first in (p1_id, p2_id):
+                first, first_reversed, second, second_reversed = self, False, other, False
+            else:
+                first, first_reversed, second, second_reversed = self, False, other, True
+        else:
+            if other.forward.first in (p1_id, p2_id):
+                first, first_reversed, second, second_reversed = self, True, other, False
+            else:
+                first, first_reversed, second, second_reversed = other, False, self, False
+
+        # the merged route driven in reverse is the second route reversed followed by the first route reversed
+        forward = self._join(
+            first.reverse if first_reversed else first.forward,
+            second.reverse if second_reversed else second.forward,
+        )
+        reverse = self._join(
+            second.forward if second_reversed else second.reverse,
+            first.forward if first_reversed else first.reverse,
+        )
+
+        # verifies that the new updated route is still legal forwards or in reverse
+        if self._is_feasible(forward, count, max_packages):
+            reverse_route = False
+        elif self._is_feasible(reverse, count, max_packages):
+            reverse_route = True
+        else:
+            return False
+
+        first_deliveries = (
+            first.deliveries[::-1] if first_reversed else first.deliveries
+        )
+        second_deliveries = (
+            second.deliveries[::-1] if second_reversed else second.deliveries
+        )
+        self.deliveries = first_deliveries + second_deliveries
+        self.forward, self.reverse = forward, reverse
+        if reverse_route:
+            self.deliveries.reverse()
+            self.forward, self.reverse = reverse, forward
+
+        self.packages = self.packages.union(other.packages)
+        self._add_to_groups(other.group_counts)
+        return True
+
+    def _merge_deliveries(self, other: "Route", p1_id: int, p2_id: int) -> bool:
+        # Merges by verifying the full merged route, for routes that do not share a departure time and truck
+        merged_deliveries = []
+
+        if self.deliveries[-1].package_id in (p1_id, p2_id):
+            if other.deliveries[0].package_id in (p1_id, p2_id):
                 merged_deliveries = self.deliveries + other.deliveries
             else:
                 merged_deliveries = self.deliveries + other.deliveries[::-1]
         else:
-            if other.deliveries[0] == p1_id or other.deliveries[0] == p2_id:
+            if other.deliveries[0].package_id in (p1_id, p2_id):
                 merged_deliveries = self.deliveries[::-1] + other.deliveries
             else:
                 merged_deliveries = other.deliveries + self.deliveries
 
-        # verifies that the new updated route is still legal forwards or in reverse
         if self.verify_deliveries(merged_deliveries):
             self.deliveries = merged_deliveries
-            self.packages = self.packages.union(other.packages)
-            return True
         elif self.verify_deliveries(merged_deliveries[::-1]):
             self.deliveries = merged_deliveries[::-1]
-            self.packages = self.packages.union(other.packages)
-            return True
+        else:
+            return False
 
-        return False
+        self.packages = self.packages.union(other.packages)
+        self._refresh()
+        return True
 
     def calculate_distance(self, route: list[Package]) -> float:
         """
@@ -242,6 +678,10 @@ class Route:
         Does not check if grouped packages are together.
         """
 
+        metrics = self.package_table.metrics
+        if metrics != None:
+            metrics.count("verify_deliveries")
+
         # if there are packages that are part of a group missing from this route
         # there should be enough remaining space to add them
         max_packages = MAX_PACKAGES
@@ -255,6 +695,8 @@ class Route:
                 print(
                     f"Proposed route contains too many packages. Maximum is {max_packages}"
                 )
+            if metrics != None:
+                metrics.count("verify_deliveries.capacity")
             return False
 
         proposed_route_finish_time = self.departure_time + self.calculate_time(proposed)
@@ -264,6 +706,8 @@ class Route:
                 print(
                     f"Proposed route finishes after due back time, at {self.route_finish_time()}."
                 )
+            if metrics != None:
+                metrics.count("verify_deliveries.due_back")
             return False
 
         time = self.departure_time
@@ -280,6 +724,8 @@ class Route:
                     print(
                         f"Proposed route violates truck restraint for package {package.package_id}"
                     )
+                if metrics != None:
+                    metrics.count("verify_deliveries.truck")
                 return False
 
             distance = self.distance_table.get_package_distance(
@@ -294,6 +740,8 @@ class Route:
                     print(
                         f"Proposed route violates deadline restraint for package {package.package_id}"
                     )
+                if metrics != None:
+                    metrics.count("verify_deliveries.deadline")
                 return False
 
         if DEBUG:
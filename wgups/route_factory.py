@@ -1,7 +1,9 @@
+import time
+from typing import Iterable, Optional
 from wgups.distance_table import DistanceTable
+from wgups.package_store import AT_THE_HUB
 from wgups.package_table import PackageTable
 from wgups.route import Route
-from wgups.savings_list import SavingsList
 from wgups.truck import Truck
 
 SAVINGS_ALPHA = 0
@@ -12,20 +14,31 @@ class RouteFactory:
         self.pt = pt
         self.dt = dt
 
-    def compute_routes(self, savings_list: SavingsList, current_truck: Truck):
+    def compute_routes(
+        self,
+        savings_list: Iterable[tuple[float, int, int]],
+        current_truck: Truck,
+        changes: Optional[list[Optional[tuple[int, ...]]]] = None,
+    ):
         """
         Given a savings list and truck, generates a series of possible routes using the Clarke-Wright savings algorithm.
+        If a list is provided for changes, then for each savings pair with savings, the deliveries of the route the pair changed are appended to it in order, or None if the pair changed nothing.
         """
 
         # generate routes from the savings list and package constraints
-        assigned_packages = set()
-        candidate_routes = []
+        # each assigned package maps to the candidate route that owns it, and the candidate routes are kept
+        # in creation order in a dict so that a merged route can be dropped without shifting the others
+        route_owners: dict[int, Route] = {}
+        candidates: dict[int, Route] = {}
 
         # if we know there are delayed packages inbound to the hub, we should schedule routes that return to the hub by this time
         # this is necessary because those delayed packages may have deadlines and a truck should be waiting for them
         # if a truck returns a few minutes early, it will be unable to depart with more packages and end up waiting
         due_back_time = self.pt.next_package_arrival()
 
+        metrics = self.pt.metrics
+        start = time.perf_counter() if metrics != None else 0.0
+
         for savings, p1, p2 in savings_list:
 
             # we don't need to waste time checking additions to the route that don't provide enough savings
@@ -33,8 +46,12 @@ class RouteFactory:
             if savings <= SAVINGS_ALPHA:
                 break
 
+            route1 = route_owners.get(p1)
+            route2 = route_owners.get(p2)
+            changed: Optional[Route] = None
+
             # case where neither package is assigned to a potential route yet
-            if p1 not in assigned_packages and p2 not in assigned_packages:
+            if route1 is None and route2 is None:
                 new_route = Route(
                     current_truck.next_available_time,
                     current_truck.id,
@@ -44,49 +61,97 @@ class RouteFactory:
                 new_route.set_due_back_time(due_back_time)
 
                 if new_route.add_package(p1, p2):
-                    candidate_routes.append(new_route)
-                    assigned_packages.add(p1)
-                    assigned_packages.add(p2)
+                    changed = new_route
+                    candidates[id(new_route)] = new_route
+                    route_owners[p1] = new_route
+                    route_owners[p2] = new_route
 
             # case where package 1 is already assigned a route and package 2 is not
-            # we should try to add package 2 to the same route if so
-            elif p1 in assigned_packages and p2 not in assigned_packages:
-                for route in candidate_routes:
-                    if route.contains_package(p1):
-                        if route.add_package(p2, p1):
-                            assigned_packages.add(p2)
-                        break
+            # we should try to add package 2 to the same route if so, which is only possible from the ends of the route
+            elif route1 is not None and route2 is None:
+                if route1.is_endpoint(p1) and route1.add_package(p2, p1):
+                    changed = route1
+                    route_owners[p2] = route1
 
             # case where package 2 is already assigned a route and package 1 is not
             # we should try to add package 1 to the same route if so
-            elif p1 not in assigned_packages and p2 in assigned_packages:
-                for route in candidate_routes:
-                    if route.contains_package(p2):
-                        if route.add_package(p1, p2):
-                            assigned_packages.add(p1)
-                        break
+            elif route1 is None and route2 is not None:
+                if route2.is_endpoint(p2) and route2.add_package(p1, p2):
+                    changed = route2
+                    route_owners[p1] = route2
 
             # case where both packages are already assigned to separate routes
             # we should try to merge the routes if possible
-            elif p1 in assigned_packages and p2 in assigned_packages:
-                route1_index = 0
-                route2_index = 0
-                for i, route in enumerate(candidate_routes):
-                    if route.contains_package(p1):
-                        route1_index = i
-                    if route.contains_package(p2):
-                        route2_index = i
-                if route1_index == route2_index:
-                    continue
+            elif route1 is not None and route2 is not None:
+                if route1 is not route2 and route1.merge(route2, p1, p2):
+                    changed = route1
+                    del candidates[id(route2)]
+                    for package_id in route2.packages:
+                        route_owners[package_id] = route1
+
+            if changes is not None:
+                changes.append(
+                    None
+                    if changed is None
+                    else tuple(p.package_id for p in changed.deliveries)
+                )
 
-                if candidate_routes[route1_index].merge(
-                    candidate_routes[route2_index], p1, p2
-                ):
-                    candidate_routes.pop(route2_index)
+        candidate_routes = list(candidates.values())
+        completing = 0.0
+        if metrics != None:
+            completing = time.perf_counter()
+            metrics.add_time("routes", completing - start)
 
         valid_routes = self.complete_subgroup(candidate_routes)
+        if metrics != None:
+            metrics.add_time("groups", time.perf_counter() - completing)
         return valid_routes
 
+    def compute_lone_routes(
+        self, current_truck: Truck, next_arrival: float = 1440
+    ) -> list[Route]:
+        """
+        Returns a route for each package at the hub that the truck can deliver on its own, with the rest of its group if it has one.
+        Routes are built from pairs of packages, so a package left without a partner it can be paired with, such as the last package at the hub, is only routed this way.
+        Before the next arrival at the hub, only the packages that could no longer be delivered by waiting for it are considered.
+        """
+        routes = []
+        store = self.pt.store
+        for row in store.rows_with(AT_THE_HUB):
+            package_id = store.package_ids[row]
+            if next_arrival < 1440:
+                later = Route(next_arrival, current_truck.id, self.dt, self.pt)
+                if later.insert_package(package_id):
+                    continue
+            route = Route(
+                current_truck.next_available_time, current_truck.id, self.dt, self.pt
+            )
+            if route.insert_package(package_id):
+                routes.append(route)
+        return self.complete_subgroup(routes)
+
+    def add_urgent_packages(self, route: Route, next_chance: float):
+        """
+        Inserts into the route the packages at the hub that could no longer meet their deadline on a route of their own leaving at next_chance, the next time a truck could take them.
+        Routes are selected by their efficiency, so without this a package due soon can be left at the hub while the trucks drive routes that pass it by.
+        Grouped packages are left to complete_subgroup, since they can not be inserted alone.
+        """
+        store = self.pt.store
+        for row in store.rows_with(AT_THE_HUB):
+            package_id = store.package_ids[row]
+            if store.deadlines[row] >= 1440 or package_id in route.packages:
+                continue
+            if self.pt.get_group_size(store.group_ids[row]) > 1:
+                continue
+            later = Route(next_chance, route.truck_id, self.dt, self.pt)
+            if later.insert_package(package_id):
+                continue
+            # like an incomplete group, the package is worth extending the due back time for
+            due_back_time = route.due_back_time
+            route.set_due_back_time(1440.0)
+            if not route.insert_package(package_id):
+                route.due_back_time = due_back_time
+
     def complete_subgroup(self, candidate_routes: list[Route]):
         """
         In the cases where a candidate route contains packages that are a part of a group, this tries to add those packages to the route and returns all valid routes in which a group is either fully represented in or absent from the route.
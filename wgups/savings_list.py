@@ -1,11 +1,33 @@
-from typing import Optional
+import heapq
+from typing import Iterator, Optional
 from wgups.distance_table import DistanceTable
+from wgups.package import Package
+from wgups.package_store import AT_THE_HUB
 from wgups.package_table import PackageTable
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the savings are built in pure Python without it
+    np = None
+
+# Sorted savings are converted to Python tuples in chunks this size while iterating,
+# since route construction usually stops long before the end of the list
+ITERATION_CHUNK_SIZE = 1024
+
+# Packages that arrive at the hub are added as separate sorted runs, merged while iterating.
+# Past this many runs they are merged back into one.
+MAX_RUNS = 8
+
+# rows of the distance matrix scanned at once when finding the nearest neighbors of packages with numpy
+NEIGHBOR_CHUNK_SIZE = 256
+
 
 class SavingsList:
     """
-    A wrapper around a standard list which contains the savings gained by delivering two packages together rather than in separate trips to and from the hub. A key component of the Clarke-Wright Savings Algorithm. Can optionally provide a list of package IDs to limit the number of packages in the calculation.
+    A wrapper around a standard list which contains the savings gained by delivering two packages together rather than in separate trips to and from the hub. A key component of the Clarke-Wright Savings Algorithm. Only packages at the hub are included.
+    The list is meant to be kept for a whole solve and brought up to date with update() after package statuses change, instead of being rebuilt for every truck dispatch.
+    If packages are provided, only the pairs among them are included, such as the packages of one zone.
+    With neighbors above 0 the list is sparse: it only holds the pairs of each package with its nearest neighbors, O(nk) pairs instead of O(n^2). A package left without pairs once its neighbors leave the hub is paired with its nearest neighbors again.
     """
 
     def __init__(
@@ -13,45 +35,412 @@ class SavingsList:
         pt: PackageTable,
         dt: DistanceTable,
         priority_modifier: float = 0.0,
+        packages: Optional[list[Package]] = None,
+        neighbors: int = 0,
     ):
         self.pt = pt
         self.dt = dt
+        self.priority_modifier = priority_modifier
+        # the packages the list is limited to, None for every package
+        self.scope = packages
+        self.scope_rows = None if packages == None else {p.row for p in packages}
+        # number of nearest neighbors each package is paired with, 0 to pair every package with every other
+        self.neighbors = neighbors
+        # the packages each package at the hub is paired with in a sparse list, None in a dense list
+        self.partners: Optional[dict[int, set[int]]] = None
 
-        self.savings_list = []
-        self.package_list = pt.get_package_list()
+        # ties between equal savings are broken by the position of the packages in the package list, which is their row
+        self.positions = {
+            package_id: row for row, package_id in enumerate(pt.store.package_ids)
+        }
 
-        # O(n^2) - uses nested loops to compare each package to every other package to calculate the savings.
-        for i in range(len(self.package_list)):
-            for j in range(i + 1, len(self.package_list)):
-                # We only care about packages that are ready to be delivered
-                if (
-                    self.package_list[i].status != "at the hub"
-                    or self.package_list[j].status != "at the hub"
-                ):
-                    continue
+        # We only care about packages that are ready to be delivered
+        self._rebuild(self._eligible())
+
+    def _eligible(self) -> list[Package]:
+        if self.scope == None:
+            return self.pt.get_packages_at_hub()
+        return [p for p in self.scope if p.status == "at the hub"]
+
+    def _rebuild(self, eligible: list[Package]):
+        # The savings list is sorted by the amount of savings in descending order, ties keep the package list order.
+        # This will be used to determine which packages are best to deliver together first.
+        # Each sorted run is stored as three parallel sequences: the savings and the two package IDs of each pair.
+        if self.neighbors > 0:
+            self.partners = {p.package_id: set() for p in eligible}
+            self.runs = [self._nearest_pairs(eligible, eligible)]
+        elif np is not None:
+            self.runs = [self._build_vectorized(eligible)]
+        else:
+            self.runs = [self._build(eligible)]
+
+        self.members = {p.package_id for p in eligible}
+        self.seen = set(self.members)
+        # number of packages removed since their pairs were last discarded from the runs
+        self.removed_count = 0
+        # the status changes of the package table the list has caught up on
+        self.changes = self.pt.store.changes
+        self.changes_seen = len(self.changes)
+
+    def update(self):
+        """
+        Brings the savings list up to date with the package table. Only the packages whose status changed since the last update are visited: pairs of packages that have left the hub are dropped lazily, and the pairs of newly arrived packages are sorted into a new run, so the cost is O(n) per arrived package and O(1) per other change rather than a full rebuild.
+        """
+        store = self.pt.store
+        if store.changes is not self.changes:
+            # the table was reset since the list was built, so every package may have changed
+            self._rebuild(self._eligible())
+            return
+
+        changed = set(self.changes[self.changes_seen :])
+        self.changes_seen = len(self.changes)
+        removed: set[int] = set()
+        added: list[Package] = []
+        # in package list order, the order a full build adds them in
+        for row in sorted(changed):
+            if self.scope_rows != None and row not in self.scope_rows:
+                continue
+            package_id = store.package_ids[row]
+            if store.statuses[row] != AT_THE_HUB:
+                if package_id in self.members:
+                    removed.add(package_id)
+            elif package_id not in self.members:
+                added.append(Package(store, row))
+
+        # a package that returns to the hub would revive its old pairs, so start over
+        if any(p.package_id in self.seen for p in added):
+            self._rebuild(self._eligible())
+            return
+
+        self.members -= removed
+        self.removed_count += len(removed)
+
+        if self.partners != None:
+            self._update_partners(removed, added)
+        elif added:
+            existing = [p for p in self._eligible() if p.package_id in self.members]
+            if np is not None:
+                self.runs.append(self._insert_vectorized(existing, added))
+            else:
+                self.runs.append(self._insert(existing, added))
+            for package in added:
+                self.members.add(package.package_id)
+                self.seen.add(package.package_id)
+
+        if len(self.runs) > MAX_RUNS:
+            self._merge_runs()
+        elif self.removed_count > len(self.members):
+            self._discard_removed()
+
+    def _update_partners(self, removed: set[int], added: list[Package]):
+        # the pairs of removed packages are dropped lazily like in a dense list, but their partners are told,
+        # so that a package whose every partner has left is found without scanning the list
+        assert self.partners is not None
+        isolated: set[int] = set()
+        for package_id in removed:
+            for partner in self.partners.pop(package_id, set()):
+                partners = self.partners.get(partner)
+                if partners != None:
+                    partners.discard(package_id)
+                    if not partners and partner in self.members:
+                        isolated.add(partner)
+
+        for package in added:
+            self.partners[package.package_id] = set()
+            self.members.add(package.package_id)
+            self.seen.add(package.package_id)
+
+        # the new packages and the isolated ones are paired with their nearest neighbors among every package at the hub,
+        # none of these pairs is in the list yet since an isolated package has no pairs left
+        if isolated or added:
+            at_hub = self._eligible()
+            sources = [p for p in at_hub if p.package_id in isolated] + added
+            self.runs.append(self._nearest_pairs(sources, at_hub))
+
+    def _nearest_pairs(self, sources: list[Package], candidates: list[Package]):
+        # pairs each source with its nearest candidates, the sources being candidates too. Distance ties go to
+        # the candidate first in the package list, and each pair is oriented and sorted like the dense list
+        assert self.partners is not None
+        candidates = sorted(candidates, key=lambda p: self.positions[p.package_id])
+        neighbors = min(self.neighbors, len(candidates) - 1)
+        if np is not None:
+            run = self._nearest_pairs_vectorized(sources, candidates, neighbors)
+        else:
+            run = self._nearest_pairs_python(sources, candidates, neighbors)
+
+        for first, second in zip(run[1], run[2]):
+            self.partners[int(first)].add(int(second))
+            self.partners[int(second)].add(int(first))
+        return run
 
+    def _nearest_pairs_python(
+        self, sources: list[Package], candidates: list[Package], neighbors: int
+    ):
+        columns = {p.package_id: i for i, p in enumerate(candidates)}
+        pairs: set[tuple[int, int]] = set()
+        for source in sources:
+            column = columns[source.package_id]
+            distances = [
+                (self.dt.get_package_distance(source.package_id, c.package_id), i)
+                for i, c in enumerate(candidates)
+                if i != column
+            ]
+            for _, i in heapq.nsmallest(neighbors, distances):
+                pairs.add((min(column, i), max(column, i)))
+
+        savings_list = []
+        for first, second in pairs:
+            p1, p2 = candidates[first], candidates[second]
+            savings = self.calculate_savings(p1.package_id, p2.package_id)
+            priority = 1 + self._priority(p1) + self._priority(p2)
+            savings_list.append((savings * priority, p1.package_id, p2.package_id))
+
+        savings_list.sort(key=self._order_key)
+
+        return (
+            [s[0] for s in savings_list],
+            [s[1] for s in savings_list],
+            [s[2] for s in savings_list],
+        )
+
+    def _nearest_pairs_vectorized(
+        self, sources: list[Package], candidates: list[Package], neighbors: int
+    ):
+        assert np is not None
+
+        package_ids = np.array([p.package_id for p in candidates], dtype=np.int64)
+        addresses = np.array([p.address_index for p in candidates], dtype=np.int64)
+        priorities = np.array([self._priority(p) for p in candidates], dtype=np.float64)
+        if neighbors <= 0:
+            return (
+                np.empty(0, dtype=np.float64),
+                np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.int64),
+            )
+
+        columns = {p.package_id: i for i, p in enumerate(candidates)}
+        source_columns = np.array(
+            [columns[p.package_id] for p in sources], dtype=np.int64
+        )
+        matrix = self._distance_matrix()
+        firsts = []
+        seconds = []
+        for start in range(0, len(sources), NEIGHBOR_CHUNK_SIZE):
+            chunk = source_columns[start : start + NEIGHBOR_CHUNK_SIZE]
+            block = np.array(
+                matrix[np.ix_(addresses[chunk], addresses)], dtype=np.float64
+            )
+            # a package is not its own neighbor
+            block[np.arange(len(chunk)), chunk] = np.inf
+
+            # partial selection of the k-th smallest distance of each row, then every closer candidate and
+            # as many of the candidates at that distance as fit, the first in the package list
+            kth = np.partition(block, neighbors - 1, axis=1)[:, [neighbors - 1]]
+            closer = block < kth
+            level = block == kth
+            room = neighbors - closer.sum(axis=1, keepdims=True)
+            nearest = closer | (level & (np.cumsum(level, axis=1) <= room))
+            rows, nearest_columns = np.nonzero(nearest)
+            firsts.append(np.minimum(chunk[rows], nearest_columns))
+            seconds.append(np.maximum(chunk[rows], nearest_columns))
+
+        # a pair of mutual neighbors is found from both ends
+        count = len(candidates)
+        keys = np.unique(np.concatenate(firsts) * count + np.concatenate(seconds))
+        first, second = keys // count, keys % count
+
+        hub = np.asarray(matrix[self.pt.hub_address_index, addresses], dtype=np.float64)
+        savings = hub[first] + hub[second] - np.asarray(
+            matrix[addresses[first], addresses[second]], dtype=np.float64
+        )
+        savings *= 1 + priorities[first] + priorities[second]
+
+        # candidates are in package list order, so their columns break ties like the positions do
+        order = np.lexsort((second, first, -savings))
+
+        return (savings[order], package_ids[first[order]], package_ids[second[order]])
+
+    def _priority(self, package: Package) -> float:
+        # Priority is a modification to the base Clarke-Wright algorithm to prioritize packages with earlier deadlines.
+        if package.constraints.deadline < 1440.0:
+            return self.priority_modifier
+        return 0.0
+
+    def _build(self, eligible: list[Package]):
+        savings_list = []
+
+        # O(n^2) - uses nested loops to compare each package to every other package to calculate the savings.
+        for i in range(len(eligible)):
+            for j in range(i + 1, len(eligible)):
                 savings = self.calculate_savings(
-                    self.package_list[i].package_id, self.package_list[j].package_id
+                    eligible[i].package_id, eligible[j].package_id
                 )
+                priority = 1 + self._priority(eligible[i]) + self._priority(eligible[j])
 
-                # Priority is a modification to the base Clarke-Wright algorithm to prioritize packages with earlier deadlines.
-                priority = 1
-                if self.package_list[i].constraints.deadline < 1440.0:
-                    priority += priority_modifier
-                if self.package_list[j].constraints.deadline < 1440.0:
-                    priority += priority_modifier
-
-                self.savings_list.append(
+                savings_list.append(
                     (
                         savings * priority,
-                        self.package_list[i].package_id,
-                        self.package_list[j].package_id,
+                        eligible[i].package_id,
+                        eligible[j].package_id,
                     )
                 )
 
-        # The savings list is sorted by the amount of savings in descending order.
-        # This will be used to determine which packages are best to deliver together first.
-        self.savings_list.sort(key=lambda x: x[0], reverse=True)
+        savings_list.sort(key=lambda x: x[0], reverse=True)
+
+        return (
+            [s[0] for s in savings_list],
+            [s[1] for s in savings_list],
+            [s[2] for s in savings_list],
+        )
+
+    def _insert(self, existing: list[Package], added: list[Package]):
+        pairs = []
+        for i, package in enumerate(added):
+            for other in existing + added[i + 1 :]:
+                # pairs are oriented the same way the full build would visit them
+                if self.positions[other.package_id] < self.positions[package.package_id]:
+                    p1, p2 = other, package
+                else:
+                    p1, p2 = package, other
+                savings = self.calculate_savings(p1.package_id, p2.package_id)
+                priority = 1 + self._priority(p1) + self._priority(p2)
+                pairs.append((savings * priority, p1.package_id, p2.package_id))
+
+        pairs.sort(key=self._order_key)
+
+        return (
+            [s[0] for s in pairs],
+            [s[1] for s in pairs],
+            [s[2] for s in pairs],
+        )
+
+    def _build_vectorized(self, eligible: list[Package]):
+        assert np is not None
+
+        package_ids = np.array([p.package_id for p in eligible], dtype=np.int64)
+        address_indices = np.array([p.address_index for p in eligible], dtype=np.int64)
+        priorities = np.array([self._priority(p) for p in eligible], dtype=np.float64)
+
+        matrix = self._distance_matrix()
+        hub = np.asarray(
+            matrix[self.pt.hub_address_index, address_indices], dtype=np.float64
+        )
+        distances = np.asarray(
+            matrix[np.ix_(address_indices, address_indices)], dtype=np.float64
+        )
+
+        # hx + hy - xy for every pair at once, weighted in the same order of operations as the pure Python builder
+        savings = hub[:, None] + hub[None, :] - distances
+        savings *= 1 + priorities[:, None] + priorities[None, :]
+
+        # the upper triangle in row-major order is the order the nested loops visit the pairs,
+        # so a stable sort breaks ties the same way
+        rows, columns = np.triu_indices(len(eligible), k=1)
+        pair_savings = savings[rows, columns]
+        order = np.argsort(-pair_savings, kind="stable")
+
+        return (
+            pair_savings[order],
+            package_ids[rows[order]],
+            package_ids[columns[order]],
+        )
+
+    def _distance_matrix(self):
+        # a zero-copy view of the dense distance matrix, which is float64 when parsed from CSV and float32
+        # when mapped from a snapshot. Gathered distances are widened to float64 so both builders do the
+        # same arithmetic as the pure Python one
+        assert np is not None
+        return np.asarray(self.dt.distances).reshape(
+            self.dt.address_count, self.dt.address_count
+        )
+
+    def _insert_vectorized(self, existing: list[Package], added: list[Package]):
+        assert np is not None
+
+        packages = existing + added
+        package_ids = np.array([p.package_id for p in packages], dtype=np.int64)
+        positions = np.array(
+            [self.positions[p.package_id] for p in packages], dtype=np.int64
+        )
+        address_indices = np.array([p.address_index for p in packages], dtype=np.int64)
+        priorities = np.array([self._priority(p) for p in packages], dtype=np.float64)
+
+        # every pair between an added package and any other package, counting each pair of added packages once
+        rows, columns = np.meshgrid(
+            np.arange(len(packages)),
+            np.arange(len(existing), len(packages)),
+            indexing="ij",
+        )
+        rows, columns = rows.ravel(), columns.ravel()
+        keep = (rows < len(existing)) | (rows < columns)
+        rows, columns = rows[keep], columns[keep]
+
+        # orient each pair the same way the full build would visit it
+        flip = positions[rows] > positions[columns]
+        first = np.where(flip, columns, rows)
+        second = np.where(flip, rows, columns)
+
+        matrix = self._distance_matrix()
+        hub = np.asarray(
+            matrix[self.pt.hub_address_index, address_indices], dtype=np.float64
+        )
+        savings = hub[first] + hub[second] - np.asarray(
+            matrix[address_indices[first], address_indices[second]], dtype=np.float64
+        )
+        savings *= 1 + priorities[first] + priorities[second]
+
+        order = np.lexsort((positions[second], positions[first], -savings))
+
+        return (savings[order], package_ids[first[order]], package_ids[second[order]])
+
+    def _order_key(self, pair: tuple[float, int, int]):
+        return (-pair[0], self.positions[pair[1]], self.positions[pair[2]])
+
+    def _discard_removed(self):
+        # filtering keeps each run sorted, so no sorting is needed
+        runs = []
+        for savings, first, second in self.runs:
+            if isinstance(savings, list):
+                keep = [
+                    i
+                    for i in range(len(savings))
+                    if first[i] in self.members and second[i] in self.members
+                ]
+                runs.append(
+                    (
+                        [savings[i] for i in keep],
+                        [first[i] for i in keep],
+                        [second[i] for i in keep],
+                    )
+                )
+            else:
+                assert np is not None
+                is_member = np.zeros(len(self.pt.address_indices), dtype=bool)
+                is_member[list(self.members)] = True
+                keep = is_member[first] & is_member[second]
+                runs.append((savings[keep], first[keep], second[keep]))
+        self.runs = runs
+        self.removed_count = 0
+
+    def _merge_runs(self):
+        pairs = list(self)
+        if np is not None:
+            self.runs = [
+                (
+                    np.array([s[0] for s in pairs], dtype=np.float64),
+                    np.array([s[1] for s in pairs], dtype=np.int64),
+                    np.array([s[2] for s in pairs], dtype=np.int64),
+                )
+            ]
+        else:
+            self.runs = [
+                (
+                    [s[0] for s in pairs],
+                    [s[1] for s in pairs],
+                    [s[2] for s in pairs],
+                )
+            ]
+        self.removed_count = 0
 
     def calculate_savings(self, p1: int, p2: int) -> float:
         """
@@ -59,10 +448,7 @@ class SavingsList:
         calculates the savings that would be used in the savings report.
         """
 
-        package1 = self.pt.get_package(p1)
-        package2 = self.pt.get_package(p2)
-
-        if package1 == None or package2 == None:
+        if self.pt.get_package(p1) == None or self.pt.get_package(p2) == None:
             raise Exception("Invalid package.")
 
         # Savings is the difference between two separate trips and one round trip:
@@ -70,36 +456,50 @@ class SavingsList:
         # Which can be algebraically simplified to hx + hy - xy
         # Where hx is the distance from the hub to point x, hy is the hub to point y, and xy is the distance from x to y
         savings = (
-            self.dt.get_distance("HUB", package1.formatted_address())
-            + self.dt.get_distance("HUB", package2.formatted_address())
-            - self.dt.get_distance(
-                package1.formatted_address(),
-                package2.formatted_address(),
-            )
+            self.dt.get_package_distance(0, p1)
+            + self.dt.get_package_distance(0, p2)
+            - self.dt.get_package_distance(p1, p2)
         )
 
         return savings
 
     def __str__(self):
-        formatted_savings_list = map(
-            lambda x: f"{x[1]} <-> {x[2]}\t{x[0]:.2f}", self.savings_list
-        )
+        formatted_savings_list = map(lambda x: f"{x[1]} <-> {x[2]}\t{x[0]:.2f}", self)
         return "\n".join(formatted_savings_list)
 
     def __len__(self):
-        return len(self.savings_list)
+        if self.partners != None:
+            return sum(len(partners) for partners in self.partners.values()) // 2
+        return len(self.members) * (len(self.members) - 1) // 2
 
-    def __getitem__(self, index):
-        return self.savings_list[index]
+    def __getitem__(self, index) -> tuple[float, int, int]:
+        if len(self.runs) > 1 or self.removed_count > 0:
+            self._merge_runs()
+        savings, first, second = self.runs[0]
+        return (float(savings[index]), int(first[index]), int(second[index]))
 
-    def __iter__(self):
-        self.index = 0
-        return self
-
-    def __next__(self):
-        if self.index < len(self.savings_list):
-            result = self.savings_list[self.index]
-            self.index += 1
-            return result
+    def __iter__(self) -> Iterator[tuple[float, int, int]]:
+        if len(self.runs) == 1:
+            pairs = self._iterate_run(self.runs[0])
         else:
-            raise StopIteration
+            pairs = heapq.merge(
+                *[self._iterate_run(run) for run in self.runs], key=self._order_key
+            )
+
+        if self.removed_count == 0:
+            yield from pairs
+            return
+
+        members = self.members
+        for pair in pairs:
+            if pair[1] in members and pair[2] in members:
+                yield pair
+
+    def _iterate_run(self, run) -> Iterator[tuple[float, int, int]]:
+        savings, first, second = run
+        for start in range(0, len(savings), ITERATION_CHUNK_SIZE):
+            end = start + ITERATION_CHUNK_SIZE
+            chunk = (savings[start:end], first[start:end], second[start:end])
+            if not isinstance(savings, list):
+                chunk = (chunk[0].tolist(), chunk[1].tolist(), chunk[2].tolist())
+            yield from zip(*chunk)
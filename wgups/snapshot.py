@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import mmap
+import struct
+from array import array
+from typing import Optional
+
+MAGIC = b"WGUPSNAP"
+# version 2 starts the string pool with the empty string, so the package columns can be adopted as they are
+VERSION = 2
+
+# magic, version, section count, address count, package count, HUB address index, content hash
+HEADER = struct.Struct("<8sIIIIi32s")
+# section name, typecode, offset, item count
+SECTION = struct.Struct("<32s1sxxxxxxxQQ")
+
+# sections start on cache line boundaries so the typed views are aligned
+ALIGNMENT = 64
+
+# package columns, all int32, strings are stored as IDs into the string pool
+STRING_COLUMNS = ["street", "city", "zip", "deadline_text", "note", "updated_street", "updated_zip"]
+INT_COLUMNS = [
+    "package_id",
+    "weight",
+    "deadline",
+    "delayed_until",
+    "required_truck",
+    "group_id",
+    "address_index",
+    "updated_address_index",
+]
+
+
+def is_snapshot(file_path: str) -> bool:
+    """
+    Returns True if the file starts with the snapshot magic bytes.
+    """
+    with open(file_path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def compile_snapshot(
+    package_file_path: str,
+    distance_file_path: str,
+    output_path: str,
+    distance_typecode: str = "f",
+) -> str:
+    """
+    Parses the package and distance CSV files and compiles them into a single binary snapshot: a columnar package table with pre-parsed constraints and group ids, and a distance matrix. Returns the output path.
+    The matrix is float32 by default, which halves its size but rounds the distances, so savings that tie or nearly tie in the CSV can be ordered differently. A typecode of "d" keeps float64 distances and reproduces the CSV results exactly.
+    """
+    # imported here since the tables import this module to open snapshots
+    from wgups.distance_table import DistanceTable
+    from wgups.package_table import PackageTable
+
+    pt = PackageTable(package_file_path)
+    dt = DistanceTable(distance_file_path, pt)
+
+    strings: dict[str, int] = {}
+
+    def string_id(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    # the string columns of a package store expect the empty string to be the first in the pool
+    string_id("")
+
+    sections: list[tuple[str, array]] = []
+
+    sections.append(("distances", array(distance_typecode, dt.distances)))
+    sections.append(
+        ("addresses", array("i", [string_id(a) for a in dt.address_index_table]))
+    )
+
+    packages = pt.get_package_list()
+    columns = {name: array("i") for name in STRING_COLUMNS + INT_COLUMNS}
+    paired_offsets = array("q", [0])
+    paired_ids = array("i")
+
+    for package in packages:
+        constraints = package.constraints
+        columns["street"].append(string_id(package.initial_address))
+        columns["city"].append(string_id(package.city))
+        columns["zip"].append(string_id(package.initial_zip_code))
+        columns["deadline_text"].append(string_id(package.deadline))
+        columns["note"].append(string_id(package.note))
+        columns["updated_street"].append(string_id(constraints.updated_address))
+        columns["updated_zip"].append(string_id(constraints.updated_zip_code))
+        columns["package_id"].append(package.package_id)
+        columns["weight"].append(package.weight)
+        columns["deadline"].append(constraints.deadline)
+        columns["delayed_until"].append(constraints.delayed_until)
+        columns["required_truck"].append(constraints.required_truck or 0)
+        columns["group_id"].append(package.group_id)
+        columns["address_index"].append(package.initial_address_index)
+        columns["updated_address_index"].append(constraints.updated_address_index)
+        paired_ids.extend(constraints.paired_packages)
+        paired_offsets.append(len(paired_ids))
+
+    for name in STRING_COLUMNS + INT_COLUMNS:
+        sections.append((f"package.{name}", columns[name]))
+    sections.append(("package.paired_offsets", paired_offsets))
+    sections.append(("package.paired_ids", paired_ids))
+
+    encoded = [s.encode() for s in strings]
+    string_offsets = array("q", [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    sections.append(("strings.offsets", string_offsets))
+    sections.append(("strings.data", array("B", b"".join(encoded))))
+
+    content_hash = hashlib.sha256()
+    for name, values in sections:
+        content_hash.update(name.encode())
+        content_hash.update(values.tobytes())
+
+    with open(output_path, "wb") as file:
+        file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(sections),
+                dt.address_count,
+                len(packages),
+                pt.hub_address_index,
+                content_hash.digest(),
+            )
+        )
+
+        offset = _align(HEADER.size + SECTION.size * len(sections))
+        directory = []
+        for name, values in sections:
+            directory.append(
+                SECTION.pack(name.encode(), values.typecode.encode(), offset, len(values))
+            )
+            offset = _align(offset + values.itemsize * len(values))
+        file.write(b"".join(directory))
+
+        for name, values in sections:
+            file.write(b"\0" * (_align(file.tell()) - file.tell()))
+            values.tofile(file)
+
+    return output_path
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class Snapshot:
+    """
+    A compiled snapshot opened through mmap. Columns are typed memoryviews directly over the mapped file, so opening a snapshot copies nothing and the operating system pages data in as it is read.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._open()
+
+    def _open(self):
+        file_path = self.file_path
+        with open(file_path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            section_count,
+            self.address_count,
+            self.package_count,
+            self.hub_address_index,
+            content_hash,
+        ) = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise Exception(f"Not a snapshot file: {file_path}")
+        if version != VERSION:
+            raise Exception(f"Unsupported snapshot version {version}: {file_path}")
+        self.content_hash = content_hash.hex()
+
+        self.sections: dict[str, memoryview] = {}
+        view = memoryview(self.mmap)
+        for i in range(section_count):
+            name, typecode, offset, count = SECTION.unpack_from(
+                self.mmap, HEADER.size + SECTION.size * i
+            )
+            typecode = typecode.decode()
+            size = struct.calcsize(typecode) * count
+            self.sections[name.rstrip(b"\0").decode()] = view[
+                offset : offset + size
+            ].cast(typecode)
+
+        self._strings: Optional[list[str]] = None
+
+    def __getstate__(self):
+        # memoryviews over the mapping cannot be pickled, so the snapshot is reopened from its path
+        return {"file_path": self.file_path}
+
+    def __setstate__(self, state):
+        self.file_path = state["file_path"]
+        self._open()
+
+    def column(self, name: str) -> memoryview:
+        """
+        Returns a zero-copy typed view of a section of the snapshot.
+        """
+        return self.sections[name]
+
+    def strings(self) -> list[str]:
+        """
+        Returns the string pool, decoded on first use.
+        """
+        if self._strings is None:
+            offsets = self.sections["strings.offsets"]
+            data = self.sections["strings.data"]
+            self._strings = [
+                bytes(data[offsets[i] : offsets[i + 1]]).decode()
+                for i in range(len(offsets) - 1)
+            ]
+        return self._strings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compiles the WGUPS package and distance CSV files into a binary snapshot"
+    )
+    parser.add_argument("package_file")
+    parser.add_argument("distance_file")
+    parser.add_argument("output")
+    parser.add_argument("--double", dest="distance_typecode", action="store_const",
+                        const="d", default="f",
+                        help="store float64 distances, which match the CSV results exactly")
+    args = parser.parse_args()
+
+    compile_snapshot(
+        args.package_file, args.distance_file, args.output, args.distance_typecode
+    )
+
+
+if __name__ == "__main__":
+    main()
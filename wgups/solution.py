@@ -1,11 +1,66 @@
+from typing import Iterable, Optional
 from utilities.time import time_float_to_str
+from wgups.metrics import SolveMetrics
+from utilities.hash_table import HashTable
+from wgups.package import Package
+from wgups.route import Route
+from wgups.tracking_index import TrackingIndex
 from wgups.truck import Truck
 
 
+class PackageLocation:
+    """
+    Where a package is in a solution: the truck and route that deliver it, its stop in the route, and its scheduled delivery time.
+    """
+
+    def __init__(
+        self,
+        package: Package,
+        truck: Truck,
+        route: Route,
+        stop: int,
+        delivery_time: Optional[float],
+    ):
+        self.package = package
+        self.truck = truck
+        self.route = route
+        # position of the package in the route's deliveries, starting at 0
+        self.stop = stop
+        # None when the route has not been simulated
+        self.delivery_time = delivery_time
+
+    def __repr__(self):
+        return f"{{ id: {self.package.package_id}, truck: {self.truck.id}, stop: {self.stop} }}"
+
+
 class Solution:
-    def __init__(self, trucks: list[Truck]):
+    def __init__(
+        self,
+        trucks: list[Truck],
+        pruned: bool = False,
+        metrics: Optional[SolveMetrics] = None,
+    ):
         self.trucks = trucks.copy()
         self.total_distance = sum([t.total_distance_travelled() for t in trucks])
+        # a pruned solution was stopped part way through the day because it could not beat the best solution found so far
+        self.pruned = pruned
+        # counters and phase timings of the solve that produced this solution, when it was profiled
+        self.metrics = metrics
+        # built the first time the tracking of the solution is queried
+        self.tracking_index: Optional[TrackingIndex] = None
+
+        # lookups by package ID and truck ID, so that single package and truck queries do not scan the routes
+        self.truck_index: HashTable[int, Truck] = HashTable.from_items(
+            (t.id, t) for t in self.trucks
+        )
+        self.package_index: HashTable[int, PackageLocation] = HashTable()
+        for t in self.trucks:
+            for r in t.routes:
+                for stop, p in enumerate(r.deliveries):
+                    self.package_index.insert(
+                        p.package_id,
+                        PackageLocation(p, t, r, stop, self._delivery_time(p)),
+                    )
 
     def __repr__(self):
         final_time = max([t.last_route_finish_time() for t in self.trucks])
@@ -29,29 +84,50 @@ class Solution:
         """
         Pretty-prints the information for the provided truck_id.
         """
-        for t in self.trucks:
-            if t.id == truck_id:
-                t.print_truck_info()
-                return True
-        return False
+        t = self.get_truck(truck_id)
+        if t == None:
+            return False
+        t.print_truck_info()
+        return True
 
     def print_package_info(self, package_id: int, time: float = 1440.0):
         """
         Pretty-prints package tracking information given a package_id and optional time.
         """
-        for t in self.trucks:
-            for r in t.routes:
-                for p in r.deliveries:
-                    if p.package_id == package_id:
-                        print(f"==== Package {package_id} ====\n")
-                        print(f"Destination: {p.formatted_address()}")
-                        print(f"Deadline: {time_float_to_str(p.constraints.deadline)}")
-                        print("Tracking info:\n")
-                        for info in p.get_tracking_info(time):
-                            print(info)
-                        print("\n====================\n")
-                        return True
-        return False
+        location = self.find_package(package_id)
+        if location == None:
+            return False
+
+        p = location.package
+        print(f"==== Package {package_id} ====\n")
+        print(f"Destination: {p.formatted_address()}")
+        print(f"Deadline: {time_float_to_str(p.constraints.deadline)}")
+        print("Tracking info:\n")
+        for info in self.get_tracking_index().tracking_info(package_id, time):
+            print(info)
+        print("\n====================\n")
+        return True
+
+    def get_truck(self, truck_id: int) -> Optional[Truck]:
+        """
+        Returns the truck with the provided truck_id, or None if there is no such truck.
+        """
+        return self.truck_index.get(truck_id)
+
+    def find_package(self, package_id: int) -> Optional[PackageLocation]:
+        """
+        Returns the truck, route, stop and scheduled delivery time of the package, or None if no route delivers it.
+        """
+        return self.package_index.get(package_id)
+
+    def find_packages(
+        self, package_ids: Iterable[int]
+    ) -> list[Optional[PackageLocation]]:
+        """
+        Returns the location of every package ID in order, None for the IDs that no route delivers.
+        """
+        get = self.package_index.get
+        return [get(package_id) for package_id in package_ids]
 
     def get_package_list(self):
         """
@@ -62,3 +138,20 @@ class Solution:
             packages.extend(t.packages)
         packages.sort(key=lambda x: x.package_id)
         return packages
+
+    def get_tracking_index(self) -> TrackingIndex:
+        """
+        Returns the tracking index of the packages in this solution, which answers point in time status queries. It is built on the first call.
+        """
+        if self.tracking_index == None:
+            self.tracking_index = TrackingIndex(
+                [p for t in self.trucks for p in t.packages], self.trucks
+            )
+        return self.tracking_index
+
+    def _delivery_time(self, package: Package) -> Optional[float]:
+        # the time of the package's delivery event, added when its route is simulated
+        for time, info in reversed(package.tracking_info):
+            if info.split(" - ", 1)[1].startswith("Delivered"):
+                return time
+        return None
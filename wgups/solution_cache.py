@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from wgups.route import AVERAGE_SPEED, DUE_BACK_BUFFER, MAX_PACKAGES, Route
+from wgups.solution import Solution
+from wgups.solution_factory import SolutionFactory
+from wgups.truck import Truck
+
+# bumped whenever the layout of a cache file changes, so older files are solved again instead of misread
+CACHE_VERSION = 1
+
+CACHE_DIRECTORY = ".wgups_cache"
+
+
+def cache_key(factory: SolutionFactory, modifiers: list[float]) -> str:
+    """
+    Returns the key of the best solution the factory finds for the modifiers: a content hash of both input files and every solver parameter that changes the result.
+    Pruning runs, reusing dispatches and the number of zone workers are left out since they never change the result.
+    """
+    key = hashlib.sha256()
+    for file_path in [factory.package_file_path, factory.distance_file_path]:
+        with open(file_path, "rb") as file:
+            key.update(hashlib.sha256(file.read()).digest())
+
+    parameters = {
+        "version": CACHE_VERSION,
+        # repr round trips floats exactly, so modifiers that differ by float noise get different keys
+        "modifiers": [repr(m) for m in modifiers],
+        "average_speed": AVERAGE_SPEED,
+        "max_packages": MAX_PACKAGES,
+        "due_back_buffer": DUE_BACK_BUFFER,
+        "improve_routes": factory.improve_routes,
+        "improve_solutions": factory.improve_solutions,
+        "truck_count": factory.truck_count,
+        "driver_count": factory.driver_count,
+        "zones": factory.zones,
+        "neighbors": factory.neighbors,
+    }
+    key.update(json.dumps(parameters, sort_keys=True).encode())
+    return key.hexdigest()
+
+
+class SolutionCache:
+    """
+    Best solutions of earlier sweeps, stored as one JSON file per cache key. A file holds the routes and departure times of each truck, the tracking events and final address of every package, and metadata about the sweep that found it.
+    Loading rebuilds the solution on a clone of the factory's package table without simulating anything.
+    """
+
+    def __init__(self, directory: str = CACHE_DIRECTORY):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        """
+        Returns the path of the cache file for the key.
+        """
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(
+        self, factory: SolutionFactory, modifiers: Optional[list[float]] = None
+    ) -> Optional[Solution]:
+        """
+        Returns the cached best solution of the factory for the modifiers, all of them by default, or None if it has not been stored or the file can not be read.
+        """
+        if modifiers is None:
+            modifiers = factory.priority_modifiers()
+        path = self.path(cache_key(factory, modifiers))
+        try:
+            with open(path, encoding="utf-8") as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if record.get("version") != CACHE_VERSION:
+            return None
+
+        pt = factory.package_table.clone()
+        dt = factory.distance_table.with_package_table(pt)
+
+        for package_record in record["packages"]:
+            package = pt.get_package(package_record["id"])
+            if package == None:
+                return None
+            package.status = package_record["status"]
+            package.tracking_info = [(t, info) for t, info in package_record["tracking"]]
+            if package_record["address_updated"]:
+                package.address = package.constraints.updated_address
+                package.zip_code = package.constraints.updated_zip_code
+                package.address_index = package.constraints.updated_address_index
+                pt.address_indices[package.package_id] = package.address_index
+
+        trucks = []
+        for truck_record in record["trucks"]:
+            truck = Truck(truck_record["id"])
+            for route_record in truck_record["routes"]:
+                route = Route(route_record["departure_time"], truck.id, dt, pt)
+                route.due_back_time = route_record["due_back_time"]
+                for package_id in route_record["deliveries"]:
+                    package = pt.get_package(package_id)
+                    assert package is not None
+                    route.deliveries.append(package)
+                    route.packages.add(package_id)
+                # the tracking events the simulation added were restored with the packages
+                route.has_simulated = True
+                truck.routes.append(route)
+                truck.packages.extend(route.deliveries)
+                truck.next_available_time = route.route_finish_time()
+            trucks.append(truck)
+
+        return Solution(trucks)
+
+    def store(
+        self,
+        factory: SolutionFactory,
+        solution: Solution,
+        modifiers: Optional[list[float]] = None,
+        solve_seconds: float = 0.0,
+    ) -> str:
+        """
+        Writes the best solution of the factory for the modifiers, all of them by default, to the cache and returns the path of its file.
+        """
+        if modifiers is None:
+            modifiers = factory.priority_modifiers()
+
+        record = {
+            "version": CACHE_VERSION,
+            "sweep": {
+                "first_modifier": modifiers[0] if modifiers else None,
+                "last_modifier": modifiers[-1] if modifiers else None,
+                "modifier_count": len(modifiers),
+                "solve_seconds": solve_seconds,
+                "solved_at": time.time(),
+                "total_distance": solution.total_distance,
+            },
+            "trucks": [
+                {
+                    "id": truck.id,
+                    "routes": [
+                        {
+                            "departure_time": route.departure_time,
+                            "due_back_time": route.due_back_time,
+                            "deliveries": [p.package_id for p in route.deliveries],
+                        }
+                        for route in truck.routes
+                    ],
+                }
+                for truck in solution.trucks
+            ],
+            "packages": [
+                {
+                    "id": p.package_id,
+                    "status": p.status,
+                    "address_updated": p.address != p.initial_address
+                    or p.zip_code != p.initial_zip_code,
+                    "tracking": [[t, info] for t, info in p.tracking_info],
+                }
+                for p in solution.get_package_list()
+            ],
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(cache_key(factory, modifiers))
+        # written next to the cache file and renamed over it, so a terminal starting up never reads half a file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(record, file)
+        os.replace(temporary_path, path)
+        return path
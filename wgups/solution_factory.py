@@ -1,31 +1,220 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
-from utilities.time import time_float_to_str
+from wgups.dispatch_tree import DispatchNode, DispatchTree, selection_key
+from wgups.dispatcher import Dispatcher
 from wgups.distance_table import DistanceTable
+from wgups.metrics import SolveMetrics
+from wgups.package_store import DELIVERED, EMPTY_STRING
 from wgups.package_table import PackageTable
 from wgups.route import Route
 from wgups.route_factory import RouteFactory
 from wgups.savings_list import SavingsList
 from wgups.solution import Solution
+from wgups.solution_improver import SolutionImprover
+from wgups.trace import (
+    DayEnded,
+    NullSink,
+    RouteSelected,
+    RunPruned,
+    SavingsListUpdated,
+    TraceSink,
+    TruckAvailable,
+    TruckWaiting,
+)
 from wgups.truck import Truck
+from wgups.zones import ZoneRouter
+
+PRIORITY_MODIFIER_MAX = 2.0
+PRIORITY_MODIFIER_STEP = 0.01
+
+# the fleet of the WGUPS instance, three trucks and two drivers
+TRUCK_COUNT = 3
+DRIVER_COUNT = 2
+
+PACKAGE_FILE_PATH = "resources/WGUPS Package File.csv"
+DISTANCE_FILE_PATH = "resources/WGUPS Distance Table.csv"
+
+# Each worker is handed several contiguous chunks of the sweep so that slow and fast modifiers even out across the pool
+CHUNKS_PER_WORKER = 4
+
+# runs are pruned only when they exceed the bound by more than float noise in the summed distances
+PRUNE_TOLERANCE = 1e-9
+
+# The factory used by the sweep in a pool worker process, set once per process by _init_worker
+_worker_factory: Optional["SolutionFactory"] = None
+
+
+def _init_worker(factory: "SolutionFactory"):
+    global _worker_factory
+    _worker_factory = factory
+
+
+def _generate_best_solution_from(
+    modifiers: list[float],
+) -> tuple[Optional["Solution"], Optional["SolveMetrics"]]:
+    assert _worker_factory is not None
+    solution = _worker_factory.generate_best_solution_from(modifiers)
+    return solution, _worker_factory.sweep_metrics
 
 
 class SolutionFactory:
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        package_file_path: str = PACKAGE_FILE_PATH,
+        distance_file_path: str = DISTANCE_FILE_PATH,
+        improve_routes: bool = True,
+        improve_solutions: bool = True,
+        prune_runs: bool = True,
+        reuse_dispatches: bool = True,
+        trace: Optional[TraceSink] = None,
+        profile: bool = False,
+        truck_count: int = TRUCK_COUNT,
+        driver_count: int = DRIVER_COUNT,
+        zones: int = 1,
+        zone_workers: int = 1,
+        neighbors: int = 0,
+    ):
+        # where loading and solving events are sent, nothing is traced by default
+        self.trace = trace if trace != None else NullSink()
+        # whether each solve counts its work and times its phases, see SolveMetrics
+        self.profile = profile
+        # the metrics summed over the solves of the last sweep, when profiled
+        self.sweep_metrics: Optional[SolveMetrics] = None
+        loading = time.perf_counter()
+
+        self.package_file_path = package_file_path
+        self.distance_file_path = distance_file_path
+        # The input files are parsed once, every solve works on a cheap clone of these tables
+        self.package_table = PackageTable(package_file_path, self.trace)
+        self.distance_table = DistanceTable(distance_file_path, self.package_table)
+        # whether each selected route is shortened with 2-opt and Or-opt moves before it is driven
+        self.improve_routes = improve_routes
+        # whether each finished solution is improved by moving packages between its routes
+        self.improve_solutions = improve_solutions
+        # whether sweep runs stop early once they can not beat the best solution so far. Solutions that are improved
+        # after they are built can end up shorter than the routes they committed, so runs are only pruned without improvement
+        self.prune_runs = prune_runs
+        # the trucks are numbered from 1 to truck_count, and only as many of them as there are drivers are driven
+        self.truck_count = truck_count
+        self.driver_count = driver_count
+        # with more than one zone, each dispatch partitions the packages at the hub into zones and builds the
+        # candidate routes of each zone separately, in a pool of zone_workers processes when there is more than one
+        self.zones = zones
+        self.zone_workers = zone_workers
+        # with neighbors above 0 the savings lists are sparse, pairing each package with only its nearest neighbors
+        self.neighbors = neighbors
+        # whether sweep runs replay the dispatches an earlier modifier is known to decide the same way, instead of building routes
+        self.reuse_dispatches = reuse_dispatches
+
+        # every package left undelivered adds at least the distance to its nearest possible neighbor to the day
+        packages = self.package_table.get_package_list()
+        addresses = [self.package_table.hub_address_index]
+        addresses += [p.initial_address_index for p in packages]
+        addresses += [
+            p.constraints.updated_address_index
+            for p in packages
+            if p.constraints.updated_address != ""
+        ]
+        self.nearest_distances = self.distance_table.get_nearest_distances(addresses)
+        # rows of the packages whose address is updated when they arrive, the only packages whose share of the bound
+        # changes before they are delivered
+        self.readdressed_rows = [
+            p.row for p in packages if p.constraints.updated_address != ""
+        ]
+        self.load_seconds = time.perf_counter() - loading
+
+    def priority_modifiers(self) -> list[float]:
+        """
+        Returns the priority_modifier values tried by the sweep, in the order they are tried.
+        """
+        modifiers = []
+
+        # accumulated the same way the sweep always has, so every process sees the exact same float values
+        priority_modifier = 0.00
+        while priority_modifier <= PRIORITY_MODIFIER_MAX:
+            modifiers.append(priority_modifier)
+            priority_modifier += PRIORITY_MODIFIER_STEP
+
+        return modifiers
 
-    def generate_best_solution(self):
+    def generate_best_solution(
+        self, workers: int = 1, modifiers: Optional[list[float]] = None
+    ) -> Optional[Solution]:
         """
         Tries multiple different values for the priority_modifier variable used when generate savings lists for the Clarke Wright algorithm. Returns the best solve.
+        With more than one worker, the modifiers are split into contiguous chunks and solved in a process pool. Ties are broken in favor of the earliest modifier either way, so the result matches the serial sweep.
+        """
+        if modifiers is None:
+            modifiers = self.priority_modifiers()
+
+        if workers <= 1 or len(modifiers) <= 1:
+            best_solution = self.generate_best_solution_from(modifiers)
+            if self.sweep_metrics != None:
+                self.sweep_metrics.add_time("load", self.load_seconds)
+            return best_solution
+
+        chunk_count = min(len(modifiers), workers * CHUNKS_PER_WORKER)
+        chunk_size = -(-len(modifiers) // chunk_count)
+        chunks = [
+            modifiers[i : i + chunk_size] for i in range(0, len(modifiers), chunk_size)
+        ]
+
+        # the parsed tables are handed to each worker once, rather than once per chunk
+        # map yields the chunk results in submission order, which keeps the tie breaking deterministic
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            results = list(executor.map(_generate_best_solution_from, chunks))
+
+        if self.profile:
+            self.sweep_metrics = SolveMetrics()
+            self.sweep_metrics.add_time("load", self.load_seconds)
+            for _, metrics in results:
+                self.sweep_metrics.merge(metrics)
+        return self.select_best_solution(solution for solution, _ in results)
+
+    def generate_best_solution_from(
+        self, modifiers: list[float]
+    ) -> Optional[Solution]:
+        """
+        Generates a solution for each of the provided priority_modifier values in order and returns the best one.
+        When runs are pruned, each run is bounded by the best solution found before it.
+        When dispatches are reused, the runs share a DispatchTree and replay every dispatch an earlier modifier is known to decide the same way. The result is the same as simulating every dispatch. Dispatches are not reused when routing by zone, since the tree records the pairs of a single savings list.
         """
         best_solution = None
+        prune = self.prune_runs and not self.improve_solutions
+        tree = None
+        if self.reuse_dispatches and self.zones <= 1:
+            tree = DispatchTree(self.package_table)
+        self.sweep_metrics = SolveMetrics() if self.profile else None
 
-        priority_modifier = 0.00
-        while priority_modifier <= 2.0:
-            solution = self.generate_solution(priority_modifier)
-            priority_modifier += 0.01
+        # the zone workers are kept for the whole sweep
+        with ZoneRouter(self, self.zone_workers) as zone_router:
+            for priority_modifier in modifiers:
+                bound = float("inf")
+                if prune and best_solution != None:
+                    bound = best_solution.total_distance
+
+                metrics = SolveMetrics() if self.profile else None
+                solution = self.generate_solution(
+                    priority_modifier, bound, tree, metrics, zone_router
+                )
+                if self.sweep_metrics != None:
+                    self.sweep_metrics.merge(metrics)
+                best_solution = self.select_best_solution([best_solution, solution])
 
-            if solution == None:
+        return best_solution
+
+    def select_best_solution(self, solutions) -> Optional[Solution]:
+        """
+        Returns the solution with the lowest total distance, ignoring pruned solutions. The first solution wins any tie.
+        """
+        best_solution = None
+
+        for solution in solutions:
+            if solution == None or solution.pruned:
                 continue
 
             if best_solution == None:
@@ -35,70 +224,297 @@ class SolutionFactory:
 
         return best_solution
 
-    def generate_solution(self, priority_modifier) -> Optional[Solution]:
+    def remaining_lower_bound(self, pt: PackageTable) -> float:
+        """
+        Returns a lower bound on the distance still to be driven to deliver the undelivered packages. Each route edge is shared by at most two stops, so every stop adds at least half its two edges, which are each at least its nearest neighbor distance.
+        """
+        nearest_distances = self.nearest_distances
+        store = pt.store
+        bound = sum(
+            nearest_distances.get(address_index, 0.0)
+            for address_index, status in zip(store.address_indices, store.statuses)
+            if status != DELIVERED
+        )
+        # the few packages whose address is updated are counted again by the address they may be delivered to
+        for row in self.readdressed_rows:
+            if store.statuses[row] != DELIVERED:
+                bound += self.package_lower_bound(pt, row) - nearest_distances.get(
+                    store.address_indices[row], 0.0
+                )
+        return bound
+
+    def package_lower_bound(self, pt: PackageTable, row: int) -> float:
+        """
+        Returns the share of the lower bound of the undelivered package in the row, the nearest neighbor distance of its address.
+        A package whose address is yet to be updated is delivered to one of its two addresses, so it is charged the smaller of their distances.
+        """
+        nearest_distances = self.nearest_distances
+        store = pt.store
+        share = nearest_distances.get(store.address_indices[row], 0.0)
+        updated_index = store.updated_address_indices[row]
+        if (
+            store.updated_streets[row] != EMPTY_STRING
+            and updated_index != store.address_indices[row]
+        ):
+            share = min(share, nearest_distances.get(updated_index, 0.0))
+        return share
+
+    def delivered_lower_bound(
+        self, pt: PackageTable, route: Route, readdressed: dict[int, float]
+    ) -> float:
+        """
+        Returns how much the remaining lower bound fell with the route dispatched: the share of the packages it delivered, and the change in share of the packages whose address is updated. readdressed holds the share of each of those last counted in the bound, and is brought up to date.
+        This costs O(route length) instead of the O(n) of remaining_lower_bound.
+        """
+        nearest_distances = self.nearest_distances
+        fallen = 0.0
+        for package in route.deliveries:
+            if package.row not in readdressed:
+                fallen += nearest_distances.get(package.address_index, 0.0)
+
+        store = pt.store
+        for row, counted in readdressed.items():
+            share = 0.0
+            if store.statuses[row] != DELIVERED:
+                share = self.package_lower_bound(pt, row)
+            fallen += counted - share
+            readdressed[row] = share
+        return fallen
+
+    def generate_solution(
+        self,
+        priority_modifier,
+        bound: float = float("inf"),
+        tree: Optional[DispatchTree] = None,
+        metrics: Optional[SolveMetrics] = None,
+        zone_router: Optional[ZoneRouter] = None,
+    ) -> Optional[Solution]:
         """
         Generates a solution based on the provided priority_modifier variable (which affects the weight of priority packages in the savings list generation)
+        The run stops early once the distance of the routes dispatched so far, plus a lower bound for the packages still to be delivered, exceeds the bound. The partial solution is then returned marked as pruned.
+        If a tree is provided, dispatches it already holds a matching decision for are replayed from it, and the others are recorded to it.
+        When the factory profiles, the counters and timings of the solve are collected in the provided metrics, or new ones, and attached to the solution.
+        When the factory has more than one zone, the candidate routes are built zone by zone with the provided zone router, or one that routes the zones in this process. The tree is then ignored.
         """
-        pt = PackageTable("resources/WGUPS Package File.csv")
-        dt = DistanceTable("resources/WGUPS Distance Table.csv", pt)
+        pt = self.package_table.clone()
+        dt = self.distance_table.with_package_table(pt)
+        trace = self.trace
+
+        if metrics == None and self.profile:
+            metrics = SolveMetrics()
+        # start of the phase being timed
+        start = 0.0
+        if metrics != None:
+            metrics.count("solves")
+            pt.metrics = metrics
+            dt.count_lookups(metrics)
 
-        truck1 = Truck(1)
-        truck2 = Truck(2)
-        truck3 = Truck(3)
+        trucks = [Truck(truck_id) for truck_id in range(1, self.truck_count + 1)]
 
-        # Only two drivers are available, so truck 3 is never used
-        trucks_at_hub = [truck1, truck2]
+        # With fewer drivers than trucks the highest numbered trucks are never used
+        dispatcher = Dispatcher(
+            trucks,
+            self.driver_count,
+            [
+                p.constraints.delayed_until
+                for p in pt.get_package_list()
+                if p.status == "delayed"
+            ],
+        )
 
         route_factory = RouteFactory(pt, dt)
+        committed_distance = 0.0
+
+        # the lower bound of the packages still to be delivered is only needed to prune, and is brought up to date
+        # with each route dispatched rather than summed again
+        pruning = bound < float("inf")
+        remaining_bound = 0.0
+        readdressed: dict[int, float] = {}
+        if pruning:
+            remaining_bound = self.remaining_lower_bound(pt)
+            readdressed = {
+                row: self.package_lower_bound(pt, row) for row in self.readdressed_rows
+            }
+
+        # the savings list is kept for the whole solve and updated as packages are delivered or arrive at the hub,
+        # unless the routes are built by zone from a savings list per zone and dispatch
+        savings_list: Optional[SavingsList] = None
+        if self.zones > 1:
+            tree = None
+            if zone_router == None:
+                zone_router = ZoneRouter(self)
+        else:
+            zone_router = None
+            if metrics != None:
+                start = time.perf_counter()
+            savings_list = SavingsList(
+                pt, dt, priority_modifier, neighbors=self.neighbors
+            )
+            if metrics != None:
+                metrics.add_time("savings", time.perf_counter() - start)
+
+        # the node of the tree for the dispatches made so far, None once the run leaves what the tree can hold
+        node: Optional[DispatchNode] = None if tree == None else tree.root
 
         # while there are packages remaining to be delivered
         while pt.packages_remaining() > 0:
 
-            # for the next available truck at the hub
-            trucks_at_hub.sort(key=lambda x: x.next_available_time)
-            current_truck = trucks_at_hub[0]
+            # for the next available truck at the hub, the packages that have arrived by then are at the hub
+            current_truck = dispatcher.next_truck(pt)
+            if current_truck == None:
+                if trace.enabled:
+                    trace.emit(DayEnded(priority_modifier))
+                break
 
-            # update package statuses
-            pt.update_statuses(current_truck.next_available_time)
+            if trace.enabled:
+                trace.emit(
+                    TruckAvailable(
+                        priority_modifier,
+                        current_truck.id,
+                        current_truck.next_available_time,
+                    )
+                )
 
-            print(
-                f"Truck {current_truck.id} is next available at HUB for loading at {time_float_to_str(current_truck.next_available_time)}"
-            )
+            # bring the savings list up to date with the packages currently at the hub
+            if metrics != None:
+                metrics.count("dispatches")
+            if savings_list != None:
+                if metrics != None:
+                    start = time.perf_counter()
+                savings_list.update()
+                if metrics != None:
+                    metrics.add_time("savings", time.perf_counter() - start)
 
-            # generate a new savings list with the packages currently at the hub
-            savings_list = SavingsList(pt, dt, priority_modifier)
+                if trace.enabled:
+                    trace.emit(SavingsListUpdated(priority_modifier, len(savings_list)))
 
-            print(
-                f"Generated a savings list containing {len(savings_list)} possible routings"
-            )
+            branch = None if node == None else node.find_branch(priority_modifier)
+            if branch != None:
+                # an earlier run is known to make this dispatch decision from this same state
+                route = branch.replay(current_truck, pt, dt)
+            else:
+                # generate a list of candidate routes using the Clarke-Wright savings algorithm
+                # the savings pairs it visits are recorded so that later runs can tell if they make the same decision,
+                # from the second run to reach this state on, since most states are only reached once
+                recording = False
+                if tree != None and node != None:
+                    node.visits += 1
+                    recording = node.visits > 1 and not tree.is_full()
+                pairs: list[tuple[float, int, int]] = []
+                changes: list[Optional[tuple[int, ...]]] = []
+                if zone_router != None:
+                    candidate_routes = zone_router.compute_routes(
+                        pt, dt, current_truck, priority_modifier
+                    )
+                elif recording:
+                    assert tree is not None
+                    candidate_routes = route_factory.compute_routes(
+                        tree.record(savings_list, pairs), current_truck, changes
+                    )
+                else:
+                    assert savings_list is not None
+                    candidate_routes = route_factory.compute_routes(
+                        savings_list, current_truck
+                    )
+
+                # no pair of packages can be routed, so rather than wait while a package's deadline passes, or leave packages
+                # at the hub for the rest of the day once none are inbound, each is tried on a route of its own
+                if len(candidate_routes) == 0:
+                    candidate_routes = route_factory.compute_lone_routes(
+                        current_truck, pt.next_package_arrival()
+                    )
+
+                # select the best route
+                candidate_routes.sort(key=lambda x: x.efficiency(), reverse=True)
+                selected = candidate_routes[0] if len(candidate_routes) > 0 else None
+                if selected != None:
+                    route_factory.add_urgent_packages(
+                        selected,
+                        min(selected.route_finish_time(), dispatcher.next_ready_time()),
+                    )
 
-            # generate a list of candidate routes using the Clarke-Wright savings algorithm
-            candidate_routes = route_factory.compute_routes(savings_list, current_truck)
+                # an earlier run made the same decision if it selected the same route
+                branch = None if node == None else node.branch_for(selected)
+                if branch != None:
+                    route = branch.replay(current_truck, pt, dt)
+                else:
+                    route = selected
+                    # shorten the selected route before it is driven, bringing the truck back to the hub sooner
+                    if route != None and self.improve_routes:
+                        if metrics != None:
+                            start = time.perf_counter()
+                        route.improve()
+                        if metrics != None:
+                            metrics.add_time(
+                                "improve_routes", time.perf_counter() - start
+                            )
+                    if tree != None and node != None:
+                        branch = tree.add_branch(node, selection_key(selected), route)
+
+                if recording and branch != None:
+                    assert tree is not None
+                    tree.add_order(branch, pairs, changes, dt)
+
+            node = None if branch == None else branch.child
 
             # if no candidate routes are available, the truck will wait until the next package arrives
             # the due_back_time is a good interval because it represents the next time the number of available packages may change
-            if len(candidate_routes) == 0:
-                print("No candidate routes to consider at this time, truck will wait")
-                current_truck.next_available_time = pt.next_package_arrival()
-                # in the case where the due_back_time is the end of the day, there will be no more packages inbound, we can stop
-                if current_truck.next_available_time >= 1440:
-                    print("End of day reached, stopping simulation")
-                    break
+            if route == None:
+                next_arrival = pt.next_package_arrival()
+                if trace.enabled:
+                    trace.emit(
+                        TruckWaiting(priority_modifier, current_truck.id, next_arrival)
+                    )
+                # in the case where the due_back_time is the end of the day, there will be no more packages inbound, so this
+                # truck is done for the day. The other trucks may still deliver what is left, such as packages restricted to them
+                if next_arrival >= 1440:
+                    continue
+                dispatcher.wait(current_truck, next_arrival)
                 continue
 
-            # select the best route 
-            candidate_routes.sort(
-                key=lambda x: x.efficiency(), reverse=True
-            )
-
             # simulate the route (update package tracking info) and update the truck next available time
-            print(
-                f"Truck {current_truck.id} will depart at {time_float_to_str(current_truck.next_available_time)} with {len(candidate_routes[0].deliveries)} packages and an estimated return time of {time_float_to_str(candidate_routes[0].route_finish_time())}"
-            )
-            current_truck.add_route(candidate_routes[0])
+            if trace.enabled:
+                trace.emit(
+                    RouteSelected(
+                        priority_modifier,
+                        current_truck.id,
+                        current_truck.next_available_time,
+                        route.route_finish_time(),
+                        route.route_distance(),
+                        [p.package_id for p in route.deliveries],
+                    )
+                )
+            if metrics != None:
+                start = time.perf_counter()
+            current_truck.add_route(route)
+            dispatcher.dispatched(current_truck)
+            if metrics != None:
+                metrics.add_time("simulation", time.perf_counter() - start)
+
+            # a run whose distance can only exceed the bound can not become the best solution
+            committed_distance += route.route_distance()
+            if pruning:
+                remaining_bound -= self.delivered_lower_bound(pt, route, readdressed)
+                if committed_distance + remaining_bound > bound + PRUNE_TOLERANCE:
+                    if trace.enabled:
+                        trace.emit(RunPruned(priority_modifier, bound))
+                    return Solution(trucks, pruned=True, metrics=metrics)
 
         if pt.packages_remaining() > 0:
             return None
 
-        solution = Solution([truck1, truck2, truck3])
+        # every dispatch decision was one an earlier run made too, so the run ends with the solution it found
+        if node != None and node.solution != None:
+            return node.solution
+
+        solution = Solution(trucks, metrics=metrics)
+        if self.improve_solutions:
+            if metrics != None:
+                start = time.perf_counter()
+            solution = SolutionImprover().improve(solution)
+            if metrics != None:
+                metrics.add_time("improve_solution", time.perf_counter() - start)
+            solution.metrics = metrics
+        if node != None:
+            node.solution = solution
         return solution
@@ -0,0 +1,274 @@
+import copy
+import heapq
+
+from wgups.route import AVERAGE_SPEED, IMPROVEMENT_EPSILON, MAX_PACKAGES
+from wgups.solution import Solution
+
+try:
+    import numpy as np
+except ImportError:  # the neighbor lists fall back to a heap selection per package
+    np = None
+
+# number of nearest packages each package may be moved next to or exchanged with
+NEIGHBOR_COUNT = 8
+# the longest run of consecutive deliveries swapped between two routes by a cross-exchange
+CROSS_EXCHANGE_MAX_SEGMENT = 2
+# passes over every package, the search usually settles after two or three
+MAX_PASSES = 20
+
+
+class SolutionImprover:
+    """
+    Improves a finished solution by moving packages between its routes, on the same or different trucks. A package is relocated next to one of its nearest neighbors, swapped with a neighbor, or cross-exchanged, where runs of up to two deliveries starting at the package and at the neighbor trade places.
+    Every route keeps its departure time, so a changed route has to meet its deadlines and be back at the hub before its due back time and before its truck's next route departs. Packages that must be delivered with others are left in place.
+    """
+
+    def __init__(self, neighbor_count: int = NEIGHBOR_COUNT):
+        self.neighbor_count = neighbor_count
+
+    def improve(self, solution: Solution) -> Solution:
+        """
+        Returns a new solution with a lower total distance, or the provided solution if no improving move was found. The provided solution is not modified.
+        """
+        routes = [route for truck in solution.trucks for route in truck.routes]
+        if len(routes) < 2:
+            return solution
+
+        self.dt = routes[0].distance_table
+        self.pt = routes[0].package_table
+        self.routes = routes
+        self.store = self.pt.store
+        self.plans = [[p.package_id for p in route.deliveries] for route in routes]
+        self.limits = self._finish_limits(solution)
+        self.owners = {pid: i for i, plan in enumerate(self.plans) for pid in plan}
+        self.changed: set[int] = set()
+
+        movable = [
+            pid
+            for plan in self.plans
+            for pid in plan
+            if self.pt.get_group_size(self.store.group_ids[self._row(pid)]) <= 1
+        ]
+        self.movable = set(movable)
+        neighbors = self._neighbors(movable)
+
+        passes = 0
+        improved = True
+        while improved and passes < MAX_PASSES:
+            improved = False
+            passes += 1
+            for pid in movable:
+                for neighbor in neighbors[pid]:
+                    if self.owners[neighbor] == self.owners[pid]:
+                        continue
+                    if self._relocate(pid, neighbor) or self._exchange(pid, neighbor):
+                        improved = True
+                        break
+
+        if len(self.changed) == 0:
+            return solution
+        return self._rebuild(solution)
+
+    def _row(self, package_id: int) -> int:
+        # The moves check packages by the columns of their rows, so no package view is built per check
+        row = self.pt.rows.get(package_id)
+        if row == None:
+            raise Exception("An invalid package ID was provided.")
+        return row
+
+    def _finish_limits(self, solution: Solution) -> list[float]:
+        # The latest time each route may finish, its due back time or the departure of the truck's next route
+        limits = []
+        for truck in solution.trucks:
+            for i, route in enumerate(truck.routes):
+                limit = route.due_back_time
+                if i + 1 < len(truck.routes):
+                    limit = min(limit, truck.routes[i + 1].departure_time)
+                limits.append(limit)
+        return limits
+
+    def _neighbors(self, package_ids: list[int]) -> dict[int, list[int]]:
+        # The nearest packages to each movable package, among every package in the solution
+        all_ids = [pid for plan in self.plans for pid in plan]
+        count = min(self.neighbor_count, len(all_ids) - 1)
+        neighbors: dict[int, list[int]] = {}
+
+        if np is not None:
+            matrix = np.asarray(self.dt.distances).reshape(
+                self.dt.address_count, self.dt.address_count
+            )
+            address_indices = np.array(
+                [self.pt.address_indices[pid] for pid in all_ids], dtype=np.int64
+            )
+            positions = {pid: i for i, pid in enumerate(all_ids)}
+            for pid in package_ids:
+                row = np.array(matrix[address_indices[positions[pid]], address_indices])
+                row[positions[pid]] = np.inf
+                nearest = np.argpartition(row, count - 1)[:count] if count > 0 else []
+                nearest = sorted(nearest, key=lambda i: (row[i], i))
+                neighbors[pid] = [all_ids[i] for i in nearest]
+            return neighbors
+
+        for pid in package_ids:
+            neighbors[pid] = heapq.nsmallest(
+                count,
+                (other for other in all_ids if other != pid),
+                key=lambda other: self.dt.get_package_distance(pid, other),
+            )
+        return neighbors
+
+    def _can_join(self, package_ids: list[int], route_index: int) -> bool:
+        # Whether the packages may be moved into the route, given their truck and when they reach the hub
+        route = self.routes[route_index]
+        store = self.store
+        for pid in package_ids:
+            if pid not in self.movable:
+                return False
+            row = self._row(pid)
+            required_truck = store.required_trucks[row]
+            if required_truck and required_truck != route.truck_id:
+                return False
+            if store.delayed_until[row] > route.departure_time:
+                return False
+        return True
+
+    def _is_feasible(self, plan: list[int], route_index: int) -> bool:
+        # The checks of verify_deliveries for a proposed route, with the route's finish limit as its due back time
+        if len(plan) > MAX_PACKAGES:
+            return False
+
+        deadlines = self.store.deadlines
+        time = self.routes[route_index].departure_time
+        current = 0
+        for pid in plan:
+            time += self.dt.get_package_distance(current, pid) / AVERAGE_SPEED * 60
+            if time > deadlines[self._row(pid)]:
+                return False
+            current = pid
+        time += self.dt.get_package_distance(current, 0) / AVERAGE_SPEED * 60
+        return time <= self.limits[route_index]
+
+    def _apply(self, route_index: int, plan: list[int]):
+        self.plans[route_index] = plan
+        for pid in plan:
+            self.owners[pid] = route_index
+        self.changed.add(route_index)
+
+    def _relocate(self, package_id: int, neighbor: int) -> bool:
+        # Moves the package next to its neighbor in the neighbor's route, before or after it
+        source, target = self.owners[package_id], self.owners[neighbor]
+        source_plan, target_plan = self.plans[source], self.plans[target]
+        if len(target_plan) >= MAX_PACKAGES or not self._can_join([package_id], target):
+            return False
+
+        distance = self.dt.get_package_distance
+        i = source_plan.index(package_id)
+        before = source_plan[i - 1] if i > 0 else 0
+        after = source_plan[i + 1] if i + 1 < len(source_plan) else 0
+        removed = (
+            distance(before, package_id)
+            + distance(package_id, after)
+            - distance(before, after)
+        )
+
+        j = target_plan.index(neighbor)
+        for k in (j, j + 1):
+            u = target_plan[k - 1] if k > 0 else 0
+            v = target_plan[k] if k < len(target_plan) else 0
+            delta = (
+                distance(u, package_id) + distance(package_id, v) - distance(u, v) - removed
+            )
+            if delta >= -IMPROVEMENT_EPSILON:
+                continue
+
+            new_source = source_plan[:i] + source_plan[i + 1 :]
+            new_target = target_plan[:k] + [package_id] + target_plan[k:]
+            if self._is_feasible(new_source, source) and self._is_feasible(
+                new_target, target
+            ):
+                self._apply(source, new_source)
+                self._apply(target, new_target)
+                return True
+        return False
+
+    def _exchange(self, package_id: int, neighbor: int) -> bool:
+        # Swaps a run of deliveries starting at the package with a run starting at its neighbor
+        route_a, route_b = self.owners[package_id], self.owners[neighbor]
+        plan_a, plan_b = self.plans[route_a], self.plans[route_b]
+        i, j = plan_a.index(package_id), plan_b.index(neighbor)
+        distance = self.dt.get_package_distance
+
+        for length_a in range(1, CROSS_EXCHANGE_MAX_SEGMENT + 1):
+            segment_a = plan_a[i : i + length_a]
+            if len(segment_a) < length_a or not self._can_join(segment_a, route_b):
+                break
+            for length_b in range(1, CROSS_EXCHANGE_MAX_SEGMENT + 1):
+                segment_b = plan_b[j : j + length_b]
+                if len(segment_b) < length_b or not self._can_join(segment_b, route_a):
+                    break
+                if (
+                    len(plan_a) - length_a + length_b > MAX_PACKAGES
+                    or len(plan_b) - length_b + length_a > MAX_PACKAGES
+                ):
+                    continue
+
+                # only the edges around each run change, the runs keep their inner order
+                before_a = plan_a[i - 1] if i > 0 else 0
+                after_a = plan_a[i + length_a] if i + length_a < len(plan_a) else 0
+                before_b = plan_b[j - 1] if j > 0 else 0
+                after_b = plan_b[j + length_b] if j + length_b < len(plan_b) else 0
+                delta = (
+                    distance(before_a, segment_b[0])
+                    + distance(segment_b[-1], after_a)
+                    - distance(before_a, segment_a[0])
+                    - distance(segment_a[-1], after_a)
+                    + distance(before_b, segment_a[0])
+                    + distance(segment_a[-1], after_b)
+                    - distance(before_b, segment_b[0])
+                    - distance(segment_b[-1], after_b)
+                )
+                if delta >= -IMPROVEMENT_EPSILON:
+                    continue
+
+                new_a = plan_a[:i] + segment_b + plan_a[i + length_a :]
+                new_b = plan_b[:j] + segment_a + plan_b[j + length_b :]
+                if self._is_feasible(new_a, route_a) and self._is_feasible(
+                    new_b, route_b
+                ):
+                    self._apply(route_a, new_a)
+                    self._apply(route_b, new_b)
+                    return True
+        return False
+
+    def _rebuild(self, solution: Solution) -> Solution:
+        # Copies the solution and simulates the changed routes again with their new deliveries
+        # the distance table is shared rather than copied, it is only read, and so are the metrics of a profiled solve
+        shared = {id(self.dt): self.dt}
+        if self.pt.metrics != None:
+            shared[id(self.pt.metrics)] = self.pt.metrics
+        improved: Solution = copy.deepcopy(solution, shared)
+        routes = [route for truck in improved.trucks for route in truck.routes]
+        pt = routes[0].package_table
+
+        for i in sorted(self.changed):
+            routes[i].unsimulate()
+
+        for i in sorted(self.changed):
+            route = routes[i]
+            route.deliveries = []
+            for pid in self.plans[i]:
+                package = pt.get_package(pid)
+                assert package is not None
+                route.deliveries.append(package)
+            route.packages = set(self.plans[i])
+            route._refresh()
+            route.improve()
+            route.simulate()
+
+        for truck in improved.trucks:
+            truck.routes = [route for route in truck.routes if len(route.deliveries) > 0]
+            truck.packages = [p for route in truck.routes for p in route.deliveries]
+            if truck.routes:
+                truck.next_available_time = truck.routes[-1].route_finish_time()
+
+        return Solution(improved.trucks)
@@ -0,0 +1,225 @@
+import json
+import sys
+from abc import ABC, abstractmethod
+from typing import Optional, TextIO
+
+from utilities.time import time_float_to_str
+
+
+class TraceEvent:
+    """
+    Something that happened while loading or solving, with the fields that describe it. Events are only built when the sink is enabled, and each sink decides how to format them.
+    """
+
+    kind = "event"
+
+    def fields(self) -> dict:
+        """
+        Returns the fields of the event as a dictionary of JSON compatible values.
+        """
+        return dict(self.__dict__)
+
+    def message(self) -> str:
+        """
+        Returns a human readable description of the event.
+        """
+        return self.kind
+
+
+class PackagesLoaded(TraceEvent):
+    kind = "packages_loaded"
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def message(self) -> str:
+        return f"Loaded {self.count} packages"
+
+
+class TruckAvailable(TraceEvent):
+    kind = "truck_available"
+
+    def __init__(self, priority_modifier: float, truck_id: int, time: float):
+        self.priority_modifier = priority_modifier
+        self.truck_id = truck_id
+        self.time = time
+
+    def message(self) -> str:
+        return f"Truck {self.truck_id} is next available at HUB for loading at {time_float_to_str(self.time)}"
+
+
+class SavingsListUpdated(TraceEvent):
+    kind = "savings_list_updated"
+
+    def __init__(self, priority_modifier: float, size: int):
+        self.priority_modifier = priority_modifier
+        self.size = size
+
+    def message(self) -> str:
+        return f"Generated a savings list containing {self.size} possible routings"
+
+
+class TruckWaiting(TraceEvent):
+    kind = "truck_waiting"
+
+    def __init__(self, priority_modifier: float, truck_id: int, until: float):
+        self.priority_modifier = priority_modifier
+        self.truck_id = truck_id
+        self.until = until
+
+    def message(self) -> str:
+        return "No candidate routes to consider at this time, truck will wait"
+
+
+class DayEnded(TraceEvent):
+    kind = "day_ended"
+
+    def __init__(self, priority_modifier: float):
+        self.priority_modifier = priority_modifier
+
+    def message(self) -> str:
+        return "End of day reached, stopping simulation"
+
+
+class RouteSelected(TraceEvent):
+    kind = "route_selected"
+
+    def __init__(
+        self,
+        priority_modifier: float,
+        truck_id: int,
+        departure_time: float,
+        return_time: float,
+        distance: float,
+        package_ids: list[int],
+    ):
+        self.priority_modifier = priority_modifier
+        self.truck_id = truck_id
+        self.departure_time = departure_time
+        self.return_time = return_time
+        self.distance = distance
+        self.package_ids = package_ids
+
+    def message(self) -> str:
+        return f"Truck {self.truck_id} will depart at {time_float_to_str(self.departure_time)} with {len(self.package_ids)} packages and an estimated return time of {time_float_to_str(self.return_time)}"
+
+
+class RunPruned(TraceEvent):
+    kind = "run_pruned"
+
+    def __init__(self, priority_modifier: float, bound: float):
+        self.priority_modifier = priority_modifier
+        self.bound = bound
+
+    def message(self) -> str:
+        return f"Distance exceeds {self.bound:.2f} miles, stopping simulation"
+
+
+class TraceSink(ABC):
+    """
+    Receives trace events. Code that traces checks enabled before building an event, so a disabled sink costs a single attribute read per event.
+    A sink must implement emit, one that does not can not be created.
+    """
+
+    enabled = True
+
+    @abstractmethod
+    def emit(self, event: TraceEvent):
+        """
+        Handles one event.
+        """
+
+
+class NullSink(TraceSink):
+    """
+    Discards every event, nothing is built or formatted.
+    """
+
+    enabled = False
+
+    def emit(self, event: TraceEvent):
+        pass
+
+
+# the streams of the sys module a HumanSink can write to in any process
+STANDARD_STREAMS = ["stdout", "stderr"]
+
+
+class HumanSink(TraceSink):
+    """
+    Writes the message of each event as a line of text, to standard output unless another stream is provided.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    def emit(self, event: TraceEvent):
+        # standard output is looked up on every event so that redirecting it also redirects the trace
+        print(event.message(), file=self.stream if self.stream != None else sys.stdout)
+
+    def __getstate__(self):
+        # the standard streams can not be pickled, so a sink handed to sweep worker processes keeps the name of
+        # the one it writes to, and the worker writes to its own
+        state = self.__dict__.copy()
+        for name in STANDARD_STREAMS:
+            if self.stream is getattr(sys, name):
+                state["stream"] = name
+        return state
+
+    def __setstate__(self, state: dict):
+        if state["stream"] in STANDARD_STREAMS:
+            state["stream"] = getattr(sys, state["stream"])
+        self.__dict__.update(state)
+
+
+class JsonLinesSink(TraceSink):
+    """
+    Appends each event to a file as one JSON object per line, with the event kind under "event".
+    The file is opened on the first event in each process, so the sink can be handed to sweep worker processes, which append their own lines to the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file: Optional[TextIO] = None
+
+    def emit(self, event: TraceEvent):
+        if self.file == None:
+            # line buffered, so lines from several processes are not interleaved mid line
+            self.file = open(self.path, "a", buffering=1, encoding="utf-8")
+        record = {"event": event.kind}
+        record.update(event.fields())
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        """
+        Closes the file, a later event opens it again.
+        """
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+    def __getstate__(self):
+        # an open file can not be pickled, each process opens its own
+        state = self.__dict__.copy()
+        state["file"] = None
+        return state
+
+
+TRACE_SINKS = ["none", "human", "jsonl"]
+
+
+def create_sink(
+    name: str, path: Optional[str] = None, stream: Optional[TextIO] = None
+) -> TraceSink:
+    """
+    Returns the sink for one of the TRACE_SINKS names. The jsonl sink requires a path, and the human sink writes to the stream if one is provided.
+    """
+    if name == "none":
+        return NullSink()
+    if name == "human":
+        return HumanSink(stream)
+    if name == "jsonl":
+        if path == None:
+            raise ValueError("The jsonl trace sink requires a file path.")
+        return JsonLinesSink(path)
+    raise ValueError(f"Unknown trace sink: {name}")
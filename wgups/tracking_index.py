@@ -0,0 +1,236 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:  # snapshots fall back to a binary search per package
+    np = None
+
+# Statuses a package can have in the tracking index, in the order of a package's day
+STATUSES = ["delayed", "at the hub", "en route", "delivered"]
+
+# Packages that are not delivered this many minutes before their deadline are at risk
+AT_RISK_WINDOW = 60.0
+
+# Default number of rows in each page of a paged snapshot
+PAGE_SIZE = 50
+
+
+def event_status(message: str) -> str:
+    """
+    Returns the status of a package after a tracking message, as added by Package, PackageTable and Route.
+    """
+    if message.startswith("Delivered"):
+        return "delivered"
+    if message.startswith("Departed"):
+        return "en route"
+    if message.startswith("Delayed") or message.startswith("On hold"):
+        return "delayed"
+    return "at the hub"
+
+
+class PackageStatus:
+    """
+    The latest tracking event of a package at some point in the day.
+    """
+
+    def __init__(
+        self,
+        package_id: int,
+        time: float,
+        info: str,
+        status: str,
+        truck_id: Optional[int],
+        deadline: float,
+    ):
+        self.package_id = package_id
+        # the time of the event and its tracking info line, as returned by Package.get_tracking_info
+        self.time = time
+        self.info = info
+        self.status = status
+        self.truck_id = truck_id
+        self.deadline = deadline
+
+    def __repr__(self):
+        return f"{{ id: {self.package_id}, status: {self.status}, info: {self.info} }}"
+
+
+class TrackingIndex:
+    """
+    The tracking events of every package in a solution, indexed by time. Each package keeps its event times sorted, so the status of one package at a time is a binary search, and the events of every package are laid out end to end so that the status of all packages at a time is found in one vectorized search. A global timeline holds every event in time order.
+    """
+
+    def __init__(self, packages: Iterable, trucks: Iterable):
+        packages = sorted(packages, key=lambda p: p.package_id)
+        truck_of = {
+            p.package_id: truck.id
+            for truck in trucks
+            for route in truck.routes
+            for p in route.deliveries
+        }
+
+        self.package_ids = [p.package_id for p in packages]
+        self.positions = {package_id: i for i, package_id in enumerate(self.package_ids)}
+        self.deadlines = [float(p.constraints.deadline) for p in packages]
+        self.truck_ids = [truck_of.get(p.package_id) for p in packages]
+
+        # the events of each package sorted by time, stored end to end
+        # offsets[i] is where the events of the package at position i start, and offsets[-1] is the event count
+        self.times: list[float] = []
+        self.infos: list[str] = []
+        self.statuses: list[int] = []
+        self.offsets = [0]
+        for package in packages:
+            for time, info in sorted(package.tracking_info, key=lambda event: event[0]):
+                self.times.append(time)
+                self.infos.append(info)
+                self.statuses.append(STATUSES.index(event_status(info.split(" - ", 1)[1])))
+            self.offsets.append(len(self.times))
+
+        # the global timeline, every event index ordered by time and then by package
+        self.timeline = sorted(range(len(self.times)), key=lambda i: self.times[i])
+        self.timeline_times = [self.times[i] for i in self.timeline]
+        self.event_positions: list[int] = []
+        for position in range(len(packages)):
+            self.event_positions.extend(
+                [position] * (self.offsets[position + 1] - self.offsets[position])
+            )
+
+        if np is not None:
+            self._build_arrays()
+
+    def _build_arrays(self):
+        assert np is not None
+        # every event gets the integer key position * span + rank, where rank counts the distinct event times up to
+        # and including its time, so the keys are sorted since the events of a package are, and exact where a float
+        # position * span + time would round away fractions of a minute on a large solution
+        # the latest event of every package at a time is then one searchsorted over the keys
+        self.unique_times = np.unique(np.array(self.times, dtype=np.float64))
+        self.span = len(self.unique_times) + 1
+        ranks = np.searchsorted(self.unique_times, np.array(self.times, dtype=np.float64), side="right")
+        self.keys = np.array(self.event_positions, dtype=np.int64) * self.span + ranks
+        self.position_keys = np.arange(len(self.package_ids), dtype=np.int64) * self.span
+        self.status_array = np.array(self.statuses, dtype=np.int64)
+        self.deadline_array = np.array(self.deadlines, dtype=np.float64)
+        self.truck_array = np.array(
+            [-1 if truck_id == None else truck_id for truck_id in self.truck_ids],
+            dtype=np.int64,
+        )
+        self.offset_array = np.array(self.offsets[:-1], dtype=np.int64)
+
+    def _row(self, position: int, event: int) -> PackageStatus:
+        return PackageStatus(
+            self.package_ids[position],
+            self.times[event],
+            self.infos[event],
+            STATUSES[self.statuses[event]],
+            self.truck_ids[position],
+            self.deadlines[position],
+        )
+
+    def _latest_event(self, position: int, time: float) -> int:
+        # index of the last event of the package at or before the time, or -1 if it has none yet
+        start, end = self.offsets[position], self.offsets[position + 1]
+        event = bisect_right(self.times, time, start, end) - 1
+        return event if event >= start else -1
+
+    def status_at(self, package_id: int, time: float = 1440.0) -> Optional[PackageStatus]:
+        """
+        Returns the latest tracking event of the package at the provided time, or None if the package is unknown or has no event yet.
+        """
+        position = self.positions.get(package_id)
+        if position == None:
+            return None
+        event = self._latest_event(position, time)
+        if event == -1:
+            return None
+        return self._row(position, event)
+
+    def tracking_info(self, package_id: int, time: float = 1440.0) -> list[str]:
+        """
+        Returns the tracking info of the package up to the provided time, like Package.get_tracking_info.
+        """
+        position = self.positions.get(package_id)
+        if position == None:
+            return []
+        start = self.offsets[position]
+        return self.infos[start : self._latest_event(position, time) + 1]
+
+    def latest_events(self, time: float) -> list[int]:
+        """
+        Returns the index of the latest event at the provided time for every package in package ID order, -1 for a package without an event yet.
+        """
+        if np is None:
+            return [self._latest_event(i, time) for i in range(len(self.package_ids))]
+
+        # the rank of the time is below the span, so the search never reaches into the next package's keys
+        rank = int(np.searchsorted(self.unique_times, time, side="right"))
+        events = np.searchsorted(self.keys, self.position_keys + rank, side="right") - 1
+        return np.where(events >= self.offset_array, events, -1).tolist()
+
+    def snapshot(
+        self,
+        time: float = 1440.0,
+        status: Optional[str] = None,
+        truck_id: Optional[int] = None,
+        at_risk: bool = False,
+        risk_window: float = AT_RISK_WINDOW,
+    ) -> Iterator[PackageStatus]:
+        """
+        Yields the latest tracking event of every package at the provided time, in package ID order. Packages without an event yet are skipped.
+        The packages can be filtered by status, by the truck that delivers them, and to those at risk: not delivered by the time and due within risk_window minutes of it, or already late.
+        """
+        events = self.latest_events(time)
+        if np is not None and len(self.times) > 0:
+            event_array = np.array(events, dtype=np.int64)
+            keep = event_array >= 0
+            if status != None:
+                keep &= self.status_array[event_array] == STATUSES.index(status)
+            if truck_id != None:
+                keep &= self.truck_array == truck_id
+            if at_risk:
+                keep &= self.status_array[event_array] != STATUSES.index("delivered")
+                keep &= self.deadline_array - time <= risk_window
+            for position in np.flatnonzero(keep).tolist():
+                yield self._row(position, events[position])
+            return
+
+        for position, event in enumerate(events):
+            if event == -1:
+                continue
+            row = self._row(position, event)
+            if status != None and row.status != status:
+                continue
+            if truck_id != None and row.truck_id != truck_id:
+                continue
+            if at_risk and (
+                row.status == "delivered" or row.deadline - time > risk_window
+            ):
+                continue
+            yield row
+
+    def pages(
+        self, rows: Iterable[PackageStatus], page_size: int = PAGE_SIZE
+    ) -> Iterator[list[PackageStatus]]:
+        """
+        Yields the rows a page at a time, so that a large snapshot can be shown or sent without building all of it at once.
+        """
+        page = []
+        for row in rows:
+            page.append(row)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def events_between(self, start: float, end: float) -> list[PackageStatus]:
+        """
+        Returns every tracking event from start to end, inclusive, in time order.
+        """
+        first = bisect_left(self.timeline_times, start)
+        last = bisect_right(self.timeline_times, end)
+        return [
+            self._row(self.event_positions[event], event)
+            for event in self.timeline[first:last]
+        ]
@@ -0,0 +1,332 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Optional
+
+from wgups.distance_table import DistanceTable
+from wgups.package import Package
+from wgups.package_table import PackageTable
+from wgups.route import MAX_PACKAGES, Route
+from wgups.route_factory import RouteFactory
+from wgups.savings_list import SavingsList
+from wgups.truck import Truck
+
+if TYPE_CHECKING:
+    from wgups.solution_factory import SolutionFactory
+
+try:
+    import numpy as np
+except ImportError:  # zones are partitioned with pure Python loops without it
+    np = None
+
+# the most rounds of assigning packages to medoids and moving the medoids a partition runs
+ZONE_ITERATIONS = 10
+
+# fewest packages per zone on average, a truckload, so that the packages left late in the day are not split into
+# zones too small to pair up
+MIN_ZONE_SIZE = MAX_PACKAGES
+
+# columns of the distance matrix summed at once when moving a medoid with numpy
+MEDOID_CHUNK_SIZE = 1024
+
+
+def partition_packages(
+    pt: PackageTable, dt: DistanceTable, packages: list[Package], zone_count: int
+) -> list[list[Package]]:
+    """
+    Partitions the packages into at most zone_count zones of nearby addresses with k-medoids over the distance matrix, and returns the non-empty zones with their packages in package list order.
+    The packages of a group are placed together, in the zone with the least total distance from them to its medoid, so a group never spans two zones.
+    """
+    units: dict[int, list[Package]] = {}
+    for package in packages:
+        units.setdefault(package.group_id, []).append(package)
+    unit_list = list(units.values())
+    if zone_count <= 1 or len(unit_list) <= 1:
+        return [list(packages)] if packages else []
+
+    # the distinct addresses, weighted by the number of packages delivered to each
+    weights: dict[int, int] = {}
+    for package in packages:
+        weights[package.address_index] = weights.get(package.address_index, 0) + 1
+    addresses = sorted(weights)
+
+    medoids = _initial_medoids(
+        dt, pt.hub_address_index, addresses, min(zone_count, len(unit_list))
+    )
+    assignment: list[int] = []
+    for _ in range(ZONE_ITERATIONS):
+        moved = _assign(dt, unit_list, medoids)
+        if moved == assignment:
+            break
+        assignment = moved
+        medoids = _move_medoids(dt, unit_list, assignment, medoids)
+
+    zones: list[list[Package]] = [[] for _ in medoids]
+    for unit, zone in zip(unit_list, assignment):
+        zones[zone].extend(unit)
+    for zone in zones:
+        zone.sort(key=lambda p: p.row)
+    return [zone for zone in zones if zone]
+
+
+def _distance_matrix(dt: DistanceTable):
+    assert np is not None
+    return np.asarray(dt.distances).reshape(dt.address_count, dt.address_count)
+
+
+def _initial_medoids(
+    dt: DistanceTable, hub: int, addresses: list[int], count: int
+) -> list[int]:
+    # farthest first: the address farthest from the hub, then each time the address farthest from the medoids chosen
+    # so far, which spreads the zones out around the hub. Ties go to the lowest address index
+    medoids: list[int] = []
+    if np is not None:
+        matrix = _distance_matrix(dt)
+        columns = np.array(addresses, dtype=np.int64)
+        nearest = np.array(matrix[hub, columns], dtype=np.float64)
+        while len(medoids) < count:
+            choice = int(nearest.argmax())
+            if len(medoids) > 0 and nearest[choice] <= 0:
+                break
+            medoids.append(addresses[choice])
+            nearest = np.minimum(nearest, matrix[addresses[choice], columns])
+        return medoids
+
+    size = dt.address_count
+    nearest_list = [dt.distances[hub * size + a] for a in addresses]
+    while len(medoids) < count:
+        choice = max(range(len(addresses)), key=lambda i: (nearest_list[i], -i))
+        if len(medoids) > 0 and nearest_list[choice] <= 0:
+            break
+        medoid = addresses[choice]
+        medoids.append(medoid)
+        nearest_list = [
+            min(d, dt.distances[medoid * size + a])
+            for d, a in zip(nearest_list, addresses)
+        ]
+    return medoids
+
+
+def _assign(
+    dt: DistanceTable, units: list[list[Package]], medoids: list[int]
+) -> list[int]:
+    # each unit goes to the medoid with the least total distance from its packages, ties to the first medoid
+    if np is not None:
+        unit_indices = np.array(
+            [u for u, unit in enumerate(units) for _ in unit], dtype=np.int64
+        )
+        rows = np.array(
+            [p.address_index for unit in units for p in unit], dtype=np.int64
+        )
+        block = np.array(
+            _distance_matrix(dt)[np.ix_(rows, np.array(medoids, dtype=np.int64))],
+            dtype=np.float64,
+        )
+        costs = np.zeros((len(units), len(medoids)), dtype=np.float64)
+        np.add.at(costs, unit_indices, block)
+        return costs.argmin(axis=1).tolist()
+
+    size = dt.address_count
+    assignment = []
+    for unit in units:
+        costs = [
+            sum(dt.distances[p.address_index * size + m] for p in unit) for m in medoids
+        ]
+        assignment.append(costs.index(min(costs)))
+    return assignment
+
+
+def _move_medoids(
+    dt: DistanceTable,
+    units: list[list[Package]],
+    assignment: list[int],
+    medoids: list[int],
+) -> list[int]:
+    # each medoid moves to the address of its zone with the least total distance to the zone's packages
+    weights: list[dict[int, int]] = [{} for _ in medoids]
+    for unit, zone in zip(units, assignment):
+        for package in unit:
+            zone_weights = weights[zone]
+            zone_weights[package.address_index] = (
+                zone_weights.get(package.address_index, 0) + 1
+            )
+
+    moved = []
+    size = dt.address_count
+    for medoid, zone_weights in zip(medoids, weights):
+        if not zone_weights:
+            moved.append(medoid)
+            continue
+        candidates = sorted(zone_weights)
+        if np is not None:
+            matrix = _distance_matrix(dt)
+            rows = np.array(candidates, dtype=np.int64)
+            counts = np.array([zone_weights[a] for a in candidates], dtype=np.float64)
+            costs = np.empty(len(candidates), dtype=np.float64)
+            for start in range(0, len(candidates), MEDOID_CHUNK_SIZE):
+                columns = rows[start : start + MEDOID_CHUNK_SIZE]
+                block = np.array(matrix[np.ix_(rows, columns)], dtype=np.float64)
+                costs[start : start + len(columns)] = counts @ block
+            moved.append(candidates[int(costs.argmin())])
+        else:
+            costs_list = [
+                sum(w * dt.distances[a * size + c] for a, w in zone_weights.items())
+                for c in candidates
+            ]
+            moved.append(candidates[costs_list.index(min(costs_list))])
+    return moved
+
+
+# the tables of a zone worker process, clones of the factory's tables set to the time of the last dispatch routed
+_worker_tables: Optional[tuple[PackageTable, DistanceTable]] = None
+_worker_time = 480.0
+
+
+def _init_zone_worker(factory: "SolutionFactory"):
+    global _worker_tables, _worker_time
+    pt = factory.package_table.clone()
+    _worker_tables = (pt, factory.distance_table.with_package_table(pt))
+    _worker_time = 480.0
+
+
+def _compute_zone_routes(
+    task: tuple[float, int, int, float, list[int]],
+) -> list[tuple[tuple[int, ...], float]]:
+    global _worker_time
+    assert _worker_tables is not None
+    pt, dt = _worker_tables
+    priority_modifier, neighbors, truck_id, departure_time, package_ids = task
+
+    # arrivals and address updates only depend on the time, so replaying them brings the worker's
+    # table to the parent's state for every package at the hub
+    if departure_time < _worker_time:
+        pt.reset()
+    pt.update_statuses(departure_time)
+    _worker_time = departure_time
+
+    truck = Truck(truck_id)
+    truck.next_available_time = departure_time
+    packages = [pt.get_package(package_id) for package_id in package_ids]
+    savings_list = SavingsList(
+        pt, dt, priority_modifier, [p for p in packages if p != None], neighbors
+    )
+    routes = RouteFactory(pt, dt).compute_routes(savings_list, truck)
+    return [
+        (tuple(p.package_id for p in route.deliveries), route.due_back_time)
+        for route in routes
+    ]
+
+
+class ZoneRouter:
+    """
+    Builds the candidate routes of a dispatch zone by zone. The packages at the hub that the truck can carry are partitioned into zones, and the Clarke-Wright routes of each zone are built from a savings list of only the zone's pairs. The routes of every zone are the candidates of the dispatch.
+    With k zones of similar size a dispatch builds O(n^2 / k) savings instead of O(n^2), at the cost of never routing packages of different zones together.
+    With more than one worker the zones are routed in a process pool, started on first use and shut down by close. The candidates are the same either way.
+    """
+
+    def __init__(self, factory: "SolutionFactory", workers: int = 1):
+        self.factory = factory
+        self.zone_count = factory.zones
+        self.neighbors = factory.neighbors
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ZoneRouter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the process pool, if one was started.
+        """
+        if self.executor != None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def compute_routes(
+        self,
+        pt: PackageTable,
+        dt: DistanceTable,
+        truck: Truck,
+        priority_modifier: float,
+    ) -> list[Route]:
+        """
+        Returns the candidate routes of every zone for the truck, in zone order.
+        """
+        metrics = pt.metrics
+        start = time.perf_counter() if metrics != None else 0.0
+
+        # a group with a package restricted to another truck can not be loaded, so it is left out of the zones
+        at_hub = pt.get_packages_at_hub()
+        restricted = {
+            p.group_id
+            for p in at_hub
+            if p.constraints.required_truck
+            and p.constraints.required_truck != truck.id
+        }
+        packages = [p for p in at_hub if p.group_id not in restricted]
+        zone_count = min(self.zone_count, len(packages) // MIN_ZONE_SIZE)
+        zones = partition_packages(pt, dt, packages, zone_count)
+        if metrics != None:
+            metrics.add_time("zones", time.perf_counter() - start)
+
+        routes = self._route_zones(pt, dt, truck, priority_modifier, zones)
+        # zones that each hold a lone package have no pairs to route, so the truck would wait although
+        # the packages could be delivered together
+        if len(routes) == 0 and len(zones) > 1:
+            routes = self._route_zones(pt, dt, truck, priority_modifier, [packages])
+        return routes
+
+    def _route_zones(
+        self,
+        pt: PackageTable,
+        dt: DistanceTable,
+        truck: Truck,
+        priority_modifier: float,
+        zones: list[list[Package]],
+    ) -> list[Route]:
+        metrics = pt.metrics
+        routes: list[Route] = []
+        if self.workers <= 1 or len(zones) <= 1:
+            route_factory = RouteFactory(pt, dt)
+            for zone in zones:
+                savings_list = SavingsList(
+                    pt, dt, priority_modifier, zone, self.neighbors
+                )
+                routes.extend(route_factory.compute_routes(savings_list, truck))
+            return routes
+
+        if self.executor == None:
+            # the tables are handed to each worker once, rather than once per zone
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_zone_worker,
+                initargs=(self.factory,),
+            )
+        tasks = [
+            (
+                priority_modifier,
+                self.neighbors,
+                truck.id,
+                truck.next_available_time,
+                [p.package_id for p in zone],
+            )
+            for zone in zones
+        ]
+        start = time.perf_counter() if metrics != None else 0.0
+        # map yields the routes of each zone in submission order, so the candidates match the serial order
+        for plans in self.executor.map(_compute_zone_routes, tasks):
+            for deliveries, due_back_time in plans:
+                route = Route(truck.next_available_time, truck.id, dt, pt)
+                for package_id in deliveries:
+                    package = pt.get_package(package_id)
+                    assert package is not None
+                    route.deliveries.append(package)
+                route.packages = set(deliveries)
+                route.due_back_time = due_back_time
+                route._refresh()
+                routes.append(route)
+        if metrics != None:
+            metrics.add_time("routes", time.perf_counter() - start)
+        return routes